@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Clientes da API REST: chaves por integração, escopos e limites
+
+Cada cliente tem uma chave própria (guardada só como SHA-256), os escopos que
+pode usar e um limite de requisições por minuto. A tabela inteira é pequena
+e fica em memória em cada worker; criar ou revogar um cliente publica a
+invalidação no barramento de cache e os workers recarregam na próxima
+requisição. Tokens JWT já verificados ficam num LRU até expirarem, então a
+autenticação de uma requisição não faz HMAC nem acesso ao banco.
+"""
+import os
+import time
+import hashlib
+import secrets
+import logging
+import threading
+from collections import OrderedDict
+
+from database import get_db_connection
+from cache_bus import CacheLocal, publicar_invalidacao
+import singleflight
+
+logger = logging.getLogger(__name__)
+
+ESCOPOS = {
+    'cadastros:read': 'Leitura de cadastros (listagem, feed, exportação)',
+    'stats:read': 'Estatísticas agregadas',
+}
+
+# Tokens gerados com API_MASTER_KEY têm todos os escopos
+CLIENTE_MASTER = 'master'
+LIMITE_MASTER = os.environ.get('API_LIMITE_MASTER', '600 per minute')
+LIMITE_ANONIMO = os.environ.get('API_LIMITE_ANONIMO', '30 per minute')
+LIMITE_PADRAO_POR_MINUTO = 120
+
+TOKEN_CACHE_MAX = int(os.environ.get('API_TOKEN_CACHE_MAX', 1024))
+
+_cache_clientes = CacheLocal('api_clientes', ttl=3600)
+
+def hash_chave(chave):
+    return hashlib.sha256(chave.encode('utf-8')).hexdigest()
+
+def _carregar_clientes():
+    """Clientes ativos indexados por hash da chave e por id"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, nome, chave_hash, escopos, requisicoes_por_minuto
+            FROM api_clientes WHERE ativo = TRUE
+        ''')
+        por_chave, por_id = {}, {}
+        for cliente_id, nome, chave_hash, escopos, por_minuto in cursor.fetchall():
+            cliente = {
+                'id': str(cliente_id),
+                'nome': nome,
+                'escopos': frozenset(e for e in escopos.split(',') if e),
+                'limite': f'{por_minuto} per minute',
+            }
+            por_chave[chave_hash] = cliente
+            por_id[cliente['id']] = cliente
+        logger.debug(f"🔑 {len(por_id)} clientes da API carregados")
+        return {'por_chave': por_chave, 'por_id': por_id}
+    finally:
+        conn.close()
+
+def _tabela():
+    return singleflight.obter_ou_calcular(_cache_clientes, 'tabela', _carregar_clientes)
+
+def cliente_por_chave(chave):
+    """Cliente ativo dono da chave, ou None"""
+    return _tabela()['por_chave'].get(hash_chave(chave))
+
+def cliente_por_id(cliente_id):
+    """Cliente ativo pelo id (claim sub do token), ou None se revogado"""
+    return _tabela()['por_id'].get(cliente_id)
+
+def criar_cliente(nome, escopos, requisicoes_por_minuto=LIMITE_PADRAO_POR_MINUTO):
+    """Cadastra um cliente e retorna (id, chave); a chave não é recuperável depois"""
+    invalidos = set(escopos) - set(ESCOPOS)
+    if invalidos or not escopos:
+        raise ValueError(f"Escopos inválidos: {', '.join(sorted(invalidos))}")
+    chave = secrets.token_urlsafe(32)
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO api_clientes (nome, chave_hash, escopos, requisicoes_por_minuto)
+            VALUES (%s, %s, %s, %s) RETURNING id
+        ''', (nome, hash_chave(chave), ','.join(sorted(escopos)), requisicoes_por_minuto))
+        cliente_id = cursor.fetchone()[0]
+        publicar_invalidacao('api_clientes', cursor=cursor)
+        conn.commit()
+        return cliente_id, chave
+    finally:
+        conn.close()
+
+def revogar_cliente(cliente_id):
+    """Desativa o cliente; tokens já emitidos deixam de valer em todos os workers"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('UPDATE api_clientes SET ativo = FALSE WHERE id = %s', (cliente_id,))
+        revogado = cursor.rowcount > 0
+        publicar_invalidacao('api_clientes', cursor=cursor)
+        conn.commit()
+        return revogado
+    finally:
+        conn.close()
+
+def listar_clientes():
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, nome, escopos, requisicoes_por_minuto, ativo, criado_em
+            FROM api_clientes ORDER BY id
+        ''')
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+class CacheTokens:
+    """LRU de token → claims já verificados; cada entrada vale até o exp do token"""
+
+    def __init__(self, maximo=TOKEN_CACHE_MAX):
+        self.maximo = maximo
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, token):
+        with self._lock:
+            item = self._dados.get(token)
+            if item is None:
+                return None
+            claims, expira = item
+            if time.time() >= expira:
+                del self._dados[token]
+                return None
+            self._dados.move_to_end(token)
+            return claims
+
+    def definir(self, token, claims):
+        with self._lock:
+            self._dados[token] = (claims, claims.get('exp', 0))
+            self._dados.move_to_end(token)
+            while len(self._dados) > self.maximo:
+                self._dados.popitem(last=False)
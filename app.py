@@ -1,11 +1,14 @@
-from flask import Flask, request
+from flask import Flask, request, flash, redirect, url_for
 from flask_compress import Compress
 from flask_wtf.csrf import CSRFProtect
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
-from database import init_db_tables, create_admin_user, get_db_connection
+from database import (get_db_connection, cache_permissoes, statement_timeout,
+                      STATEMENT_TIMEOUT_MS, STATEMENT_TIMEOUT_LONGO_MS)
+from cache_bus import iniciar_listener
+from uploads import UploadRequest, UPLOAD_MAX_ARQUIVO
+from json_rapido import configurar_json
+from assets import configurar_assets
+from extensions import limiter
 import os
-import gzip
 import logging
 from datetime import datetime
 
@@ -38,19 +41,65 @@ app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'ameg_secret_2024_fallback_key_change_in_production')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 
+# Uploads gravados em spool com hash e cota por arquivo (ver uploads.py)
+app.request_class = UploadRequest
+
+# Respostas JSON com orjson (datas em ISO 8601, ver json_rapido.py)
+configurar_json(app)
+
+# Arquivos estáticos com hash e pré-comprimidos (ver build_assets.py)
+configurar_assets(app)
+
 # Configurar compressão, CSRF e rate limiting
+app.config['COMPRESS_STREAMS'] = False  # respostas em stream são enviadas sem bufferizar
 Compress(app)
+
+# Planilhas de importação podem passar do limite geral; registrado antes do
+# CSRF porque a verificação do token já lê o corpo do formulário
+MAX_IMPORTACAO = int(os.environ.get('MAX_IMPORTACAO_MB', 64)) * 1024 * 1024
+
+@app.before_request
+def limite_upload_importacao():
+    if request.endpoint == 'importacao.importar':
+        request.max_content_length = MAX_IMPORTACAO
+        request.limite_arquivo = MAX_IMPORTACAO
+
+# Rotas que geram PDFs, planilhas ou leem a base inteira: têm mais tempo de
+# consulta no banco que o resto (o timeout do gunicorn vale para o worker todo)
+BLUEPRINTS_LONGOS = {'relatorios', 'importacao'}
+ROTAS_LONGAS = {
+    'api.stream_cadastros',
+    'caixa.relatorio_caixa',
+    'caixa.exportar_comprovantes_pdf',
+    'arquivos.exportar_arquivos_pdf',
+}
+
+@app.before_request
+def definir_timeout_consultas():
+    longa = request.blueprint in BLUEPRINTS_LONGOS or request.endpoint in ROTAS_LONGAS
+    statement_timeout.set(STATEMENT_TIMEOUT_LONGO_MS if longa else STATEMENT_TIMEOUT_MS)
+
+@app.errorhandler(413)
+def upload_muito_grande(e):
+    """Upload acima da cota: volta para a página de origem com a mensagem"""
+    logger.warning(f"⚠️ Upload recusado em {request.path}: {e.description}")
+    if request.path.startswith('/api/'):
+        return {"error": e.description}, 413
+    limite_mb = UPLOAD_MAX_ARQUIVO // (1024 * 1024)
+    flash(f'Arquivo muito grande ou envio acima do limite ({limite_mb}MB por arquivo)', 'error')
+    return redirect(request.referrer or url_for('dashboard.dashboard'))
+
 csrf = CSRFProtect(app)
-limiter = Limiter(
-    app=app,
-    key_func=get_remote_address,
-    default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://"
-)
+limiter.init_app(app)
 
 # Função helper para verificar se usuário é admin
 def is_admin_user(username):
     """Verifica se o usuário tem privilégios de administrador"""
+    eh_admin = cache_permissoes.obter(('admin', username))
+    if eh_admin is not None:
+        return eh_admin
+    
+    geracao = cache_permissoes.geracao()
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
@@ -61,8 +110,12 @@ def is_admin_user(username):
         
         if result:
             tipo = result[0] if isinstance(result, tuple) else result.get('tipo', 'usuario')
-            return tipo == 'admin'
-        return username == 'admin'  # Fallback para compatibilidade
+            eh_admin = tipo == 'admin'
+        else:
+            eh_admin = username == 'admin'  # Fallback para compatibilidade
+        
+        cache_permissoes.definir(('admin', username), eh_admin, geracao)
+        return eh_admin
     except Exception as e:
         logger.error(f"Erro ao verificar admin: {e}")
         return username == 'admin'  # Fallback em caso de erro
@@ -82,6 +135,8 @@ from blueprints.usuarios import usuarios_bp
 from blueprints.caixa import caixa_bp
 from blueprints.charts import charts_bp
 from blueprints.notifications import notifications_bp
+from blueprints.importacao import importacao_bp
+from blueprints.upload_sessoes import upload_sessoes_bp
 
 app.register_blueprint(auth_bp)
 app.register_blueprint(dashboard_bp)
@@ -92,11 +147,14 @@ app.register_blueprint(usuarios_bp)
 app.register_blueprint(caixa_bp)
 app.register_blueprint(charts_bp)
 app.register_blueprint(notifications_bp)
+app.register_blueprint(importacao_bp)
+app.register_blueprint(upload_sessoes_bp)
 
-# Log de todas as rotas registradas
-logger.info("🔍 ROTAS REGISTRADAS:")
-for rule in app.url_map.iter_rules():
-    logger.info(f"  {rule.rule} -> {rule.endpoint} [{', '.join(rule.methods)}]")
+# Log de todas as rotas registradas (só em debug: cada worker repetia a lista inteira)
+if logger.isEnabledFor(logging.DEBUG):
+    logger.debug("🔍 ROTAS REGISTRADAS:")
+    for rule in app.url_map.iter_rules():
+        logger.debug(f"  {rule.rule} -> {rule.endpoint} [{', '.join(rule.methods)}]")
 
 # Registrar API REST apenas se habilitada
 if os.getenv('API_ENABLED', 'false').lower() == 'true':
@@ -105,6 +163,12 @@ if os.getenv('API_ENABLED', 'false').lower() == 'true':
     csrf.exempt(api_bp)  # API usa JWT, não CSRF
     logger.info("🔌 API REST habilitada em /api/v1")
 
+# Listener de invalidação de cache (um por worker; reinicia após fork)
+@app.before_request
+def garantir_listener_cache():
+    if os.environ.get('DATABASE_URL'):
+        iniciar_listener()
+
 # Headers de segurança
 @app.after_request
 def add_security_headers(response):
@@ -150,60 +214,14 @@ def inject_utils():
         'tem_permissao_caixa': tem_permissao_caixa
     }
 
-# Cache para arquivos estáticos
-@app.after_request
-def after_request(response):
-    # Adiciona headers de cache para arquivos estáticos
-    if request.endpoint == 'static':
-        response.cache_control.max_age = 31536000  # 1 ano
-        response.cache_control.public = True
-    
-    # Compressão manual para arquivos CSS/JS se disponível
-    if (request.endpoint == 'static' and 
-        'gzip' in request.accept_encodings and
-        (request.path.endswith('.css') or request.path.endswith('.js'))):
-        
-        gzip_path = request.path + '.gz'
-        if os.path.exists('static' + gzip_path.replace('/static', '')):
-            response.headers['Content-Encoding'] = 'gzip'
-    
-    return response
-
 logger.info("🚀 Iniciando aplicação AMEG com arquitetura de blueprints")
 logger.info(f"RAILWAY_ENVIRONMENT: {os.environ.get('RAILWAY_ENVIRONMENT')}")
 logger.info(f"DATABASE_URL presente: {'DATABASE_URL' in os.environ}")
 logger.debug(f"SECRET_KEY configurada: {bool(app.secret_key)}")
 
-# Inicializar banco na inicialização (Railway ou desenvolvimento)
-if os.environ.get('RAILWAY_ENVIRONMENT'):
-    logger.info("🔧 Iniciando configuração do banco PostgreSQL no Railway...")
-    try:
-        logger.info("🔧 Inicializando tabelas do banco primeiro...")
-        logger.debug("Chamando init_db_tables()...")
-        init_db_tables()
-        logger.info("✅ Tabelas inicializadas")
-        
-        logger.info("👤 Criando usuário admin...")
-        logger.debug("Chamando create_admin_user()...")
-        create_admin_user()
-        logger.info("✅ Usuário admin configurado")
-        
-        logger.info("✅ Banco inicializado completamente no Railway")
-    except Exception as e:
-        logger.error(f"❌ Erro na inicialização do banco: {e}")
-        logger.error(f"Tipo do erro: {type(e)}")
-        logger.error(f"Args do erro: {e.args}")
-        import traceback
-        logger.error(f"Traceback completo: {traceback.format_exc()}")
-        logger.warning("⚠️ Continuando sem inicialização do banco...")
-else:
-    logger.info("🏠 Ambiente local detectado - inicializando PostgreSQL local...")
-    try:
-        init_db_tables()
-        create_admin_user()
-        logger.info("✅ Banco inicializado localmente")
-    except Exception as e:
-        logger.error(f"❌ Erro na inicialização local: {e}")
-
 if __name__ == '__main__':
+    # Servidor de desenvolvimento: prepara o banco antes de subir (em produção
+    # isso roda uma vez no start.sh, via inicializar_banco.py, e não em cada worker)
+    from inicializar_banco import inicializar_banco
+    inicializar_banco()
     app.run(debug=True, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
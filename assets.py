@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Arquivos estáticos com hash no nome e variantes pré-comprimidas
+
+Lê o manifesto gerado por build_assets.py: url_for('static', filename=...)
+passa a apontar para o arquivo com hash (cache de 1 ano, imutável) e o
+handler de /static/ envia a variante .br ou .gz conforme o Accept-Encoding,
+sem comprimir nada na requisição. Sem manifesto (desenvolvimento sem build)
+os arquivos originais são servidos como antes, revalidados pelo ETag.
+"""
+import os
+import json
+import logging
+import mimetypes
+
+from flask import request, send_from_directory
+
+logger = logging.getLogger(__name__)
+
+CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+# Variantes na ordem de preferência
+CODIFICACOES = (('br', '.br'), ('gzip', '.gz'))
+
+def carregar_manifesto(static_folder):
+    caminho = os.path.join(static_folder, 'dist', 'manifest.json')
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logger.warning("⚠️ static/dist/manifest.json não encontrado - rode build_assets.py")
+        return {}
+
+def configurar_assets(app):
+    """Instala a resolução de nomes com hash e o handler de arquivos estáticos"""
+    manifesto = carregar_manifesto(app.static_folder)
+    app.extensions['assets_manifesto'] = manifesto
+
+    @app.url_defaults
+    def nome_com_hash(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifesto:
+            values['filename'] = 'dist/' + manifesto[values['filename']]
+
+    def servir_estatico(filename):
+        if not filename.startswith('dist/'):
+            resposta = send_from_directory(app.static_folder, filename, max_age=0)
+            resposta.headers['Cache-Control'] = 'no-cache'
+            return resposta
+
+        mimetype = mimetypes.guess_type(filename)[0]
+        for codificacao, extensao in CODIFICACOES:
+            # quality() respeita q=0 (o operador in ignora a qualidade)
+            if request.accept_encodings.quality(codificacao) > 0 and \
+                    os.path.isfile(os.path.join(app.static_folder, filename + extensao)):
+                resposta = send_from_directory(app.static_folder, filename + extensao, mimetype=mimetype)
+                resposta.headers['Content-Encoding'] = codificacao
+                break
+        else:
+            resposta = send_from_directory(app.static_folder, filename, mimetype=mimetype)
+        resposta.headers['Cache-Control'] = CACHE_IMUTAVEL
+        resposta.vary.add('Accept-Encoding')
+        return resposta
+
+    app.view_functions['static'] = servir_estatico
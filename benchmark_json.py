@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark da serialização JSON das respostas da API e dos gráficos
+
+Compara o caminho anterior (provider padrão do Flask + conversão manual de
+datas) com o OrjsonProvider, em objetos e no formato colunar. Usa linhas
+sintéticas com os tipos que o psycopg2 devolve (date, datetime, Decimal).
+
+Uso: python benchmark_json.py [--linhas 20000] [--repeticoes 5]
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from json_rapido import OrjsonProvider, ProviderISO, dados_colunares, orjson
+
+COLUNAS = ('id', 'nome_completo', 'cpf', 'telefone', 'data_cadastro', 'updated_at',
+           'data_nascimento', 'bairro', 'cep', 'renda_individual', 'renda_familiar', 'tem_doenca_cronica')
+
+def gerar_linhas(quantidade):
+    """Tuplas no formato do cursor"""
+    aleatorio = random.Random(42)
+    bairros = ['Centro', 'Torre', 'Mangabeira', 'Cruz das Armas', 'Bessa']
+    inicio = datetime(2024, 1, 1)
+    linhas = []
+    for i in range(1, quantidade + 1):
+        cadastro = inicio + timedelta(minutes=aleatorio.randint(0, 900000))
+        linhas.append((
+            i, f'Pessoa de Teste {i}', f'{aleatorio.randint(0, 999999999):09d}00', '(83) 99999-0000',
+            cadastro, cadastro + timedelta(days=3),
+            date(1950, 1, 1) + timedelta(days=aleatorio.randint(0, 20000)),
+            aleatorio.choice(bairros), '58000-000',
+            Decimal(aleatorio.randint(0, 500000)) / 100, Decimal(aleatorio.randint(0, 900000)) / 100,
+            aleatorio.choice(['Sim', 'Não']),
+        ))
+    return linhas
+
+def caminho_anterior(app, linhas):
+    """dict(zip) + isoformat manual + json.dumps do Flask"""
+    def valor(v):
+        return v.isoformat() if isinstance(v, (date, datetime)) else v
+    registros = [{coluna: valor(v) for coluna, v in zip(COLUNAS, linha)} for linha in linhas]
+    return app.json.response({'cadastros': registros}).get_data()
+
+def caminho_objetos(app, linhas):
+    registros = [dict(zip(COLUNAS, linha)) for linha in linhas]
+    return app.json.response({'cadastros': registros}).get_data()
+
+def caminho_colunar(app, linhas):
+    return app.json.response({'cadastros': dados_colunares(COLUNAS, linhas)}).get_data()
+
+def medir(nome, funcao, app, linhas, repeticoes):
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        corpo = funcao(app, linhas)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    print(f"{nome:<38} {melhor * 1000:9.1f} ms {len(corpo) / 1024:10.0f} KB")
+    return melhor
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de serialização JSON')
+    parser.add_argument('--linhas', type=int, default=20000)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    linhas = gerar_linhas(args.linhas)
+
+    padrao = Flask('padrao')
+    padrao.json = DefaultJSONProvider(padrao)
+    iso = Flask('iso')
+    iso.json = ProviderISO(iso)
+
+    print(f"📊 Serialização de {args.linhas} cadastros (melhor de {args.repeticoes})")
+    print("=" * 64)
+    with padrao.app_context():
+        base = medir('Flask padrão (anterior)', caminho_anterior, padrao, linhas, args.repeticoes)
+    with iso.app_context():
+        medir('json + datas ISO, objetos', caminho_objetos, iso, linhas, args.repeticoes)
+    if orjson is None:
+        print("⚠️  orjson não instalado - resultados do OrjsonProvider omitidos")
+        return
+    rapido = Flask('orjson')
+    rapido.json = OrjsonProvider(rapido)
+    with rapido.app_context():
+        objetos = medir('orjson, objetos', caminho_objetos, rapido, linhas, args.repeticoes)
+        colunar = medir('orjson, colunar', caminho_colunar, rapido, linhas, args.repeticoes)
+    print("=" * 64)
+    print(f"✅ orjson objetos: {base / objetos:.1f}x mais rápido; colunar: {base / colunar:.1f}x")
+
+if __name__ == '__main__':
+    main()
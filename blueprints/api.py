@@ -1,36 +1,139 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, Response, jsonify, request, current_app, g
+from flask_limiter.util import get_remote_address
 from functools import wraps
 import jwt
 import os
+import re
+import zlib
+import hashlib
 from datetime import datetime, timedelta
-from .utils import get_db_connection
+from database import get_db_connection
+from cadastro_schema import COLUNAS
+from extensions import limiter
+from cache_http import etag_corresponde
+from json_rapido import dumps_linha, dados_colunares, formato_colunar
+from api_clientes import (ESCOPOS, CLIENTE_MASTER, LIMITE_MASTER, LIMITE_ANONIMO,
+                          CacheTokens, cliente_por_chave, cliente_por_id)
 
 api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
 
-def require_api_key(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({'error': 'Token required'}), 401
-        
-        try:
-            token = token.replace('Bearer ', '')
-            jwt.decode(token, os.getenv('API_SECRET_KEY', 'default-key'), algorithms=['HS256'])
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
-        
-        return f(*args, **kwargs)
-    return decorated
+_tokens_verificados = CacheTokens()
+
+def _claims_requisicao():
+    """Claims do token da requisição (LRU de tokens já verificados), ou None se ausente/inválido"""
+    if 'api_claims' in g:
+        return g.api_claims
+    claims = None
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    if token:
+        claims = _tokens_verificados.obter(token)
+        if claims is None:
+            try:
+                claims = jwt.decode(token, os.getenv('API_SECRET_KEY', 'default-key'), algorithms=['HS256'])
+                _tokens_verificados.definir(token, claims)
+            except jwt.InvalidTokenError:
+                claims = None
+    # Tokens emitidos antes dos clientes da API não têm sub: eram da chave mestre
+    if claims is not None and claims.get('sub', CLIENTE_MASTER) != CLIENTE_MASTER \
+            and cliente_por_id(claims['sub']) is None:
+        claims = None
+    g.api_claims = claims
+    return claims
+
+def _escopos(claims):
+    """Escopos do cliente do token, ou None se ele foi revogado nesse meio tempo"""
+    sub = claims.get('sub', CLIENTE_MASTER)
+    if sub == CLIENTE_MASTER:
+        return ESCOPOS.keys()
+    # Escopos atuais do cliente (alterações valem sem reemitir o token)
+    cliente = cliente_por_id(sub)
+    return cliente['escopos'] if cliente else None
+
+def require_api_key(escopo):
+    """Exige token válido com o escopo informado"""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if not request.headers.get('Authorization'):
+                return jsonify({'error': 'Token required'}), 401
+            claims = _claims_requisicao()
+            escopos = _escopos(claims) if claims is not None else None
+            if escopos is None:
+                return jsonify({'error': 'Invalid token'}), 401
+            if escopo not in escopos:
+                return jsonify({'error': f'Scope required: {escopo}'}), 403
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+def chave_limite_api():
+    """Chave do rate limit: o cliente do token (ou o IP sem token válido)"""
+    claims = _claims_requisicao()
+    if claims is None:
+        return f"ip:{get_remote_address()}"
+    return f"cliente:{claims.get('sub', CLIENTE_MASTER)}"
+
+def limite_api():
+    """Limite do cliente da requisição, lido da tabela em memória"""
+    claims = _claims_requisicao()
+    if claims is None:
+        return LIMITE_ANONIMO
+    sub = claims.get('sub', CLIENTE_MASTER)
+    if sub == CLIENTE_MASTER:
+        return LIMITE_MASTER
+    # Cliente revogado depois da validação do token: trata como anônimo
+    cliente = cliente_por_id(sub)
+    return cliente['limite'] if cliente else LIMITE_ANONIMO
+
+# Limite por cliente da API (substitui os limites padrão por IP)
+limiter.limit(limite_api, key_func=chave_limite_api)(api_bp)
+
+# Campos de cadastro expostos pela API (sem a foto, muito grande)
+COLUNAS_API = ('id', 'data_cadastro', 'updated_at') + tuple(c for c in COLUNAS if c != 'foto_base64')
+FEED_LIMITE_PADRAO = 500
+FEED_LIMITE_MAX = 5000
+OPERACOES_FEED = {'I': 'insert', 'U': 'update', 'D': 'delete', 'T': 'reset'}
+
+def _campos_solicitados(padrao=COLUNAS_API):
+    """Projeção ?fields= validada contra COLUNAS_API; retorna (campos, erro)"""
+    if not request.args.get('fields'):
+        return padrao, None
+    campos = tuple(dict.fromkeys(campo.strip() for campo in request.args['fields'].split(',') if campo.strip()))
+    invalidos = [campo for campo in campos if campo not in COLUNAS_API]
+    if invalidos or not campos:
+        return None, f"Campos inválidos: {', '.join(invalidos)}"
+    return campos, None
+
+def _registros(campos, linhas):
+    """Lista de objetos ou, com ?formato=colunar, {"columns", "rows"} (datas/Decimal ficam com o provider JSON)"""
+    if formato_colunar(request):
+        return dados_colunares(campos, linhas)
+    return [dict(zip(campos, linha)) for linha in linhas]
+
+def _etag(versoes, campos):
+    """ETag a partir de (id, updated_at) dos registros e da projeção pedida"""
+    base = ','.join(campos) + '|' + ';'.join(f'{i}:{v.isoformat() if v else ""}' for i, v in versoes)
+    return hashlib.md5(base.encode()).hexdigest()
 
 @api_bp.route('/token', methods=['POST'])
 def generate_token():
     """Gerar token JWT para autenticação"""
-    data = request.get_json()
-    if not data or data.get('api_key') != os.getenv('API_MASTER_KEY'):
+    data = request.get_json(silent=True) or {}
+    api_key = data.get('api_key')
+    if not api_key:
         return jsonify({'error': 'Invalid API key'}), 401
     
+    if api_key == os.getenv('API_MASTER_KEY'):
+        sub, escopos = CLIENTE_MASTER, sorted(ESCOPOS)
+    else:
+        cliente = cliente_por_chave(api_key)
+        if cliente is None:
+            return jsonify({'error': 'Invalid API key'}), 401
+        sub, escopos = cliente['id'], sorted(cliente['escopos'])
+    
     token = jwt.encode({
+        'sub': sub,
+        'scope': ' '.join(escopos),
         'exp': datetime.utcnow() + timedelta(hours=24),
         'iat': datetime.utcnow()
     }, os.getenv('API_SECRET_KEY', 'default-key'), algorithm='HS256')
@@ -38,9 +141,12 @@ def generate_token():
     return jsonify({'token': token})
 
 @api_bp.route('/cadastros', methods=['GET'])
-@require_api_key
+@require_api_key('cadastros:read')
 def get_cadastros():
-    """Listar cadastros com paginação"""
+    """Listar cadastros com paginação (ou vários por ?ids=1,2,3)"""
+    if request.args.get('ids'):
+        return _get_cadastros_por_ids()
+    
     try:
         page = int(request.args.get('page', 1))
         per_page = min(int(request.args.get('per_page', 50)), 100)
@@ -62,18 +168,8 @@ def get_cadastros():
             LIMIT %s OFFSET %s
         """, (per_page, offset))
         
-        cadastros = []
-        for row in cursor.fetchall():
-            cadastros.append({
-                'id': row[0],
-                'nome_completo': row[1],
-                'cpf': row[2],
-                'telefone': row[3],
-                'data_cadastro': row[4].isoformat() if row[4] else None,
-                'endereco': row[5],
-                'bairro': row[6],
-                'cep': row[7]
-            })
+        campos = [desc[0] for desc in cursor.description]
+        cadastros = _registros(campos, cursor.fetchall())
         
         cursor.close()
         conn.close()
@@ -91,43 +187,226 @@ def get_cadastros():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@api_bp.route('/cadastros/<int:cadastro_id>', methods=['GET'])
-@require_api_key
-def get_cadastro(cadastro_id,):
-    """Obter cadastro específico"""
+@api_bp.route('/cadastros/changes', methods=['GET'])
+@require_api_key('cadastros:read')
+def get_cadastros_changes():
+    """Alterações de cadastros desde um cursor (inserções, atualizações, exclusões)"""
+    # Cursor opaco "txid-seq"; sem since o feed começa do início. Só avança até
+    # transações já encerradas, então repetir com o cursor devolvido nunca pula
+    # alterações. "reset" = base zerada, a cópia local deve ser descartada
+    since = request.args.get('since', '0-0')
+    if not re.fullmatch(r'\d+-\d+', since):
+        return jsonify({'error': 'Cursor inválido'}), 400
+    txid, seq = (int(parte) for parte in since.split('-'))
+    try:
+        limite = min(int(request.args.get('limit', FEED_LIMITE_PADRAO)), FEED_LIMITE_MAX)
+    except ValueError:
+        return jsonify({'error': 'limit inválido'}), 400
+    
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
+        colunas = ', '.join(f'c.{coluna}' for coluna in COLUNAS_API)
+        cursor.execute(f"""
+            SELECT a.txid, a.seq, a.cadastro_id, a.operacao, a.alterado_em, {colunas}
+            FROM cadastros_alteracoes a
+            LEFT JOIN cadastros c ON c.id = a.cadastro_id AND a.operacao <> 'D'
+            WHERE (a.txid, a.seq) > (%s, %s)
+              AND a.txid < txid_snapshot_xmin(txid_current_snapshot())
+            ORDER BY a.txid, a.seq
+            LIMIT %s
+        """, (txid, seq, limite + 1))
+        linhas = cursor.fetchall()
+        cursor.close()
+        conn.close()
         
-        cursor.execute("SELECT * FROM cadastros WHERE id = %s", (cadastro_id,))
-        row = cursor.fetchone()
+        changes = []
+        for linha in linhas[:limite]:
+            operacao = OPERACOES_FEED[linha[3]]
+            registro = linha[5:]
+            # Excluído depois desta entrada: a exclusão virá mais adiante no feed
+            cadastro = dict(zip(COLUNAS_API, registro)) if registro[0] is not None else None
+            if operacao in ('insert', 'update') and cadastro is None:
+                continue
+            changes.append({
+                'op': operacao,
+                'id': linha[2] if operacao != 'reset' else None,
+                'changed_at': linha[4],
+                'cadastro': cadastro,
+            })
         
-        if not row:
-            return jsonify({'error': 'Cadastro não encontrado'}), 404
+        ultimo = linhas[min(len(linhas), limite) - 1] if linhas else None
+        return jsonify({
+            'changes': changes,
+            'cursor': f'{ultimo[0]}-{ultimo[1]}' if ultimo else since,
+            'has_more': len(linhas) > limite
+        })
         
-        # Mapear campos (sem foto_base64 para performance)
-        columns = [desc[0] for desc in cursor.description]
-        cadastro = dict(zip(columns, row))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Máximo de ids por requisição em ?ids=
+LOTE_IDS_MAX = 500
+
+def _get_cadastros_por_ids():
+    """Vários cadastros em uma única consulta, com projeção e ETag do conjunto"""
+    try:
+        ids = list(dict.fromkeys(int(i) for i in request.args['ids'].split(',') if i.strip()))
+    except ValueError:
+        return jsonify({'error': 'ids deve ser uma lista de números separados por vírgula'}), 400
+    if len(ids) > LOTE_IDS_MAX:
+        return jsonify({'error': f'Máximo de {LOTE_IDS_MAX} ids por requisição'}), 400
+    campos, erro = _campos_solicitados()
+    if erro:
+        return jsonify({'error': erro}), 400
+    
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        if request.if_none_match:
+            cursor.execute("SELECT id, updated_at FROM cadastros WHERE id = ANY(%s) ORDER BY id", (ids,))
+            etag = _etag(cursor.fetchall(), campos)
+            if etag_corresponde(etag):
+                conn.close()
+                resposta = Response(status=304)
+                resposta.set_etag(etag)
+                return resposta
         
-        # Remover foto para API (muito grande)
-        cadastro.pop('foto_base64', None)
+        cursor.execute(f"""
+            SELECT id, updated_at, {', '.join(campos)} FROM cadastros
+            WHERE id = ANY(%s) ORDER BY id
+        """, (ids,))
+        rows = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        
+        encontrados = {row[0] for row in rows}
+        resposta = jsonify({
+            'cadastros': _registros(campos, [row[2:] for row in rows]),
+            'missing': [i for i in ids if i not in encontrados]
+        })
+        resposta.set_etag(_etag([(row[0], row[1]) for row in rows], campos))
+        return resposta
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Exportação NDJSON: linhas por ida ao banco e bytes acumulados antes de enviar
+STREAM_ITERSIZE = 2000
+STREAM_BLOCO = 64 * 1024
+
+def _linhas_ndjson(campos, where_clause, params):
+    """Gera o NDJSON a partir de um cursor no servidor (memória constante)"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(name='cadastros_stream')
+        cursor.itersize = STREAM_ITERSIZE
+        cursor.execute(f"""
+            SELECT {', '.join(campos)} FROM cadastros
+            {where_clause}
+            ORDER BY id
+        """, params)
+        
+        bloco = []
+        tamanho = 0
+        for linha in cursor:
+            registro = dumps_linha(dict(zip(campos, linha)))
+            bloco.append(registro)
+            tamanho += len(registro)
+            if tamanho >= STREAM_BLOCO:
+                yield b''.join(bloco)
+                bloco = []
+                tamanho = 0
+        if bloco:
+            yield b''.join(bloco)
+        
+        cursor.close()
+    finally:
+        conn.close()
+
+def _gzip(blocos):
+    """Comprime o stream incrementalmente (Flask-Compress não atua em streams)"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for bloco in blocos:
+        comprimido = compressor.compress(bloco)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
+
+@api_bp.route('/cadastros/stream', methods=['GET'])
+@require_api_key('cadastros:read')
+def stream_cadastros():
+    """Exportar cadastros em NDJSON (um objeto por linha) em uma única requisição"""
+    campos, erro = _campos_solicitados()
+    if erro:
+        return jsonify({'error': erro}), 400
+    
+    # Filtros opcionais
+    condicoes = []
+    params = []
+    if request.args.get('bairro'):
+        condicoes.append('bairro = %s')
+        params.append(request.args['bairro'])
+    if request.args.get('updated_since'):
+        try:
+            params.append(datetime.fromisoformat(request.args['updated_since']))
+        except ValueError:
+            return jsonify({'error': 'updated_since deve estar em ISO 8601'}), 400
+        condicoes.append('updated_at >= %s')
+    where_clause = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    
+    corpo = _linhas_ndjson(campos, where_clause, params)
+    headers = {'Content-Disposition': 'attachment; filename=cadastros.ndjson',
+               'Vary': 'Accept-Encoding'}
+    if request.accept_encodings.quality('gzip') > 0:
+        corpo = _gzip(corpo)
+        headers['Content-Encoding'] = 'gzip'
+    
+    return Response(corpo, mimetype='application/x-ndjson', headers=headers)
+
+@api_bp.route('/cadastros/<int:cadastro_id>', methods=['GET'])
+@require_api_key('cadastros:read')
+def get_cadastro(cadastro_id,):
+    """Obter cadastro específico (?fields= e If-None-Match)"""
+    campos, erro = _campos_solicitados()
+    if erro:
+        return jsonify({'error': erro}), 400
+    
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
         
-        # Converter datas para ISO
-        if cadastro.get('data_cadastro'):
-            cadastro['data_cadastro'] = cadastro['data_cadastro'].isoformat()
-        if cadastro.get('data_nascimento'):
-            cadastro['data_nascimento'] = cadastro['data_nascimento'].isoformat()
+        # Revalidação: só a versão do registro, sem ler as colunas
+        if request.if_none_match:
+            cursor.execute("SELECT updated_at FROM cadastros WHERE id = %s", (cadastro_id,))
+            versao = cursor.fetchone()
+            etag = versao and _etag([(cadastro_id, versao[0])], campos)
+            if etag and etag_corresponde(etag):
+                conn.close()
+                resposta = Response(status=304)
+                resposta.set_etag(etag)
+                return resposta
         
+        # Apenas as colunas pedidas (a foto nunca é lida)
+        cursor.execute(f"SELECT updated_at, {', '.join(campos)} FROM cadastros WHERE id = %s", (cadastro_id,))
+        row = cursor.fetchone()
         cursor.close()
         conn.close()
         
-        return jsonify({'cadastro': cadastro})
+        if not row:
+            return jsonify({'error': 'Cadastro não encontrado'}), 404
+        
+        cadastro = dict(zip(campos, row[1:]))
+        resposta = jsonify({'cadastro': cadastro})
+        resposta.set_etag(_etag([(cadastro_id, row[0])], campos))
+        return resposta
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @api_bp.route('/stats', methods=['GET'])
-@require_api_key
+@require_api_key('stats:read')
 def get_stats():
     """Obter estatísticas do sistema"""
     try:
@@ -1,5 +1,11 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, send_file
-from database import get_db_connection, registrar_auditoria
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, send_file, jsonify
+from database import get_db_connection, registrar_auditoria, obter_contadores, inserir_arquivos_saude
+from cache_bus import publicar_invalidacao
+from uploads import validar_upload, info_upload
+from otimizacao import agendar_otimizacao, relatorio_otimizacao
+from blueprints.usuarios import is_admin_user
+from previas import resposta_previa
+from extensions import limite_recursos_pagina
 from werkzeug.utils import secure_filename
 import psycopg2.extras
 import io
@@ -12,63 +18,99 @@ arquivos_bp = Blueprint('arquivos', __name__)
 
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx'}
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
 @arquivos_bp.route('/arquivos_cadastros')
 def arquivos_cadastros():
     if 'usuario' not in session:
         return redirect(url_for('auth.login'))
     
+    # Paginação por chave (nome_completo, id): custo constante em qualquer página
+    busca = request.args.get('busca', '').strip()
+    apos_nome = request.args.get('apos_nome')
+    apos_id = request.args.get('apos_id', type=int)
+    per_page = 30
+    
     try:
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         
-        # Buscar apenas cadastros que têm arquivos anexados
+        # Cadastros com arquivos pelo índice parcial idx_cadastros_com_arquivos
+        # (total_arquivos mantido por trigger): cadastros sem anexos nem são lidos
         query_cadastros = '''
-            SELECT c.id, c.nome_completo, c.cpf,
-                   COUNT(a.id) as arquivos_count
+            SELECT c.id, c.nome_completo, c.cpf, c.total_arquivos AS arquivos_count
             FROM cadastros c
-            INNER JOIN arquivos_saude a ON c.id = a.cadastro_id
-            GROUP BY c.id, c.nome_completo, c.cpf
-            HAVING COUNT(a.id) > 0
-            ORDER BY c.nome_completo
+            WHERE c.total_arquivos > 0
         '''
-        cursor.execute(query_cadastros)
-        cadastros_data = cursor.fetchall()
-        
-        cadastros = []
-        for cadastro_data in cadastros_data:
-            # Buscar arquivos de saúde para cada cadastro
-            query_arquivos = '''
-                SELECT id, tipo_arquivo, nome_arquivo, descricao, data_upload
-                FROM arquivos_saude 
-                WHERE cadastro_id = %s
-                ORDER BY data_upload DESC
-            '''
-            cursor.execute(query_arquivos, (cadastro_data['id'],))
-            arquivos = cursor.fetchall()
-            
-            cadastro_obj = {
-                'id': cadastro_data['id'],
-                'nome_completo': cadastro_data['nome_completo'],
-                'cpf': cadastro_data['cpf'],
-                'arquivos_count': cadastro_data['arquivos_count'],
-                'arquivos_saude': arquivos
-            }
-            cadastros.append(cadastro_obj)
+        params = []
+        
+        if busca:
+            query_cadastros += " AND LOWER(c.nome_completo) LIKE LOWER(%s)"
+            params.append(f'%{busca}%')
+        
+        if apos_nome is not None and apos_id is not None:
+            query_cadastros += " AND (c.nome_completo, c.id) > (%s, %s)"
+            params.extend([apos_nome, apos_id])
+        
+        query_cadastros += " ORDER BY c.nome_completo, c.id LIMIT %s"
+        cursor.execute(query_cadastros, params + [per_page + 1])
+        cadastros = cursor.fetchall()
+        
+        tem_proxima = len(cadastros) > per_page
+        cadastros = cadastros[:per_page]
         
         cursor.close()
         conn.close()
         
-        # Verificar permissão do caixa
-        return render_template('arquivos_cadastros.html', cadastros=cadastros)
+        proxima = None
+        if tem_proxima:
+            ultimo = cadastros[-1]
+            proxima = {'apos_nome': ultimo['nome_completo'], 'apos_id': ultimo['id']}
+            if busca:
+                proxima['busca'] = busca
+        
+        total_arquivos = obter_contadores('arquivos_saude')['arquivos_saude']
+        
+        return render_template('arquivos_cadastros.html', cadastros=cadastros,
+                             proxima=proxima, busca=busca, primeira_pagina=apos_id is None,
+                             total_arquivos=total_arquivos)
         
     except Exception as e:
         logger.error(f"Erro em arquivos_cadastros: {e}")
         flash(f'Erro ao carregar arquivos: {str(e)}', 'error')
         return redirect(url_for('dashboard.dashboard'))
 
+@arquivos_bp.route('/api/arquivos_cadastro/<int:cadastro_id>')
+@limite_recursos_pagina
+def api_arquivos_cadastro(cadastro_id,):
+    """Lista de arquivos de um cadastro (carregada ao expandir o card)"""
+    if 'usuario' not in session:
+        return jsonify({'error': 'Não autenticado'}), 401
+    
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute('''
+            SELECT id, tipo_arquivo, nome_arquivo, descricao, data_upload
+            FROM arquivos_saude 
+            WHERE cadastro_id = %s
+            ORDER BY data_upload DESC
+        ''', (cadastro_id,))
+        arquivos = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        
+        return jsonify([{
+            'id': arquivo['id'],
+            'tipo_arquivo': arquivo['tipo_arquivo'],
+            'nome_arquivo': arquivo['nome_arquivo'],
+            'descricao': arquivo['descricao'],
+            'data_upload': arquivo['data_upload'].strftime('%d/%m/%Y %H:%M') if arquivo['data_upload'] else '',
+            'download_url': url_for('arquivos.download_arquivo', arquivo_id=arquivo['id'])
+        } for arquivo in arquivos])
+        
+    except Exception as e:
+        logger.error(f"Erro em api_arquivos_cadastro: {e}")
+        return jsonify({'error': 'Erro ao carregar arquivos'}), 500
+
 @arquivos_bp.route('/exportar_arquivos_pdf/<int:cadastro_id>')
 def exportar_arquivos_pdf(cadastro_id,):
     if 'usuario' not in session:
@@ -183,7 +225,11 @@ def arquivos_saude(cadastro_id,):
     cursor.execute('SELECT nome_completo FROM cadastros WHERE id = %s', (cadastro_id,))
     cadastro = cursor.fetchone()
     
-    cursor.execute('SELECT * FROM arquivos_saude WHERE cadastro_id = %s ORDER BY data_upload DESC', (cadastro_id,))
+    # Sem arquivo_dados: a listagem mostra prévias, o conteúdo só vai no download
+    cursor.execute('''
+        SELECT id, nome_arquivo, tipo_arquivo, sha256, tamanho, descricao, data_upload
+        FROM arquivos_saude WHERE cadastro_id = %s ORDER BY data_upload DESC
+    ''', (cadastro_id,))
     arquivos = cursor.fetchall()
     
     conn.close()
@@ -226,6 +272,19 @@ def download_arquivo(arquivo_id,):
         flash('Erro ao baixar arquivo!')
         return redirect(url_for('arquivos.arquivos_cadastros'))
 
+@arquivos_bp.route('/previa_arquivo/<int:arquivo_id>')
+@limite_recursos_pagina
+def previa_arquivo(arquivo_id):
+    if 'usuario' not in session:
+        return redirect(url_for('auth.login'))
+    
+    try:
+        resposta = resposta_previa('arquivos_saude', arquivo_id)
+    except Exception as e:
+        logger.error(f"Erro ao gerar prévia do arquivo {arquivo_id}: {e}")
+        return '', 500
+    return resposta or ('', 404)
+
 @arquivos_bp.route('/upload_arquivo/<int:cadastro_id>', methods=['POST'])
 def upload_arquivo(cadastro_id,):
     if 'usuario' not in session:
@@ -240,19 +299,23 @@ def upload_arquivo(cadastro_id,):
         flash('Nenhum arquivo selecionado!')
         return redirect(url_for('arquivos.arquivos_saude', cadastro_id=cadastro_id))
     
-    if file and allowed_file(file.filename):
-        file_data = file.read()
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('INSERT INTO arquivos_saude (cadastro_id, nome_arquivo, tipo_arquivo, arquivo_dados, descricao) VALUES (%s, %s, %s, %s, %s)', 
-                (cadastro_id, file.filename, request.form.get('tipo_arquivo'), file_data, request.form.get('descricao')))
-        conn.commit()
-        conn.close()
-        
-        flash('Arquivo enviado com sucesso!')
-    else:
-        flash('Tipo de arquivo não permitido! Use: PDF, PNG, JPG, DOC, DOCX')
+    erro = validar_upload(file, ALLOWED_EXTENSIONS)
+    if erro:
+        flash(erro)
+        return redirect(url_for('arquivos.arquivos_saude', cadastro_id=cadastro_id))
+    
+    # O conteúdo continua no spool do upload até a gravação
+    tamanho, sha256, _ = info_upload(file)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    arquivos_ids = inserir_arquivos_saude(cursor, [(cadastro_id, file.filename, request.form.get('tipo_arquivo'),
+                                     file.stream, request.form.get('descricao'), tamanho, sha256)])
+    publicar_invalidacao('arquivos', cursor=cursor)
+    conn.commit()
+    conn.close()
+    agendar_otimizacao('arquivos_saude', arquivos_ids)
+    
+    flash('Arquivo enviado com sucesso!')
     
     return redirect(url_for('arquivos.arquivos_saude', cadastro_id=cadastro_id))
 
@@ -277,6 +340,7 @@ def excluir_arquivo(arquivo_id,):
         
         # Excluir o arquivo
         cursor.execute('DELETE FROM arquivos_saude WHERE id = %s', (arquivo_id,))
+        publicar_invalidacao('arquivos', cursor=cursor)
         
         conn.commit()
         cursor.close()
@@ -289,3 +353,26 @@ def excluir_arquivo(arquivo_id,):
         logger.error(f"Erro ao excluir arquivo: {e}")
         flash('Erro ao excluir arquivo.')
         return redirect(url_for('dashboard.dashboard'))
+
+@arquivos_bp.route('/relatorio_otimizacao')
+def relatorio_otimizacao_arquivos():
+    if 'usuario' not in session:
+        return redirect(url_for('auth.login'))
+    
+    if not is_admin_user(session['usuario']):
+        flash('Acesso negado. Apenas administradores podem ver este relatório.')
+        return redirect(url_for('dashboard.dashboard'))
+    
+    try:
+        relatorio = relatorio_otimizacao()
+    except Exception as e:
+        logger.error(f"Erro no relatório de otimização: {e}")
+        flash('Erro ao carregar relatório de otimização')
+        return redirect(url_for('arquivos.arquivos_cadastros'))
+    
+    total = {
+        'arquivos': sum(r['arquivos'] for r in relatorio),
+        'pendentes': sum(r['pendentes'] for r in relatorio),
+        'economia': sum(r['economia'] for r in relatorio),
+    }
+    return render_template('relatorio_otimizacao.html', relatorio=relatorio, total=total)
@@ -1,17 +1,13 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, send_from_directory, current_app
 from database import get_db_connection, registrar_auditoria
 from werkzeug.security import check_password_hash
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
+from extensions import limiter
 import logging
 
 logger = logging.getLogger(__name__)
 
 auth_bp = Blueprint('auth', __name__)
 
-# Rate limiter para este blueprint
-limiter = Limiter(key_func=get_remote_address)
-
 @auth_bp.route('/logo')
 def logo():
     """Rota específica para o logo"""
@@ -1,92 +1,158 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from database import get_db_connection, registrar_auditoria
+from database import get_db_connection, registrar_auditoria, inserir_arquivos_saude
+from cache_bus import publicar_invalidacao
+from uploads import validar_upload, info_upload
+from otimizacao import agendar_otimizacao
+from cadastro_schema import (COLUNAS, SQL_INSERT, SQL_SELECT_COMPARACAO, sql_update,
+                             linha_do_formulario, validate_field_lengths)
 from werkzeug.utils import secure_filename
 import psycopg2.extras
 import logging
 import traceback
-from datetime import datetime
+from datetime import datetime, date
+from decimal import Decimal
+import hashlib
+import json
 
 logger = logging.getLogger(__name__)
 
 cadastros_bp = Blueprint('cadastros', __name__)
 
-# Limites dos campos conforme definido na tabela do banco
-FIELD_LIMITS = {
-    'nome_completo': 255,
-    'numero': 10,
-    'bairro': 100,
-    'cep': 10,
-    'telefone': 20,
-    'titulo_eleitor': 20,
-    'cidade_titulo': 100,
-    'cpf': 14,
-    'rg': 20,
-    'nis': 20,
-    'estado_civil': 30,
-    'escolaridade': 100,
-    'profissao': 100,
-    'nome_companheiro': 255,
-    'cpf_companheiro': 14,
-    'rg_companheiro': 20,
-    'escolaridade_companheiro': 100,
-    'profissao_companheiro': 100,
-    'titulo_companheiro': 20,
-    'cidade_titulo_companheiro': 100,
-    'nis_companheiro': 20,
-    'tipo_trabalho': 100,
-    'casa_tipo': 50,
-    'casa_material': 50,
-    'energia': 10,
-    'lixo': 10,
-    'agua': 10,
-    'esgoto': 10,
-    'tem_doenca_cronica': 10,
-    'usa_medicamento_continuo': 10,
-    'tem_doenca_mental': 10,
-    'tem_deficiencia': 10,
-    'precisa_cuidados_especiais': 10,
-    'atua_ponto_fixo': 10,
-    'trabalho_continuo_temporada': 20,
-    'sofreu_acidente_trabalho': 10,
-    'trabalho_incomoda_calor': 10,
-    'trabalho_incomoda_barulho': 10,
-    'trabalho_incomoda_seguranca': 10,
-    'trabalho_incomoda_banheiros': 10,
-    'trabalho_incomoda_outro': 10,
-    'acesso_banheiro_agua': 10,
-    'possui_autorizacao_municipal': 10,
-    'problemas_fiscalizacao_policia': 10,
-    'estrutura_barraca': 10,
-    'estrutura_carrinho': 10,
-    'estrutura_mesa': 10,
-    'estrutura_outro': 10,
-    'necessita_energia_eletrica': 10,
-    'utiliza_gas_cozinha': 10,
-    'usa_veiculo_proprio': 10,
-    'fonte_renda_trabalho_ambulante': 10,
-    'fonte_renda_aposentadoria': 10,
-    'fonte_renda_outro_trabalho': 10,
-    'fonte_renda_beneficio_social': 10,
-    'fonte_renda_outro': 10
-}
-
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx'}
 
-def validate_field_lengths(form_data):
-    """Valida se os campos não excedem os limites da tabela"""
-    errors = []
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+# Colunas de dados_saude_pessoa preenchidas pelo formulário (sem cadastro_id)
+SAUDE_COLUNAS = [
+    'nome_pessoa', 'tem_doenca_cronica', 'doencas_cronicas', 'usa_medicamento_continuo', 'medicamentos',
+    'tem_doenca_mental', 'doencas_mentais', 'tem_deficiencia', 'deficiencias',
+    'precisa_cuidados_especiais', 'cuidados_especiais'
+]
+
+def arquivos_do_formulario(cadastro_id):
+    """Lê os uploads do formulário: (linhas para inserir_arquivos_saude, nomes para a mensagem)
+
+    Os arquivos já estão no spool do UploadRequest; aqui só entram os handles,
+    o conteúdo é lido no momento da gravação.
+    """
+    linhas = []
+    uploaded_files = []
+    for file_type in ['laudo', 'receita', 'imagem']:
+        # Processar arrays de arquivos
+        files = request.files.getlist(f'{file_type}[]')
+        descriptions = request.form.getlist(f'descricao_{file_type}[]')
+        
+        for i, file in enumerate(files):
+            if not file or not file.filename:
+                continue
+            erro = validar_upload(file, ALLOWED_EXTENSIONS)
+            if erro:
+                flash(erro, 'error')
+                continue
+            
+            logger.debug(f"Processando arquivo: {file.filename} ({file_type})")
+            tamanho, sha256, _ = info_upload(file)
+            descricao = descriptions[i] if i < len(descriptions) else ''
+            linhas.append((cadastro_id, file.filename, file_type, file.stream, descricao, tamanho, sha256))
+            uploaded_files.append(f"{file_type}: {file.filename}")
     
-    for field_name, max_length in FIELD_LIMITS.items():
-        if field_name in form_data:
-            value = str(form_data[field_name]).strip()
-            if len(value) > max_length:
-                field_display = field_name.replace('_', ' ').title()
-                errors.append(f"{field_display}: máximo {max_length} caracteres (atual: {len(value)})")
+    return linhas, uploaded_files
+
+def saude_do_formulario():
+    """Lista (id, valores) das pessoas do formulário; id é None para pessoas novas"""
+    pessoas = []
+    for key in request.form.keys():
+        if key.startswith('saude_nome_'):
+            pessoa_num = key.split('_')[-1]
+            nome_pessoa = request.form.get(f'saude_nome_{pessoa_num}')
+            
+            if nome_pessoa:  # Só processar se tem nome
+                # Processar checkboxes de condições
+                condicoes = request.form.getlist(f'saude_condicoes_{pessoa_num}[]')
+                
+                valores = (
+                    nome_pessoa,
+                    'Sim' if 'doenca_cronica' in condicoes else 'Não',
+                    request.form.get(f'saude_doencas_cronicas_{pessoa_num}', ''),
+                    'Sim' if 'medicamento' in condicoes else 'Não',
+                    request.form.get(f'saude_medicamentos_{pessoa_num}', ''),
+                    'Sim' if 'doenca_mental' in condicoes else 'Não',
+                    request.form.get(f'saude_doencas_mentais_{pessoa_num}', ''),
+                    'Sim' if 'deficiencia' in condicoes else 'Não',
+                    request.form.get(f'saude_deficiencias_{pessoa_num}', ''),
+                    'Sim' if 'cuidados' in condicoes else 'Não',
+                    request.form.get(f'saude_cuidados_especiais_{pessoa_num}', '')
+                )
+                pessoa_id = request.form.get(f'saude_id_{pessoa_num}', '')
+                pessoas.append((int(pessoa_id) if pessoa_id.isdigit() else None, valores))
     
-    return errors
+    return pessoas
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def normalizar_valor(valor):
+    """Forma comparável de um valor do banco ou do formulário"""
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, (Decimal, float)):
+        return round(float(valor), 2)
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return valor
+
+def diferenca_campos(campos, anteriores, novos):
+    """Retorna {campo: (anterior, novo)} apenas dos campos alterados"""
+    return {
+        campo: (anterior, novo)
+        for campo, anterior, novo in zip(campos, anteriores, novos)
+        if normalizar_valor(anterior) != normalizar_valor(novo)
+    }
+
+def inserir_saude(cursor, cadastro_id, linhas):
+    """Insere as pessoas informadas em uma única instrução"""
+    if linhas:
+        psycopg2.extras.execute_values(cursor,
+            f"INSERT INTO dados_saude_pessoa (cadastro_id, {', '.join(SAUDE_COLUNAS)}) VALUES %s",
+            [(cadastro_id,) + valores for valores in linhas])
+
+def sincronizar_saude(cursor, cadastro_id, pessoas):
+    """Aplica a diferença entre as pessoas do formulário e as gravadas
+
+    Pessoas novas são inseridas, alteradas são atualizadas e as que saíram do
+    formulário são removidas, cada grupo com uma única instrução. Retorna o
+    número de linhas alteradas.
+    """
+    colunas = ', '.join(SAUDE_COLUNAS)
+    cursor.execute(f'SELECT id, {colunas} FROM dados_saude_pessoa WHERE cadastro_id = %s', (cadastro_id,))
+    atuais = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+    
+    novas = []
+    alteradas = []
+    mantidas = set()
+    for pessoa_id, valores in pessoas:
+        if pessoa_id in atuais and pessoa_id not in mantidas:
+            mantidas.add(pessoa_id)
+            if atuais[pessoa_id] != valores:
+                alteradas.append((pessoa_id,) + valores)
+        else:
+            novas.append(valores)
+    
+    removidas = [pessoa_id for pessoa_id in atuais if pessoa_id not in mantidas]
+    if removidas:
+        cursor.execute('DELETE FROM dados_saude_pessoa WHERE id = ANY(%s)', (removidas,))
+    
+    if alteradas:
+        set_clauses = ', '.join(f"{coluna} = v.{coluna}" for coluna in SAUDE_COLUNAS)
+        # Os ids vêm de atuais, portanto já pertencem a este cadastro
+        psycopg2.extras.execute_values(cursor, f'''
+            UPDATE dados_saude_pessoa d SET {set_clauses}
+            FROM (VALUES %s) AS v (id, {colunas})
+            WHERE d.id = v.id
+        ''', alteradas)
+    
+    inserir_saude(cursor, cadastro_id, novas)
+    
+    logger.debug(f"Saúde: {len(novas)} inseridas, {len(alteradas)} atualizadas, {len(removidas)} removidas")
+    return len(novas) + len(alteradas) + len(removidas)
 
 @cadastros_bp.route('/cadastrar', methods=['GET', 'POST'])
 def cadastrar():
@@ -111,200 +177,40 @@ def cadastrar():
             cursor = conn.cursor()
             logger.debug("Conexão com banco estabelecida para cadastro")
             
-            # Preparar dados para INSERT - tratar valores vazios para INTEGER
-            def safe_int_or_null(value):
-                if value == '' or value is None:
-                    return None
-                try:
-                    return int(value)
-                except (ValueError, TypeError):
-                    return None
+            # Valores convertidos na ordem do registro de campos (cadastro_schema.py)
+            dados_insert = linha_do_formulario(request.form)
             
-            def safe_decimal_or_null(value):
-                if value == '' or value is None:
-                    return None
-                try:
-                    return float(value)
-                except (ValueError, TypeError):
-                    return None
+            logger.debug(f"Executando INSERT para novo cadastro com {len(dados_insert)} valores...")
+            cursor.execute(SQL_INSERT, dados_insert)
+            cadastro_id = cursor.fetchone()[0]
+            logger.debug(f"ID do cadastro inserido: {cadastro_id}")
             
-            dados_insert = (
-                request.form.get('nome_completo'), request.form.get('endereco'), request.form.get('numero'),
-                request.form.get('bairro'), request.form.get('cep'), request.form.get('cidade'), request.form.get('estado'), request.form.get('telefone'),
-                request.form.get('ponto_referencia'), request.form.get('genero'), safe_int_or_null(request.form.get('idade')),
-                request.form.get('data_nascimento'), request.form.get('titulo_eleitor'), request.form.get('cidade_titulo'),
-                request.form.get('cpf'), request.form.get('rg'), request.form.get('nis'),
-                request.form.get('estado_civil'), request.form.get('escolaridade'), request.form.get('profissao'),
-                request.form.get('nome_companheiro'), request.form.get('cpf_companheiro'), request.form.get('rg_companheiro'),
-                safe_int_or_null(request.form.get('idade_companheiro')), request.form.get('escolaridade_companheiro'), request.form.get('profissao_companheiro'),
-                request.form.get('data_nascimento_companheiro'), request.form.get('titulo_companheiro'), request.form.get('cidade_titulo_companheiro'),
-                request.form.get('nis_companheiro'), request.form.get('tipo_trabalho'), safe_int_or_null(request.form.get('pessoas_trabalham')),
-                safe_int_or_null(request.form.get('aposentados_pensionistas')), safe_int_or_null(request.form.get('num_pessoas_familia')), safe_int_or_null(request.form.get('num_familias')),
-                safe_int_or_null(request.form.get('adultos')), safe_int_or_null(request.form.get('criancas')), safe_int_or_null(request.form.get('adolescentes')),
-                safe_int_or_null(request.form.get('idosos')), safe_int_or_null(request.form.get('gestantes')), safe_int_or_null(request.form.get('nutrizes')),
-                safe_decimal_or_null(request.form.get('renda_familiar')), safe_decimal_or_null(request.form.get('renda_per_capita')), safe_decimal_or_null(request.form.get('bolsa_familia')),
-                request.form.get('casa_tipo'), request.form.get('casa_material'), request.form.get('energia'),
-                request.form.get('lixo'), request.form.get('agua'), request.form.get('esgoto'),
-                request.form.get('observacoes'), request.form.get('tem_doenca_cronica'), request.form.get('doencas_cronicas'),
-                request.form.get('usa_medicamento_continuo'), request.form.get('medicamentos_continuos'), request.form.get('tem_doenca_mental'),
-                request.form.get('doencas_mentais'), request.form.get('tem_deficiencia'), request.form.get('tipo_deficiencia'),
-                request.form.get('precisa_cuidados_especiais'), request.form.get('cuidados_especiais'),
-                # Novos campos de trabalho
-                request.form.get('com_que_trabalha'), request.form.get('onde_trabalha'), request.form.get('localizacao_trabalho'), request.form.get('horario_trabalho'),
-                request.form.get('tempo_atividade'), request.form.get('atua_ponto_fixo'), request.form.get('qual_ponto_fixo'),
-                safe_int_or_null(request.form.get('dias_semana_trabalha')), request.form.get('trabalho_continuo_temporada'),
-                request.form.get('sofreu_acidente_trabalho'), request.form.get('qual_acidente'),
-                request.form.get('trabalho_incomoda_calor'), request.form.get('trabalho_incomoda_barulho'),
-                request.form.get('trabalho_incomoda_seguranca'), request.form.get('trabalho_incomoda_banheiros'),
-                request.form.get('trabalho_incomoda_outro'), request.form.get('trabalho_incomoda_outro_desc'),
-                request.form.get('acesso_banheiro_agua'), safe_int_or_null(request.form.get('trabalha_sozinho_ajudantes')),
-                request.form.get('possui_autorizacao_municipal'), request.form.get('problemas_fiscalizacao_policia'),
-                request.form.get('estrutura_barraca'), request.form.get('estrutura_carrinho'),
-                request.form.get('estrutura_mesa'), request.form.get('estrutura_outro'), request.form.get('estrutura_outro_desc'),
-                request.form.get('necessita_energia_eletrica'), request.form.get('utiliza_gas_cozinha'),
-                request.form.get('usa_veiculo_proprio'), request.form.get('qual_veiculo'),
-                request.form.get('fonte_renda_trabalho_ambulante'), request.form.get('fonte_renda_aposentadoria'),
-                request.form.get('fonte_renda_outro_trabalho'), request.form.get('fonte_renda_beneficio_social'),
-                request.form.get('fonte_renda_outro'), request.form.get('fonte_renda_outro_desc'),
-                safe_int_or_null(request.form.get('pessoas_dependem_renda')),
-                request.form.get('foto_base64')  # Campo da foto
-            )
+            # Arquivos e dados de saúde na mesma transação, uma instrução por tabela
+            linhas_arquivos, uploaded_files = arquivos_do_formulario(cadastro_id)
+            arquivos_ids = inserir_arquivos_saude(cursor, linhas_arquivos)
             
-            logger.debug(f"📊 Preparando INSERT com {len(dados_insert)} valores")
+            logger.debug("Processando dados de saúde por pessoa...")
+            pessoas_saude = saude_do_formulario()
+            inserir_saude(cursor, cadastro_id, [valores for _, valores in pessoas_saude])
+            logger.info(f"✅ Dados de saúde salvos para {len(pessoas_saude)} pessoas")
             
-            logger.debug("Executando INSERT para novo cadastro...")
-            cursor.execute("""INSERT INTO cadastros (
-            nome_completo, endereco, numero, bairro, cep, cidade, estado, telefone, ponto_referencia, genero, idade,
-            data_nascimento, titulo_eleitor, cidade_titulo, cpf, rg, nis, estado_civil,
-            escolaridade, profissao, nome_companheiro, cpf_companheiro, rg_companheiro,
-            idade_companheiro, escolaridade_companheiro, profissao_companheiro, data_nascimento_companheiro,
-            titulo_companheiro, cidade_titulo_companheiro, nis_companheiro, tipo_trabalho,
-            pessoas_trabalham, aposentados_pensionistas, num_pessoas_familia, num_familias,
-            adultos, criancas, adolescentes, idosos, gestantes, nutrizes, renda_familiar,
-            renda_per_capita, bolsa_familia, casa_tipo, casa_material, energia, lixo, agua,
-            esgoto, observacoes, tem_doenca_cronica, doencas_cronicas, usa_medicamento_continuo,
-            medicamentos_continuos, tem_doenca_mental, doencas_mentais, tem_deficiencia,
-            tipo_deficiencia, precisa_cuidados_especiais, cuidados_especiais,
-            com_que_trabalha, onde_trabalha, localizacao_trabalho, horario_trabalho, tempo_atividade, atua_ponto_fixo,
-            qual_ponto_fixo, dias_semana_trabalha, trabalho_continuo_temporada, sofreu_acidente_trabalho,
-            qual_acidente, trabalho_incomoda_calor, trabalho_incomoda_barulho, trabalho_incomoda_seguranca,
-            trabalho_incomoda_banheiros, trabalho_incomoda_outro, trabalho_incomoda_outro_desc,
-            acesso_banheiro_agua, trabalha_sozinho_ajudantes, possui_autorizacao_municipal,
-            problemas_fiscalizacao_policia, estrutura_barraca, estrutura_carrinho, estrutura_mesa,
-            estrutura_outro, estrutura_outro_desc, necessita_energia_eletrica, utiliza_gas_cozinha,
-            usa_veiculo_proprio, qual_veiculo, fonte_renda_trabalho_ambulante, fonte_renda_aposentadoria,
-            fonte_renda_outro_trabalho, fonte_renda_beneficio_social, fonte_renda_outro,
-            fonte_renda_outro_desc, pessoas_dependem_renda, foto_base64
-        ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)""",
-            dados_insert)
+            publicar_invalidacao('cadastros', cursor=cursor)
+            publicar_invalidacao('arquivos', cursor=cursor)
             conn.commit()
-            
-            logger.info("✅ INSERT executado com sucesso!")
-            
-            # Invalidar cache de estatísticas
-            from blueprints.dashboard import invalidate_stats_cache
-            invalidate_stats_cache()
+            conn.close()
+            logger.info("✅ Cadastro e arquivos salvos com sucesso no banco")
+            agendar_otimizacao('arquivos_saude', arquivos_ids)
             
             # Registrar auditoria
             registrar_auditoria(
                 usuario=session.get('usuario', 'Sistema'),
                 acao='INSERT',
                 tabela='cadastros',
+                registro_id=cadastro_id,
                 dados_novos=f"Nome: {request.form.get('nome_completo')}, CPF: {request.form.get('cpf')}",
                 ip_address=request.remote_addr,
                 user_agent=request.headers.get('User-Agent')
             )
-        
-            # Para obter o ID do cadastro inserido, usar a mesma conexão
-            logger.debug("🔍 Buscando ID do cadastro inserido...")
-            
-            cursor.execute('SELECT id FROM cadastros ORDER BY id DESC LIMIT 1')
-            
-            result = cursor.fetchone()
-            if result:
-                # PostgreSQL RealDictCursor
-                if hasattr(result, 'keys'):
-                    cadastro_id = result['id']
-                else:  # Tuple result
-                    cadastro_id = result[0]
-                logger.debug(f"ID do cadastro inserido: {cadastro_id}")
-            else:
-                cadastro_id = None
-                logger.error("❌ Não foi possível obter o ID do cadastro inserido")
-            
-            # Upload de arquivos usando a mesma conexão
-            uploaded_files = []
-            if cadastro_id:
-                for file_type in ['laudo', 'receita', 'imagem']:
-                    # Processar arrays de arquivos
-                    files = request.files.getlist(f'{file_type}[]')
-                    descriptions = request.form.getlist(f'descricao_{file_type}[]')
-                    
-                    for i, file in enumerate(files):
-                        if file and file.filename and allowed_file(file.filename):
-                            logger.debug(f"Processando arquivo: {file.filename} ({file_type})")
-                            file_data = file.read()
-                            descricao = descriptions[i] if i < len(descriptions) else ''
-                            
-                            cursor.execute('INSERT INTO arquivos_saude (cadastro_id, nome_arquivo, tipo_arquivo, arquivo_dados, descricao) VALUES (%s, %s, %s, %s, %s)', 
-                                        (cadastro_id, file.filename, file_type, file_data, descricao))
-                            
-                            uploaded_files.append(f"{file_type}: {file.filename}")
-                            logger.debug(f"Arquivo {file.filename} salvo com sucesso")
-            
-            # Processar dados de saúde por pessoa
-            if cadastro_id:
-                logger.debug("Processando dados de saúde por pessoa...")
-                pessoas_saude = []
-                
-                # Buscar todos os campos de saúde por pessoa
-                for key in request.form.keys():
-                    if key.startswith('saude_nome_'):
-                        pessoa_num = key.split('_')[-1]
-                        nome_pessoa = request.form.get(f'saude_nome_{pessoa_num}')
-                        
-                        if nome_pessoa:  # Só processar se tem nome
-                            # Processar checkboxes de condições
-                            condicoes = request.form.getlist(f'saude_condicoes_{pessoa_num}[]')
-                            
-                            dados_pessoa = {
-                                'nome_pessoa': nome_pessoa,
-                                'tem_doenca_cronica': 'Sim' if 'doenca_cronica' in condicoes else 'Não',
-                                'doencas_cronicas': request.form.get(f'saude_doencas_cronicas_{pessoa_num}', ''),
-                                'usa_medicamento_continuo': 'Sim' if 'medicamento' in condicoes else 'Não',
-                                'medicamentos': request.form.get(f'saude_medicamentos_{pessoa_num}', ''),
-                                'tem_doenca_mental': 'Sim' if 'doenca_mental' in condicoes else 'Não',
-                                'doencas_mentais': request.form.get(f'saude_doencas_mentais_{pessoa_num}', ''),
-                                'tem_deficiencia': 'Sim' if 'deficiencia' in condicoes else 'Não',
-                                'deficiencias': request.form.get(f'saude_deficiencias_{pessoa_num}', ''),
-                                'precisa_cuidados_especiais': 'Sim' if 'cuidados' in condicoes else 'Não',
-                                'cuidados_especiais': request.form.get(f'saude_cuidados_especiais_{pessoa_num}', '')
-                            }
-                            
-                            # Inserir dados de saúde da pessoa
-                            cursor.execute('''
-                                INSERT INTO dados_saude_pessoa (
-                                    cadastro_id, nome_pessoa, tem_doenca_cronica, doencas_cronicas,
-                                    usa_medicamento_continuo, medicamentos, tem_doenca_mental, doencas_mentais,
-                                    tem_deficiencia, deficiencias, precisa_cuidados_especiais, cuidados_especiais
-                                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                            ''', (
-                                cadastro_id, dados_pessoa['nome_pessoa'], dados_pessoa['tem_doenca_cronica'],
-                                dados_pessoa['doencas_cronicas'], dados_pessoa['usa_medicamento_continuo'],
-                                dados_pessoa['medicamentos'], dados_pessoa['tem_doenca_mental'],
-                                dados_pessoa['doencas_mentais'], dados_pessoa['tem_deficiencia'],
-                                dados_pessoa['deficiencias'], dados_pessoa['precisa_cuidados_especiais'],
-                                dados_pessoa['cuidados_especiais']
-                            ))
-                            
-                            pessoas_saude.append(nome_pessoa)
-                            logger.debug(f"Dados de saúde salvos para: {nome_pessoa}")
-                
-                logger.info(f"✅ Dados de saúde salvos para {len(pessoas_saude)} pessoas")
-            
-            conn.commit()
-            conn.close()
-            logger.info("✅ Cadastro e arquivos salvos com sucesso no banco")
             
             if uploaded_files:
                 logger.info(f"📎 Arquivos enviados: {', '.join(uploaded_files)}")
@@ -373,153 +279,70 @@ def atualizar_cadastro(cadastro_id,):
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Campos do formulário
-        campos = [
-            'nome_completo', 'endereco', 'numero', 'bairro', 'cep', 'cidade', 'estado', 'telefone', 'ponto_referencia',
-            'genero', 'idade', 'data_nascimento', 'titulo_eleitor', 'cidade_titulo',
-            'cpf', 'rg', 'nis', 'estado_civil', 'escolaridade', 'profissao',
-            'nome_companheiro', 'cpf_companheiro', 'rg_companheiro', 'idade_companheiro',
-            'escolaridade_companheiro', 'profissao_companheiro', 'data_nascimento_companheiro',
-            'titulo_companheiro', 'cidade_titulo_companheiro', 'nis_companheiro', 'tipo_trabalho',
-            'pessoas_trabalham', 'aposentados_pensionistas', 'num_pessoas_familia', 'num_familias',
-            'adultos', 'criancas', 'adolescentes', 'idosos', 'gestantes', 'nutrizes',
-            'renda_familiar', 'renda_per_capita', 'bolsa_familia', 'casa_tipo', 'casa_material',
-            'energia', 'lixo', 'agua', 'esgoto', 'observacoes', 'tem_doenca_cronica',
-            'doencas_cronicas', 'usa_medicamento_continuo', 'medicamentos_continuos',
-            'tem_doenca_mental', 'doencas_mentais', 'tem_deficiencia', 'tipo_deficiencia',
-            'precisa_cuidados_especiais', 'cuidados_especiais',
-            'com_que_trabalha', 'onde_trabalha', 'localizacao_trabalho', 'horario_trabalho', 'tempo_atividade',
-            'atua_ponto_fixo', 'qual_ponto_fixo', 'dias_semana_trabalha', 'trabalho_continuo_temporada',
-            'sofreu_acidente_trabalho', 'qual_acidente', 'trabalho_incomoda_calor',
-            'trabalho_incomoda_barulho', 'trabalho_incomoda_seguranca', 'trabalho_incomoda_banheiros',
-            'trabalho_incomoda_outro', 'trabalho_incomoda_outro_desc', 'acesso_banheiro_agua',
-            'trabalha_sozinho_ajudantes', 'possui_autorizacao_municipal', 'problemas_fiscalizacao_policia',
-            'estrutura_barraca', 'estrutura_carrinho', 'estrutura_mesa', 'estrutura_outro',
-            'estrutura_outro_desc', 'necessita_energia_eletrica', 'utiliza_gas_cozinha',
-            'usa_veiculo_proprio', 'qual_veiculo', 'fonte_renda_trabalho_ambulante',
-            'fonte_renda_aposentadoria', 'fonte_renda_outro_trabalho', 'fonte_renda_beneficio_social',
-            'fonte_renda_outro', 'fonte_renda_outro_desc', 'pessoas_dependem_renda', 'foto_base64'
-        ]
+        campos = COLUNAS
+        valores = linha_do_formulario(request.form, '')
         
-        def safe_int_or_null(value):
-            if value == '' or value is None:
-                return None
-            try:
-                return int(value)
-            except (ValueError, TypeError):
-                return None
+        # Linha atual; a foto é comparada pelo hash para não trafegar o base64
+        cursor.execute(SQL_SELECT_COMPARACAO, (cadastro_id,))
+        atual = cursor.fetchone()
         
-        def safe_decimal_or_null(value):
-            if value == '' or value is None:
-                return None
-            try:
-                return float(value)
-            except (ValueError, TypeError):
-                return None
+        if not atual:
+            flash('Cadastro não encontrado!')
+            return redirect(url_for('dashboard.dashboard'))
         
-        campos_int = ['idade', 'idade_companheiro', 'pessoas_trabalham', 'aposentados_pensionistas', 
-                     'num_pessoas_familia', 'num_familias', 'adultos', 'criancas', 'adolescentes', 
-                     'idosos', 'gestantes', 'nutrizes', 'dias_semana_trabalha', 'pessoas_dependem_renda']
+        foto = valores[campos.index('foto_base64')]
+        comparaveis = [hashlib.md5(foto.encode()).hexdigest() if campo == 'foto_base64' and foto else valor
+                       for campo, valor in zip(campos, valores)]
+        alterados = diferenca_campos(campos, atual, comparaveis)
         
-        campos_decimal = ['renda_familiar', 'renda_per_capita', 'bolsa_familia']
+        # UPDATE apenas das colunas alteradas (nenhum quando nada mudou)
+        if alterados:
+            novos_valores = dict(zip(campos, valores))
+            cursor.execute(sql_update(tuple(alterados)),
+                           [novos_valores[campo] for campo in alterados] + [cadastro_id])
         
-        valores = []
-        for campo in campos:
-            value = request.form.get(campo, '')
-            if campo in campos_int:
-                valores.append(safe_int_or_null(value))
-            elif campo in campos_decimal:
-                valores.append(safe_decimal_or_null(value))
-            else:
-                valores.append(value)
+        # Upload de novos arquivos
+        linhas_arquivos, uploaded_files = arquivos_do_formulario(cadastro_id)
+        arquivos_ids = inserir_arquivos_saude(cursor, linhas_arquivos)
+        if linhas_arquivos:
+            publicar_invalidacao('arquivos', cursor=cursor)
         
-        valores.append(cadastro_id,)
+        # Processar dados de saúde por pessoa (apenas as diferenças)
+        saude_alterada = sincronizar_saude(cursor, cadastro_id, saude_do_formulario())
         
-        set_clauses = [f"{campo} = %s" for campo in campos]
-        sql_update = f"UPDATE cadastros SET {', '.join(set_clauses)} WHERE id = %s"
+        if not (alterados or linhas_arquivos or saude_alterada):
+            conn.rollback()
+            flash('Nenhuma alteração foi feita no cadastro.')
+            return redirect(url_for('dashboard.dashboard'))
         
-        cursor.execute(sql_update, valores)
+        publicar_invalidacao('cadastros', cursor=cursor)
+        conn.commit()
+        agendar_otimizacao('arquivos_saude', arquivos_ids)
         
-        rows_affected = cursor.rowcount
+        # A foto entra na auditoria apenas como indicação de troca
+        anteriores = {campo: ('[foto]' if campo == 'foto_base64' and antes else antes)
+                      for campo, (antes, _) in alterados.items()}
+        novos = {campo: ('[foto]' if campo == 'foto_base64' and depois else novos_valores[campo])
+                 for campo, (_, depois) in alterados.items()}
+        if uploaded_files:
+            novos['arquivos_adicionados'] = uploaded_files
+        if saude_alterada:
+            novos['dados_saude_alterados'] = saude_alterada
+        registrar_auditoria(
+            usuario=session.get('usuario', 'Sistema'),
+            acao='UPDATE',
+            tabela='cadastros',
+            registro_id=cadastro_id,
+            dados_anteriores=json.dumps(anteriores, ensure_ascii=False, default=str),
+            dados_novos=json.dumps(novos, ensure_ascii=False, default=str),
+            ip_address=request.remote_addr,
+            user_agent=request.headers.get('User-Agent')
+        )
         
-        if rows_affected > 0:
-            # Upload de novos arquivos
-            uploaded_files = []
-            for file_type in ['laudo', 'receita', 'imagem']:
-                files = request.files.getlist(f'{file_type}[]')
-                descriptions = request.form.getlist(f'descricao_{file_type}[]')
-                
-                for i, file in enumerate(files):
-                    if file and file.filename and allowed_file(file.filename):
-                        file_data = file.read()
-                        descricao = descriptions[i] if i < len(descriptions) else ''
-                        
-                        cursor.execute('INSERT INTO arquivos_saude (cadastro_id, nome_arquivo, tipo_arquivo, arquivo_dados, descricao) VALUES (%s, %s, %s, %s, %s)', 
-                                    (cadastro_id, file.filename, file_type, file_data, descricao))
-                        
-                        uploaded_files.append(f"{file_type}: {file.filename}")
-            
-            # Processar dados de saúde por pessoa
-            cursor.execute('DELETE FROM dados_saude_pessoa WHERE cadastro_id = %s', (cadastro_id,))
-            
-            pessoas_saude = []
-            for key in request.form.keys():
-                if key.startswith('saude_nome_'):
-                    pessoa_num = key.split('_')[-1]
-                    nome_pessoa = request.form.get(f'saude_nome_{pessoa_num}')
-                    
-                    if nome_pessoa:
-                        condicoes = request.form.getlist(f'saude_condicoes_{pessoa_num}[]')
-                        
-                        dados_pessoa = {
-                            'nome_pessoa': nome_pessoa,
-                            'tem_doenca_cronica': 'Sim' if 'doenca_cronica' in condicoes else 'Não',
-                            'doencas_cronicas': request.form.get(f'saude_doencas_cronicas_{pessoa_num}', ''),
-                            'usa_medicamento_continuo': 'Sim' if 'medicamento' in condicoes else 'Não',
-                            'medicamentos': request.form.get(f'saude_medicamentos_{pessoa_num}', ''),
-                            'tem_doenca_mental': 'Sim' if 'doenca_mental' in condicoes else 'Não',
-                            'doencas_mentais': request.form.get(f'saude_doencas_mentais_{pessoa_num}', ''),
-                            'tem_deficiencia': 'Sim' if 'deficiencia' in condicoes else 'Não',
-                            'deficiencias': request.form.get(f'saude_deficiencias_{pessoa_num}', ''),
-                            'precisa_cuidados_especiais': 'Sim' if 'cuidados' in condicoes else 'Não',
-                            'cuidados_especiais': request.form.get(f'saude_cuidados_especiais_{pessoa_num}', '')
-                        }
-                        
-                        cursor.execute('''
-                            INSERT INTO dados_saude_pessoa (
-                                cadastro_id, nome_pessoa, tem_doenca_cronica, doencas_cronicas,
-                                usa_medicamento_continuo, medicamentos, tem_doenca_mental, doencas_mentais,
-                                tem_deficiencia, deficiencias, precisa_cuidados_especiais, cuidados_especiais
-                            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ''', (
-                            cadastro_id, dados_pessoa['nome_pessoa'], dados_pessoa['tem_doenca_cronica'],
-                            dados_pessoa['doencas_cronicas'], dados_pessoa['usa_medicamento_continuo'],
-                            dados_pessoa['medicamentos'], dados_pessoa['tem_doenca_mental'],
-                            dados_pessoa['doencas_mentais'], dados_pessoa['tem_deficiencia'],
-                            dados_pessoa['deficiencias'], dados_pessoa['precisa_cuidados_especiais'],
-                            dados_pessoa['cuidados_especiais']
-                        ))
-                        
-                        pessoas_saude.append(nome_pessoa)
-            
-            conn.commit()
-            
-            registrar_auditoria(
-                usuario=session.get('usuario', 'Sistema'),
-                acao='UPDATE',
-                tabela='cadastros',
-                registro_id=cadastro_id,
-                dados_novos=f"Nome: {request.form.get('nome_completo')}, CPF: {request.form.get('cpf')}",
-                ip_address=request.remote_addr,
-                user_agent=request.headers.get('User-Agent')
-            )
-            
-            if uploaded_files:
-                flash(f'Cadastro atualizado com sucesso! Novos arquivos: {", ".join(uploaded_files)}')
-            else:
-                flash('Cadastro atualizado com sucesso!')
+        if uploaded_files:
+            flash(f'Cadastro atualizado com sucesso! Novos arquivos: {", ".join(uploaded_files)}')
         else:
-            flash('Nenhuma alteração foi feita no cadastro.')
+            flash('Cadastro atualizado com sucesso!')
         
     except Exception as e:
         logger.error(f"Erro ao atualizar cadastro: {e}")
@@ -549,6 +372,8 @@ def deletar_cadastro(cadastro_id,):
         cadastros_deletados = cursor.rowcount
         
         if cadastros_deletados > 0:
+            publicar_invalidacao('cadastros', cursor=cursor)
+            publicar_invalidacao('arquivos', cursor=cursor)
             conn.commit()
             flash('Cadastro deletado com sucesso!')
         else:
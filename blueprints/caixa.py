@@ -1,7 +1,13 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, send_file
-from database import get_db_connection, registrar_auditoria, usuario_tem_permissao, inserir_movimentacao_caixa, inserir_comprovante_caixa, listar_movimentacoes_caixa, obter_saldo_caixa, listar_cadastros_simples, obter_comprovantes_movimentacao
+from flask import Blueprint, render_template, stream_template, Response, request, redirect, url_for, flash, session, send_file
+from database import get_db_connection, registrar_auditoria, usuario_tem_permissao, inserir_movimentacao_caixa, inserir_comprovante_caixa, listar_movimentacoes_caixa, obter_saldo_caixa, listar_cadastros_simples, obter_comprovantes_movimentacao, obter_totais_caixa_periodo, obter_resumo_caixa, iterar_movimentacoes_caixa
+from cache_bus import publicar_invalidacao
+from uploads import validar_upload, info_upload
+from otimizacao import agendar_otimizacao
+from previas import resposta_previa
+from extensions import limite_recursos_pagina
 import psycopg2.extras
 import io
+from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,9 +16,19 @@ caixa_bp = Blueprint('caixa', __name__)
 
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx'}
 
+# Movimentações por página no relatório (paginação por chave)
+RELATORIO_POR_PAGINA = 500
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def _parse_data(valor):
+    """Converte 'AAAA-MM-DD' do formulário em date (None se vazio ou inválido)"""
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date() if valor else None
+    except ValueError:
+        return None
+
 @caixa_bp.route('/caixa', methods=['GET', 'POST'])
 def caixa():
     if 'usuario' not in session:
@@ -52,28 +68,23 @@ def caixa():
             
             for comprovante in comprovantes:
                 if comprovante and comprovante.filename:
-                    # Validar tipo de arquivo
-                    if not allowed_file(comprovante.filename):
-                        flash(f'Tipo de arquivo não permitido: {comprovante.filename}', 'error')
-                        continue
-                    
-                    # Validar tamanho (16MB máximo)
-                    comprovante.seek(0, 2)  # Ir para o final
-                    size = comprovante.tell()
-                    comprovante.seek(0)  # Voltar ao início
-                    
-                    if size > 16 * 1024 * 1024:  # 16MB
-                        flash(f'Arquivo muito grande: {comprovante.filename}', 'error')
+                    # Validar tipo e conteúdo (o tamanho já foi limitado durante o upload)
+                    erro = validar_upload(comprovante, ALLOWED_EXTENSIONS)
+                    if erro:
+                        flash(erro, 'error')
                         continue
                     
-                    # Salvar comprovante
-                    arquivo_dados = comprovante.read()
-                    inserir_comprovante_caixa(
+                    # Salvar comprovante a partir do spool do upload
+                    tamanho, sha256, _ = info_upload(comprovante)
+                    comprovante_id = inserir_comprovante_caixa(
                         movimentacao_id, 
                         comprovante.filename,
                         comprovante.content_type,
-                        arquivo_dados
+                        comprovante.stream,
+                        tamanho=tamanho,
+                        sha256=sha256
                     )
+                    agendar_otimizacao('comprovantes_caixa', [comprovante_id])
             
             flash(f'Movimentação de {tipo} registrada com sucesso!', 'success')
             return redirect(url_for('caixa.caixa'))
@@ -114,23 +125,51 @@ def relatorio_caixa():
         data_inicio = request.args.get('data_inicio', '')
         data_fim = request.args.get('data_fim', '')
         
-        # Obter todas as movimentações (sem limite para relatório)
-        movimentacoes = listar_movimentacoes_caixa(limit=1000, tipo=tipo if tipo else None)
+        periodo_inicio = _parse_data(data_inicio)
+        periodo_fim = _parse_data(data_fim)
         
-        # Calcular totais
-        total_entradas = sum(m['valor'] for m in movimentacoes if m['tipo'] == 'entrada')
-        total_saidas = sum(m['valor'] for m in movimentacoes if m['tipo'] == 'saida')
+        # Página atual (paginação por chave em (data_movimentacao, id))
+        antes = None
+        antes_data = request.args.get('antes_data', '')
+        antes_id = request.args.get('antes_id', type=int)
+        if antes_data and antes_id:
+            try:
+                antes = (datetime.fromisoformat(antes_data), antes_id)
+            except ValueError:
+                antes = None
+        
+        # Totais do livro-caixa: resumos mensais + bordas do período
+        if periodo_inicio or periodo_fim:
+            totais = obter_totais_caixa_periodo(periodo_inicio, periodo_fim)
+        else:
+            totais = obter_saldo_caixa()
+        
+        total_entradas = totais['total_entradas'] if tipo != 'saida' else 0.0
+        total_saidas = totais['total_saidas'] if tipo != 'entrada' else 0.0
         saldo_total = total_entradas - total_saidas
         
-        return render_template('relatorio_caixa.html',
+        # Quebras por tipo, usuário e mês calculadas no banco
+        resumo = obter_resumo_caixa(tipo or None, periodo_inicio, periodo_fim)
+        
+        # Linhas da página geradas direto do cursor do servidor enquanto o HTML é enviado
+        movimentacoes = iterar_movimentacoes_caixa(RELATORIO_POR_PAGINA, tipo or None,
+                                                   periodo_inicio, periodo_fim, antes)
+        
+        filtros = {k: v for k, v in (('tipo', tipo), ('data_inicio', data_inicio), ('data_fim', data_fim)) if v}
+        
+        return Response(stream_template('relatorio_caixa.html',
                              movimentacoes=movimentacoes,
+                             por_pagina=RELATORIO_POR_PAGINA,
+                             filtros=filtros,
+                             primeira_pagina=antes is None,
+                             resumo=resumo,
                              total_entradas=total_entradas,
                              total_saidas=total_saidas,
                              saldo_total=saldo_total,
                              filtro_tipo=tipo,
                              filtro_data_inicio=data_inicio,
                              filtro_data_fim=data_fim,
-                             )
+                             ))
     
     except Exception as e:
         logger.error(f"Erro ao gerar relatório de caixa: {e}")
@@ -160,6 +199,7 @@ def excluir_movimentacao(movimentacao_id,):
         
         # Excluir movimentação (comprovantes são excluídos automaticamente por CASCADE)
         cursor.execute('DELETE FROM movimentacoes_caixa WHERE id = %s', (movimentacao_id,))
+        publicar_invalidacao('caixa', cursor=cursor)
         
         conn.commit()
         cursor.close()
@@ -268,6 +308,7 @@ def editar_movimentacao(movimentacao_id,):
                 flash('Erro ao atualizar movimentação', 'error')
                 return redirect(url_for('caixa.editar_movimentacao', movimentacao_id=movimentacao_id))
             
+            publicar_invalidacao('caixa', cursor=cursor)
             conn.commit()
             cursor.close()
             conn.close()
@@ -362,6 +403,22 @@ def download_comprovante(comprovante_id):
         flash('Erro ao baixar comprovante', 'error')
         return redirect(url_for('caixa.caixa'))
 
+@caixa_bp.route('/previa_comprovante/<int:comprovante_id>')
+@limite_recursos_pagina
+def previa_comprovante(comprovante_id):
+    if 'usuario' not in session:
+        return redirect(url_for('auth.login'))
+    
+    if not usuario_tem_permissao(session['usuario'], 'caixa'):
+        return '', 403
+    
+    try:
+        resposta = resposta_previa('comprovantes_caixa', comprovante_id)
+    except Exception as e:
+        logger.error(f"Erro ao gerar prévia do comprovante {comprovante_id}: {e}")
+        return '', 500
+    return resposta or ('', 404)
+
 @caixa_bp.route('/exportar_comprovantes_pdf/<int:movimentacao_id>')
 def exportar_comprovantes_pdf(movimentacao_id,):
     if 'usuario' not in session:
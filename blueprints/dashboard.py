@@ -1,5 +1,7 @@
 from flask import Blueprint, render_template, session, redirect, url_for
-from database import get_db_connection, usuario_tem_permissao
+from database import get_db_connection, usuario_tem_permissao, obter_contadores
+from cache_bus import registrar_cache, ttl_efetivo
+from singleflight import executar
 from datetime import datetime
 import logging
 
@@ -7,60 +9,57 @@ logger = logging.getLogger(__name__)
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
-# Cache simples em memória para estatísticas
+# Cache em memória para estatísticas, invalidado entre workers pelo cache_bus
 stats_cache = {
     'data': None,
     'timestamp': None,
-    'ttl': 300  # 5 minutos
+    'ttl': 600  # 10 minutos (cai para o TTL de segurança se o listener estiver fora)
 }
 
+def _stats_validas(now):
+    return (stats_cache['data'] is not None and 
+            stats_cache['timestamp'] is not None and
+            (now - stats_cache['timestamp']).total_seconds() < ttl_efetivo(stats_cache['ttl']))
+
 def get_cached_stats():
     """Retorna estatísticas do cache ou busca no banco se expirado"""
-    now = datetime.now()
-    
     # Verificar se cache é válido
-    if (stats_cache['data'] is not None and 
-        stats_cache['timestamp'] is not None and
-        (now - stats_cache['timestamp']).seconds < stats_cache['ttl']):
+    if _stats_validas(datetime.now()):
         return stats_cache['data']
     
-    # Cache expirado, buscar dados atualizados
+    # Cache expirado: apenas uma thread busca, as demais aguardam o mesmo resultado
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Contar registros otimizado
-        cursor.execute('SELECT COUNT(*) FROM cadastros')
-        total_cadastros = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM arquivos_saude')
-        total_arquivos = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM usuarios WHERE tipo = %s', ('admin',))
-        total_admins = cursor.fetchone()[0]
-        
-        cursor.close()
-        conn.close()
-        
-        # Atualizar cache
-        stats_cache['data'] = {
-            'total': total_cadastros,
-            'arquivos': total_arquivos,
-            'admins': total_admins
-        }
-        stats_cache['timestamp'] = now
-        
-        return stats_cache['data']
-        
+        return executar('dashboard_stats', _buscar_stats)
     except Exception as e:
         logger.error(f"Erro ao buscar estatísticas: {e}")
-        return {'total': 0, 'arquivos': 0, 'admins': 0}
+        return {'total': 0, 'arquivos': 0, 'admins': 0, 'auditoria': 0}
 
-def invalidate_stats_cache():
+def _buscar_stats():
+    """Lê os contadores mantidos por triggers (uma busca indexada) e atualiza o cache"""
+    now = datetime.now()
+    if _stats_validas(now):
+        return stats_cache['data']
+    
+    contadores = obter_contadores('cadastros', 'arquivos_saude', 'usuarios_admin', 'auditoria')
+    
+    # Atualizar cache
+    stats_cache['data'] = {
+        'total': contadores['cadastros'],
+        'arquivos': contadores['arquivos_saude'],
+        'admins': contadores['usuarios_admin'],
+        'auditoria': contadores['auditoria']
+    }
+    stats_cache['timestamp'] = now
+    
+    return stats_cache['data']
+
+def invalidate_stats_cache(chave=None):
     """Invalida o cache de estatísticas"""
     stats_cache['data'] = None
     stats_cache['timestamp'] = None
 
+registrar_cache(('cadastros', 'arquivos', 'permissoes', 'auditoria'), invalidate_stats_cache)
+
 @dashboard_bp.route('/dashboard')
 def dashboard():
     if 'usuario' not in session:
@@ -97,7 +96,7 @@ def api_stats():
         return {
             "cadastros": stats['total'],
             "arquivos": stats['arquivos'],
-            "auditoria": stats.get('auditoria', 0)  # Fallback para compatibilidade
+            "auditoria": stats['auditoria']
         }
         
     except Exception as e:
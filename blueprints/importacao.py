@@ -0,0 +1,86 @@
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, send_file, abort
+from blueprints.usuarios import is_admin_user
+from importacao import importar_cadastros
+import os
+import re
+import time
+import uuid
+import tempfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+importacao_bp = Blueprint('importacao', __name__)
+
+EXTENSOES_IMPORTACAO = ('.csv', '.xlsx')
+
+# Relatórios de linhas rejeitadas ficam disponíveis por 24 horas
+DIR_REJEITADOS = os.path.join(tempfile.gettempdir(), 'ameg_importacoes')
+VALIDADE_REJEITADOS = 24 * 3600
+
+def _limpar_rejeitados_antigos():
+    """Remove relatórios de rejeitados expirados"""
+    limite = time.time() - VALIDADE_REJEITADOS
+    for nome in os.listdir(DIR_REJEITADOS):
+        caminho = os.path.join(DIR_REJEITADOS, nome)
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+        except OSError:
+            pass
+
+@importacao_bp.route('/importar_cadastros', methods=['GET', 'POST'])
+def importar():
+    if 'usuario' not in session:
+        return redirect(url_for('auth.login'))
+    if not is_admin_user(session['usuario']):
+        flash('Acesso negado. Apenas administradores podem importar cadastros.')
+        return redirect(url_for('dashboard.dashboard'))
+
+    if request.method == 'GET':
+        return render_template('importar_cadastros.html', resumo=None)
+
+    arquivo = request.files.get('arquivo')
+    if not arquivo or not arquivo.filename:
+        flash('Erro: selecione um arquivo CSV ou XLSX')
+        return redirect(url_for('importacao.importar'))
+    if not arquivo.filename.lower().endswith(EXTENSOES_IMPORTACAO):
+        flash('Erro: formato não suportado. Use CSV ou XLSX')
+        return redirect(url_for('importacao.importar'))
+
+    os.makedirs(DIR_REJEITADOS, exist_ok=True)
+    _limpar_rejeitados_antigos()
+    relatorio_id = uuid.uuid4().hex
+    caminho_rejeitados = os.path.join(DIR_REJEITADOS, f'{relatorio_id}.csv')
+
+    try:
+        resumo = importar_cadastros(arquivo.stream, arquivo.filename, session['usuario'], caminho_rejeitados)
+    except Exception as e:
+        logger.error(f"❌ Erro na importação de {arquivo.filename}: {e}")
+        flash(f'Erro ao importar arquivo: {str(e)}')
+        return redirect(url_for('importacao.importar'))
+
+    resumo['relatorio_id'] = relatorio_id if resumo['rejeitadas'] else None
+    if not resumo['rejeitadas']:
+        os.remove(caminho_rejeitados)
+
+    flash(f"Importação concluída: {resumo['inseridas']} cadastros inseridos, {resumo['rejeitadas']} linhas rejeitadas")
+    return render_template('importar_cadastros.html', resumo=resumo)
+
+@importacao_bp.route('/importar_cadastros/rejeitados/<relatorio_id>')
+def baixar_rejeitados(relatorio_id):
+    if 'usuario' not in session:
+        return redirect(url_for('auth.login'))
+    if not is_admin_user(session['usuario']):
+        flash('Acesso negado.')
+        return redirect(url_for('dashboard.dashboard'))
+
+    if not re.fullmatch(r'[0-9a-f]{32}', relatorio_id):
+        abort(404)
+    caminho = os.path.join(DIR_REJEITADOS, f'{relatorio_id}.csv')
+    if not os.path.exists(caminho):
+        flash('Relatório de rejeitados expirado ou inexistente')
+        return redirect(url_for('importacao.importar'))
+
+    return send_file(caminho, mimetype='text/csv', as_attachment=True,
+                     download_name='cadastros_rejeitados.csv')
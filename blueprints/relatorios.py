@@ -1,21 +1,25 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, send_file
 from database import get_db_connection, listar_movimentacoes_caixa
+from singleflight import executar_entre_processos
+from cache_http import cache_condicional, versoes_tabelas
+from cadastro_schema import FICHA_SECOES, EXPORTACAO_CABECALHOS, EXPORTACAO_COLUNAS
 import psycopg2.extras
+import base64
 import csv
 import io
 import logging
-from reportlab.lib.pagesizes import letter, A4, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from docx import Document
-from docx.shared import Inches
+from urllib.parse import urlencode
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
 relatorios_bp = Blueprint('relatorios', __name__)
 
+# Pessoa com alguma condição de saúde (coberto pelos índices parciais idx_saude_*_sim)
+CONDICAO_SAUDE = ("tem_doenca_cronica = 'Sim' OR usa_medicamento_continuo = 'Sim' "
+                  "OR tem_doenca_mental = 'Sim' OR tem_deficiencia = 'Sim' "
+                  "OR precisa_cuidados_especiais = 'Sim'")
+
 def safe_get(row, key_or_index, default=''):
     """Acessa dados de forma segura, seja tupla, lista ou dicionário"""
     try:
@@ -28,6 +32,80 @@ def safe_get(row, key_or_index, default=''):
     except:
         return default
 
+# ReportLab é importado dentro das funções de exportação: só carrega no
+# primeiro PDF gerado, não na inicialização de cada worker
+
+@lru_cache(maxsize=None)
+def estilos_ficha():
+    """Estilos da ficha individual (base, título, tabela), montados uma vez"""
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import TableStyle
+    from reportlab.lib import colors
+    
+    estilos = getSampleStyleSheet()
+    titulo = ParagraphStyle(
+        'FichaTitle',
+        parent=estilos['Heading2'],
+        fontSize=14,
+        spaceAfter=15,
+        alignment=1,
+        textColor=colors.darkblue
+    )
+    tabela = TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+    return estilos, titulo, tabela
+
+def adicionar_ficha(elements, row):
+    """Adiciona a ficha individual de um cadastro seguindo as seções do registro de campos"""
+    from reportlab.platypus import Table, Paragraph, Spacer, Image
+    from reportlab.lib.units import inch
+    
+    estilos, estilo_titulo, estilo_tabela = estilos_ficha()
+    elements.append(Paragraph(f"FICHA INDIVIDUAL - CADASTRO {row['id']}", estilo_titulo))
+    
+    # Foto (se existir)
+    if row.get('foto_base64'):
+        try:
+            # Limpar prefixo data:image se existir
+            foto_base64 = row['foto_base64']
+            if ',' in foto_base64:
+                foto_base64 = foto_base64.split(',')[1]
+            
+            img = Image(io.BytesIO(base64.b64decode(foto_base64)), width=1*inch, height=1.3*inch)
+            img.hAlign = 'CENTER'
+            elements.append(img)
+            elements.append(Spacer(1, 10))
+        except Exception as e:
+            logger.error(f"Erro ao processar foto: {e}")
+    
+    for chave, titulo, linhas in FICHA_SECOES:
+        # Dados do Companheiro apenas se existir
+        if chave == 'companheiro' and not row.get('nome_companheiro'):
+            continue
+        
+        elements.append(Paragraph(f"<b>{titulo}</b>", estilos['Heading3']))
+        elements.append(Spacer(1, 6))
+        
+        dados = [
+            [rotulo, f"R$ {row.get(coluna) or '0'}" if moeda else str(row.get(coluna) or '')]
+            for rotulo, coluna, moeda in linhas
+        ]
+        tabela = Table(dados, colWidths=[120, 350])
+        tabela.setStyle(estilo_tabela)
+        elements.append(tabela)
+        elements.append(Spacer(1, 15))
+    
+    # Observações (se existir)
+    if row.get('observacoes'):
+        elements.append(Paragraph("<b>📝 Observações</b>", estilos['Heading3']))
+        elements.append(Spacer(1, 6))
+        elements.append(Paragraph(str(row['observacoes']), estilos['Normal']))
+
 @relatorios_bp.route('/relatorios')
 def relatorios():
     if 'usuario' not in session:
@@ -96,50 +174,58 @@ def relatorio_simplificado():
         return redirect(url_for('relatorios.relatorios'))
 
 @relatorios_bp.route('/relatorio_estatistico')
+@cache_condicional('cadastros')
 def relatorio_estatistico():
     if 'usuario' not in session:
         return redirect(url_for('auth.login'))
     
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Estatísticas gerais
-        cursor.execute('SELECT COUNT(*) FROM cadastros')
-        total = safe_get(cursor.fetchone(), 0, 0)
-        
-        # Por bairro
-        cursor.execute('SELECT bairro, COUNT(*) FROM cadastros GROUP BY bairro ORDER BY COUNT(*) DESC')
-        por_bairro = cursor.fetchall()
-        
-        # Por gênero
-        cursor.execute('SELECT genero, COUNT(*) FROM cadastros GROUP BY genero')
-        por_genero = cursor.fetchall()
-        
-        # Por faixa etária
-        cursor.execute('''SELECT 
-            CASE 
-                WHEN idade < 18 THEN 'Menor de 18'
-                WHEN idade BETWEEN 18 AND 30 THEN '18-30 anos'
-                WHEN idade BETWEEN 31 AND 50 THEN '31-50 anos'
-                WHEN idade BETWEEN 51 AND 65 THEN '51-65 anos'
-                ELSE 'Acima de 65'
-            END as faixa_etaria,
-            COUNT(*) 
-            FROM cadastros 
-            WHERE idade IS NOT NULL 
-            GROUP BY faixa_etaria''')
-        por_idade = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        stats = {
-            'total': total,
-            'por_bairro': por_bairro,
-            'por_genero': por_genero,
-            'por_idade': por_idade
-        }
+        def calcular():
+            conn = get_db_connection()
+            cursor = conn.cursor()
+        
+            # Estatísticas gerais
+            cursor.execute('SELECT COUNT(*) FROM cadastros')
+            total = safe_get(cursor.fetchone(), 0, 0)
+        
+            # Por bairro
+            cursor.execute('SELECT bairro, COUNT(*) FROM cadastros GROUP BY bairro ORDER BY COUNT(*) DESC')
+            por_bairro = cursor.fetchall()
+        
+            # Por gênero
+            cursor.execute('SELECT genero, COUNT(*) FROM cadastros GROUP BY genero')
+            por_genero = cursor.fetchall()
+        
+            # Por faixa etária
+            cursor.execute('''SELECT 
+                CASE 
+                    WHEN idade < 18 THEN 'Menor de 18'
+                    WHEN idade BETWEEN 18 AND 30 THEN '18-30 anos'
+                    WHEN idade BETWEEN 31 AND 50 THEN '31-50 anos'
+                    WHEN idade BETWEEN 51 AND 65 THEN '51-65 anos'
+                    ELSE 'Acima de 65'
+                END as faixa_etaria,
+                COUNT(*) 
+                FROM cadastros 
+                WHERE idade IS NOT NULL 
+                GROUP BY faixa_etaria''')
+            por_idade = cursor.fetchall()
+        
+            cursor.close()
+            conn.close()
+        
+            stats = {
+                'total': total,
+                'por_bairro': por_bairro,
+                'por_genero': por_genero,
+                'por_idade': por_idade
+            }
+            return stats
+        
+        # Um único worker recalcula; os demais reutilizam o resultado em cache_agregados.
+        # A versão de cadastros na chave garante que o ETag novo nunca sirva o agregado antigo
+        versao = versoes_tabelas(('cadastros',)).get('cadastros', (0, None))[0]
+        stats = executar_entre_processos(f'relatorio_estatistico:{versao}', calcular, ttl=120)
         
         return render_template('relatorio_estatistico.html', stats=stats)
         
@@ -149,6 +235,7 @@ def relatorio_estatistico():
         return redirect(url_for('relatorios.relatorios'))
 
 @relatorios_bp.route('/relatorio_por_bairro')
+@cache_condicional('cadastros')
 def relatorio_por_bairro():
     if 'usuario' not in session:
         return redirect(url_for('auth.login'))
@@ -177,6 +264,7 @@ def relatorio_por_bairro():
         return render_template('relatorio_por_bairro.html', bairros=[], erro=f"Erro: {str(e)}")
 
 @relatorios_bp.route('/relatorio_renda')
+@cache_condicional('cadastros')
 def relatorio_renda():
     if 'usuario' not in session:
         return redirect(url_for('auth.login'))
@@ -222,6 +310,7 @@ def relatorio_renda():
         return redirect(url_for('relatorios.relatorios'))
 
 @relatorios_bp.route('/relatorio_saude')
+@cache_condicional('cadastros', 'dados_saude_pessoa')
 def relatorio_saude():
     if 'usuario' not in session:
         return redirect(url_for('auth.login'))
@@ -229,35 +318,30 @@ def relatorio_saude():
     # Parâmetros de filtro
     busca_nome = request.args.get('busca_nome', '').strip()
     ordem = request.args.get('ordem', 'asc')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = 50
     
     conn = get_db_connection()
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     
-    # Estatísticas usando a nova tabela dados_saude_pessoa
-    cursor.execute('SELECT COUNT(DISTINCT cadastro_id) FROM dados_saude_pessoa WHERE tem_doenca_cronica = %s', ('Sim'))
-    com_doenca_cronica = cursor.fetchone()['count']
-    
-    cursor.execute('SELECT COUNT(DISTINCT cadastro_id) FROM dados_saude_pessoa WHERE usa_medicamento_continuo = %s', ('Sim'))
-    usa_medicamento = cursor.fetchone()['count']
-    
-    cursor.execute('SELECT COUNT(DISTINCT cadastro_id) FROM dados_saude_pessoa WHERE tem_doenca_mental = %s', ('Sim'))
-    com_doenca_mental = cursor.fetchone()['count']
-    
-    cursor.execute('SELECT COUNT(DISTINCT cadastro_id) FROM dados_saude_pessoa WHERE tem_deficiencia = %s', ('Sim'))
-    com_deficiencia = cursor.fetchone()['count']
-    
-    cursor.execute('SELECT COUNT(DISTINCT cadastro_id) FROM dados_saude_pessoa WHERE precisa_cuidados_especiais = %s', ('Sim'))
-    precisa_cuidados = cursor.fetchone()['count']
+    # Estatísticas em uma única leitura (índices parciais nas flags 'Sim')
+    cursor.execute(f"""SELECT
+            COUNT(DISTINCT cadastro_id) FILTER (WHERE tem_doenca_cronica = 'Sim') AS com_doenca_cronica,
+            COUNT(DISTINCT cadastro_id) FILTER (WHERE usa_medicamento_continuo = 'Sim') AS usa_medicamento,
+            COUNT(DISTINCT cadastro_id) FILTER (WHERE tem_doenca_mental = 'Sim') AS com_doenca_mental,
+            COUNT(DISTINCT cadastro_id) FILTER (WHERE tem_deficiencia = 'Sim') AS com_deficiencia,
+            COUNT(DISTINCT cadastro_id) FILTER (WHERE precisa_cuidados_especiais = 'Sim') AS precisa_cuidados
+        FROM dados_saude_pessoa
+        WHERE {CONDICAO_SAUDE}""")
+    stats = cursor.fetchone()
     
-    # Query principal - buscar cadastros com dados de saúde e suas pessoas
-    base_query = """SELECT DISTINCT c.id, c.nome_completo, c.idade, c.telefone, c.bairro
+    # Página de cadastros com alguma condição de saúde (total no mesmo SELECT)
+    base_query = f"""SELECT c.id, c.nome_completo, c.idade, c.telefone, c.bairro,
+                COUNT(*) OVER () AS total_registros
                 FROM cadastros c
-                INNER JOIN dados_saude_pessoa dsp ON c.id = dsp.cadastro_id
-                WHERE (dsp.tem_doenca_cronica = %s OR dsp.usa_medicamento_continuo = %s 
-                OR dsp.tem_doenca_mental = %s OR dsp.tem_deficiencia = %s 
-                OR dsp.precisa_cuidados_especiais = %s)"""
-    
-    params = ['Sim', 'Sim', 'Sim', 'Sim', 'Sim']
+                WHERE EXISTS (SELECT 1 FROM dados_saude_pessoa dsp
+                              WHERE dsp.cadastro_id = c.id AND ({CONDICAO_SAUDE}))"""
+    params = []
     
     # Adicionar filtro por nome se fornecido
     if busca_nome:
@@ -266,51 +350,54 @@ def relatorio_saude():
     
     # Adicionar ordenação
     if ordem == 'desc':
-        base_query += " ORDER BY c.nome_completo DESC"
+        base_query += " ORDER BY c.nome_completo DESC, c.id DESC"
     else:
-        base_query += " ORDER BY c.nome_completo ASC"
+        base_query += " ORDER BY c.nome_completo ASC, c.id ASC"
     
-    cursor.execute(base_query, params)
+    base_query += " LIMIT %s OFFSET %s"
+    cursor.execute(base_query, params + [per_page, (page - 1) * per_page])
     cadastros_base = cursor.fetchall()
     
-    # Para cada cadastro, buscar os dados detalhados de saúde de cada pessoa
-    cadastros_saude = []
-    for cadastro in cadastros_base:
-        cursor.execute("""SELECT nome_pessoa, tem_doenca_cronica, doencas_cronicas,
+    total_records = cadastros_base[0]['total_registros'] if cadastros_base else 0
+    total_pages = (total_records + per_page - 1) // per_page
+    
+    # Pessoas de todos os cadastros da página em uma única consulta, agrupadas em Python
+    pessoas_por_cadastro = {}
+    if cadastros_base:
+        cursor.execute(f"""SELECT cadastro_id, nome_pessoa, tem_doenca_cronica, doencas_cronicas,
                          usa_medicamento_continuo, medicamentos, tem_doenca_mental, doencas_mentais,
                          tem_deficiencia, deficiencias, precisa_cuidados_especiais, cuidados_especiais
                          FROM dados_saude_pessoa 
-                         WHERE cadastro_id = %s 
-                         AND (tem_doenca_cronica = 'Sim' OR usa_medicamento_continuo = 'Sim' 
-                         OR tem_doenca_mental = 'Sim' OR tem_deficiencia = 'Sim' 
-                         OR precisa_cuidados_especiais = 'Sim')
-                         ORDER BY nome_pessoa""", (cadastro['id']))
-        pessoas_saude = cursor.fetchall()
-        
-        if pessoas_saude:  # Só adicionar se tem pessoas com condições de saúde
-            cadastros_saude.append({
-                'cadastro': cadastro,
-                'pessoas_saude': pessoas_saude
-            })
+                         WHERE cadastro_id = ANY(%s) AND ({CONDICAO_SAUDE})
+                         ORDER BY cadastro_id, nome_pessoa""", ([c['id'] for c in cadastros_base],))
+        for pessoa in cursor.fetchall():
+            pessoas_por_cadastro.setdefault(pessoa['cadastro_id'], []).append(pessoa)
+    
+    cadastros_saude = [
+        {'cadastro': cadastro, 'pessoas_saude': pessoas_por_cadastro[cadastro['id']]}
+        for cadastro in cadastros_base
+        if cadastro['id'] in pessoas_por_cadastro
+    ]
     
     cursor.close()
     conn.close()
     
-    stats = {
-        'com_doenca_cronica': com_doenca_cronica,
-        'usa_medicamento': usa_medicamento,
-        'com_doenca_mental': com_doenca_mental,
-        'com_deficiencia': com_deficiencia,
-        'precisa_cuidados': precisa_cuidados
-    }
+    query_params = urlencode({k: v for k, v in request.args.items() if k != 'page'})
     
-    return render_template('relatorio_saude.html', stats=stats, cadastros=cadastros_saude)
+    return render_template('relatorio_saude.html', stats=stats, cadastros=cadastros_saude,
+                         page=page, total_pages=total_pages, total_records=total_records,
+                         query_params=query_params)
 
 @relatorios_bp.route('/exportar')
 def exportar():
     if 'usuario' not in session:
         return redirect(url_for('auth.login'))
     
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib import colors
+    
     tipo = request.args.get('tipo', 'completo')
     formato = request.args.get('formato', 'csv')
     cadastro_id = request.args.get('cadastro_id')
@@ -318,13 +405,16 @@ def exportar():
     conn = get_db_connection()
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     
+    # O CSV completo usa só as colunas de exportação (sem trafegar a foto)
+    colunas_completo = ', '.join(EXPORTACAO_COLUNAS) if formato == 'csv' else '*'
+    
     if tipo == 'completo':
         if cadastro_id:
-            cursor.execute('SELECT * FROM cadastros WHERE id = %s', (cadastro_id,))
+            cursor.execute(f'SELECT {colunas_completo} FROM cadastros WHERE id = %s', (cadastro_id,))
             dados = cursor.fetchall()
             filename = f'cadastro_{cadastro_id}'
         else:
-            cursor.execute('SELECT * FROM cadastros ORDER BY nome_completo')
+            cursor.execute(f'SELECT {colunas_completo} FROM cadastros ORDER BY nome_completo')
             dados = cursor.fetchall()
             filename = 'relatorio_completo'
     elif tipo == 'simplificado':
@@ -453,7 +543,7 @@ def exportar():
             dados = cursor.fetchall()
             filename = 'relatorio_saude_completo'
     else:
-        cursor.execute('SELECT * FROM cadastros ORDER BY nome_completo')
+        cursor.execute(f'SELECT {colunas_completo} FROM cadastros ORDER BY nome_completo')
         dados = cursor.fetchall()
         filename = 'relatorio_geral'
     
@@ -518,8 +608,8 @@ def exportar():
                     row['usuario'] or ''
                 ])
         else:
-            # Cabeçalhos completos 
-            writer.writerow(['Nome', 'Telefone', 'Endereço', 'Número', 'Bairro', 'CEP', 'Gênero', 'Idade', 'CPF', 'RG', 'Estado Civil', 'Escolaridade', 'Renda Familiar'])
+            # Cabeçalhos completos (ordem definida em cadastro_schema.py)
+            writer.writerow(EXPORTACAO_CABECALHOS)
             
         # Dados
         for row in dados:
@@ -538,21 +628,7 @@ def exportar():
                 ])
             elif tipo not in ['estatistico', 'renda']:  # Para outros tipos
                 if tipo != 'caixa':
-                    row_data = [
-                        safe_get(row, 'nome_completo') or safe_get(row, 1),
-                        safe_get(row, 'telefone') or safe_get(row, 7),
-                        safe_get(row, 'endereco') or safe_get(row, 2),
-                        safe_get(row, 'numero') or safe_get(row, 3),
-                        safe_get(row, 'bairro') or safe_get(row, 4),
-                        safe_get(row, 'cep') or safe_get(row, 5),
-                        safe_get(row, 'genero') or safe_get(row, 9),
-                        safe_get(row, 'idade') or safe_get(row, 10),
-                        safe_get(row, 'cpf') or safe_get(row, 14),
-                        safe_get(row, 'rg') or safe_get(row, 15),
-                        safe_get(row, 'estado_civil') or safe_get(row, 17),
-                        safe_get(row, 'escolaridade') or safe_get(row, 18),
-                        safe_get(row, 'renda_familiar') or safe_get(row, 41)
-                    ]
+                    row_data = [safe_get(row, coluna) for coluna in EXPORTACAO_COLUNAS]
                     writer.writerow(row_data)
         
         output.seek(0)
@@ -1045,199 +1121,7 @@ def exportar():
                     # Quebra de página entre fichas (exceto a primeira)
                     if i > 0:
                         elements.append(PageBreak())
-                    
-                    # Cabeçalho da ficha
-                    ficha_title = ParagraphStyle(
-                        'FichaTitle',
-                        parent=styles['Heading2'],
-                        fontSize=14,
-                        spaceAfter=15,
-                        alignment=1,
-                        textColor=colors.darkblue
-                    )
-                    elements.append(Paragraph(f"FICHA INDIVIDUAL - CADASTRO {row['id']}", ficha_title))
-                    
-                    # Foto (se existir)
-                    if row.get('foto_base64'):
-                        try:
-                            import base64
-                            
-                            # Limpar prefixo data:image se existir
-                            foto_base64 = row['foto_base64']
-                            if ',' in foto_base64:
-                                foto_base64 = foto_base64.split(',')[1]
-                            
-                            # Decodificar base64
-                            foto_data = base64.b64decode(foto_base64)
-                            foto_buffer = io.BytesIO(foto_data)
-                            
-                            # Adicionar foto centralizada
-                            img = Image(foto_buffer, width=1*inch, height=1.3*inch)
-                            img.hAlign = 'CENTER'
-                            elements.append(img)
-                            elements.append(Spacer(1, 10))
-                        except Exception as e:
-                            # Log do erro para debug
-                            logger.error(f"Erro ao processar foto: {e}")
-                            pass  # Se houver erro na foto, continua sem ela
-                    
-                    # Dados Pessoais
-                    pessoais_para = Paragraph("<b>📋 Dados Pessoais</b>", styles['Heading3'])
-                    elements.append(pessoais_para)
-                    elements.append(Spacer(1, 6))
-                    
-                    pessoais_data = [
-                        ['Nome Completo:', str(row['nome_completo'] or '')],
-                        ['Endereço:', f"{row['endereco'] or ''}, {row['numero'] or ''}"],
-                        ['Bairro:', str(row['bairro'] or '')],
-                        ['CEP:', str(row['cep'] or '')],
-                        ['Telefone:', str(row['telefone'] or '')],
-                        ['Ponto Referência:', str(row['ponto_referencia'] or '')],
-                        ['Gênero:', str(row['genero'] or '')],
-                        ['Idade:', str(row['idade'] or '')],
-                        ['Data Nascimento:', str(row['data_nascimento'] or '')],
-                        ['Título Eleitor:', str(row['titulo_eleitor'] or '')],
-                        ['Cidade Título:', str(row['cidade_titulo'] or '')],
-                        ['CPF:', str(row['cpf'] or '')],
-                        ['RG:', str(row['rg'] or '')],
-                        ['NIS:', str(row['nis'] or '')],
-                        ['Estado Civil:', str(row['estado_civil'] or '')],
-                        ['Escolaridade:', str(row['escolaridade'] or '')],
-                        ['Profissão:', str(row['profissao'] or '')]
-                    ]
-                    
-                    pessoais_table = Table(pessoais_data, colWidths=[120, 350])
-                    pessoais_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, -1), 8),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                    ]))
-                    elements.append(pessoais_table)
-                    elements.append(Spacer(1, 15))
-                    
-                    # Dados do Companheiro (se existir)
-                    if row['nome_companheiro']:
-                        comp_para = Paragraph("<b>💑 Dados do Companheiro(a)</b>", styles['Heading3'])
-                        elements.append(comp_para)
-                        elements.append(Spacer(1, 6))
-                        
-                        comp_data = [
-                            ['Nome Companheiro:', str(row['nome_companheiro'] or '')],
-                            ['CPF Companheiro:', str(row['cpf_companheiro'] or '')],
-                            ['RG Companheiro:', str(row['rg_companheiro'] or '')],
-                            ['Idade Companheiro:', str(row['idade_companheiro'] or '')],
-                            ['Escolaridade Companheiro:', str(row['escolaridade_companheiro'] or '')],
-                            ['Profissão Companheiro:', str(row['profissao_companheiro'] or '')],
-                            ['Data Nasc. Companheiro:', str(row['data_nascimento_companheiro'] or '')],
-                            ['Título Companheiro:', str(row['titulo_companheiro'] or '')],
-                            ['Cidade Título Comp.:', str(row['cidade_titulo_companheiro'] or '')],
-                            ['NIS Companheiro:', str(row['nis_companheiro'] or '')]
-                        ]
-                        
-                        comp_table = Table(comp_data, colWidths=[120, 350])
-                        comp_table.setStyle(TableStyle([
-                            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                            ('FONTSIZE', (0, 0), (-1, -1), 8),
-                            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                        ]))
-                        elements.append(comp_table)
-                        elements.append(Spacer(1, 15))
-                    
-                    # Dados Familiares e Trabalho
-                    familia_para = Paragraph("<b>👨👩👧👦 Dados Familiares e Trabalho</b>", styles['Heading3'])
-                    elements.append(familia_para)
-                    elements.append(Spacer(1, 6))
-                    
-                    familia_data = [
-                        ['Tipo Trabalho:', str(row['tipo_trabalho'] or '')],
-                        ['Pessoas Trabalham:', str(row['pessoas_trabalham'] or '')],
-                        ['Aposentados/Pensionistas:', str(row['aposentados_pensionistas'] or '')],
-                        ['Pessoas na Família:', str(row['num_pessoas_familia'] or '')],
-                        ['Número Famílias:', str(row['num_familias'] or '')],
-                        ['Adultos:', str(row['adultos'] or '')],
-                        ['Crianças:', str(row['criancas'] or '')],
-                        ['Adolescentes:', str(row['adolescentes'] or '')],
-                        ['Idosos:', str(row['idosos'] or '')],
-                        ['Gestantes:', str(row['gestantes'] or '')],
-                        ['Nutrizes:', str(row['nutrizes'] or '')],
-                        ['Renda Familiar:', f"R$ {row['renda_familiar'] or '0'}"],
-                        ['Renda Per Capita:', f"R$ {row['renda_per_capita'] or '0'}"],
-                        ['Bolsa Família:', f"R$ {row['bolsa_familia'] or '0'}"]
-                    ]
-                    
-                    familia_table = Table(familia_data, colWidths=[120, 350])
-                    familia_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, -1), 8),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                    ]))
-                    elements.append(familia_table)
-                    elements.append(Spacer(1, 15))
-                    
-                    # Dados Habitacionais
-                    habitacao_para = Paragraph("<b>🏠 Dados Habitacionais</b>", styles['Heading3'])
-                    elements.append(habitacao_para)
-                    elements.append(Spacer(1, 6))
-                    
-                    habitacao_data = [
-                        ['Tipo Casa:', str(safe_get(row, 'casa_tipo', '') or '')],
-                        ['Material Casa:', str(safe_get(row, 'casa_material', '') or '')],
-                        ['Energia Elétrica:', str(safe_get(row, 'energia', '') or '')],
-                        ['Abastecimento Água:', str(safe_get(row, 'agua', '') or '')],
-                        ['Esgotamento Sanitário:', str(safe_get(row, 'esgoto', '') or '')],
-                        ['Destino Lixo:', str(safe_get(row, 'lixo', '') or '')]
-                    ]
-                    
-                    habitacao_table = Table(habitacao_data, colWidths=[120, 350])
-                    habitacao_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, -1), 8),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                    ]))
-                    elements.append(habitacao_table)
-                    elements.append(Spacer(1, 15))
-                    
-                    # Dados de Saúde
-                    saude_para = Paragraph("<b>🏥 Dados de Saúde</b>", styles['Heading3'])
-                    elements.append(saude_para)
-                    elements.append(Spacer(1, 6))
-                    
-                    saude_data = [
-                        ['Doença Crônica:', str(safe_get(row, 'tem_doenca_cronica', '') or '')],
-                        ['Quais Doenças:', str(safe_get(row, 'doencas_cronicas', '') or '')],
-                        ['Medicamento Contínuo:', str(safe_get(row, 'usa_medicamento_continuo', '') or '')],
-                        ['Quais Medicamentos:', str(safe_get(row, 'medicamentos_continuos', '') or '')],
-                        ['Deficiência:', str(safe_get(row, 'tem_deficiencia', '') or '')],
-                        ['Tipo Deficiência:', str(safe_get(row, 'tipo_deficiencia', '') or '')],
-                        ['Doença Mental:', str(safe_get(row, 'tem_doenca_mental', '') or '')],
-                        ['Cuidados Especiais:', str(safe_get(row, 'precisa_cuidados_especiais', '') or '')]
-                    ]
-                    
-                    saude_table = Table(saude_data, colWidths=[120, 350])
-                    saude_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, -1), 8),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                    ]))
-                    elements.append(saude_table)
-                    
-                    # Observações (se existir)
-                    if row.get('observacoes'):
-                        elements.append(Spacer(1, 15))
-                        obs_para = Paragraph("<b>📝 Observações</b>", styles['Heading3'])
-                        elements.append(obs_para)
-                        elements.append(Spacer(1, 6))
-                        elements.append(Paragraph(str(row['observacoes']), styles['Normal']))
+                    adicionar_ficha(elements, row)
         
         doc.build(elements)
         
@@ -1258,6 +1142,11 @@ def exportar_fichas_individuais():
     if 'usuario' not in session:
         return redirect(url_for('auth.login'))
     
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    
     try:
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
@@ -1293,199 +1182,7 @@ def exportar_fichas_individuais():
             # Quebra de página entre fichas (exceto a primeira)
             if i > 0:
                 elements.append(PageBreak())
-            
-            # Cabeçalho da ficha
-            ficha_title = ParagraphStyle(
-                'FichaTitle',
-                parent=styles['Heading2'],
-                fontSize=14,
-                spaceAfter=15,
-                alignment=1,
-                textColor=colors.darkblue
-            )
-            elements.append(Paragraph(f"FICHA INDIVIDUAL - CADASTRO {row['id']}", ficha_title))
-            
-            # Foto (se existir)
-            if row.get('foto_base64'):
-                try:
-                    import base64
-                    
-                    # Limpar prefixo data:image se existir
-                    foto_base64 = row['foto_base64']
-                    if ',' in foto_base64:
-                        foto_base64 = foto_base64.split(',')[1]
-                    
-                    # Decodificar base64
-                    foto_data = base64.b64decode(foto_base64)
-                    foto_buffer = io.BytesIO(foto_data)
-                    
-                    # Adicionar foto centralizada
-                    img = Image(foto_buffer, width=1*inch, height=1.3*inch)
-                    img.hAlign = 'CENTER'
-                    elements.append(img)
-                    elements.append(Spacer(1, 10))
-                except Exception as e:
-                    # Log do erro para debug
-                    logger.error(f"Erro ao processar foto: {e}")
-                    pass  # Se houver erro na foto, continua sem ela
-            
-            # Dados Pessoais
-            pessoais_para = Paragraph("<b>📋 Dados Pessoais</b>", styles['Heading3'])
-            elements.append(pessoais_para)
-            elements.append(Spacer(1, 6))
-            
-            pessoais_data = [
-                ['Nome Completo:', str(row['nome_completo'] or '')],
-                ['Endereço:', f"{row['endereco'] or ''}, {row['numero'] or ''}"],
-                ['Bairro:', str(row['bairro'] or '')],
-                ['CEP:', str(row['cep'] or '')],
-                ['Telefone:', str(row['telefone'] or '')],
-                ['Ponto Referência:', str(row['ponto_referencia'] or '')],
-                ['Gênero:', str(row['genero'] or '')],
-                ['Idade:', str(row['idade'] or '')],
-                ['Data Nascimento:', str(row['data_nascimento'] or '')],
-                ['Título Eleitor:', str(row['titulo_eleitor'] or '')],
-                ['Cidade Título:', str(row['cidade_titulo'] or '')],
-                ['CPF:', str(row['cpf'] or '')],
-                ['RG:', str(row['rg'] or '')],
-                ['NIS:', str(row['nis'] or '')],
-                ['Estado Civil:', str(row['estado_civil'] or '')],
-                ['Escolaridade:', str(row['escolaridade'] or '')],
-                ['Profissão:', str(row['profissao'] or '')]
-            ]
-            
-            pessoais_table = Table(pessoais_data, colWidths=[120, 350])
-            pessoais_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            elements.append(pessoais_table)
-            elements.append(Spacer(1, 15))
-            
-            # Dados do Companheiro (se existir)
-            if row['nome_companheiro']:
-                comp_para = Paragraph("<b>💑 Dados do Companheiro(a)</b>", styles['Heading3'])
-                elements.append(comp_para)
-                elements.append(Spacer(1, 6))
-                
-                comp_data = [
-                    ['Nome Companheiro:', str(row['nome_companheiro'] or '')],
-                    ['CPF Companheiro:', str(row['cpf_companheiro'] or '')],
-                    ['RG Companheiro:', str(row['rg_companheiro'] or '')],
-                    ['Idade Companheiro:', str(row['idade_companheiro'] or '')],
-                    ['Escolaridade Companheiro:', str(row['escolaridade_companheiro'] or '')],
-                    ['Profissão Companheiro:', str(row['profissao_companheiro'] or '')],
-                    ['Data Nasc. Companheiro:', str(row['data_nascimento_companheiro'] or '')],
-                    ['Título Companheiro:', str(row['titulo_companheiro'] or '')],
-                    ['Cidade Título Comp.:', str(row['cidade_titulo_companheiro'] or '')],
-                    ['NIS Companheiro:', str(row['nis_companheiro'] or '')]
-                ]
-                
-                comp_table = Table(comp_data, colWidths=[120, 350])
-                comp_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 8),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                ]))
-                elements.append(comp_table)
-                elements.append(Spacer(1, 15))
-            
-            # Dados Familiares e Trabalho
-            familia_para = Paragraph("<b>👨👩👧👦 Dados Familiares e Trabalho</b>", styles['Heading3'])
-            elements.append(familia_para)
-            elements.append(Spacer(1, 6))
-            
-            familia_data = [
-                ['Tipo Trabalho:', str(row['tipo_trabalho'] or '')],
-                ['Pessoas Trabalham:', str(row['pessoas_trabalham'] or '')],
-                ['Aposentados/Pensionistas:', str(row['aposentados_pensionistas'] or '')],
-                ['Pessoas na Família:', str(row['num_pessoas_familia'] or '')],
-                ['Número Famílias:', str(row['num_familias'] or '')],
-                ['Adultos:', str(row['adultos'] or '')],
-                ['Crianças:', str(row['criancas'] or '')],
-                ['Adolescentes:', str(row['adolescentes'] or '')],
-                ['Idosos:', str(row['idosos'] or '')],
-                ['Gestantes:', str(row['gestantes'] or '')],
-                ['Nutrizes:', str(row['nutrizes'] or '')],
-                ['Renda Familiar:', f"R$ {row['renda_familiar'] or '0'}"],
-                ['Renda Per Capita:', f"R$ {row['renda_per_capita'] or '0'}"],
-                ['Bolsa Família:', f"R$ {row['bolsa_familia'] or '0'}"]
-            ]
-            
-            familia_table = Table(familia_data, colWidths=[120, 350])
-            familia_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            elements.append(familia_table)
-            elements.append(Spacer(1, 15))
-            
-            # Dados Habitacionais
-            habitacao_para = Paragraph("<b>🏠 Dados Habitacionais</b>", styles['Heading3'])
-            elements.append(habitacao_para)
-            elements.append(Spacer(1, 6))
-            
-            habitacao_data = [
-                ['Tipo Casa:', str(safe_get(row, 'casa_tipo', '') or '')],
-                ['Material Casa:', str(safe_get(row, 'casa_material', '') or '')],
-                ['Energia Elétrica:', str(safe_get(row, 'energia', '') or '')],
-                ['Abastecimento Água:', str(safe_get(row, 'agua', '') or '')],
-                ['Esgotamento Sanitário:', str(safe_get(row, 'esgoto', '') or '')],
-                ['Destino Lixo:', str(safe_get(row, 'lixo', '') or '')]
-            ]
-            
-            habitacao_table = Table(habitacao_data, colWidths=[120, 350])
-            habitacao_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            elements.append(habitacao_table)
-            elements.append(Spacer(1, 15))
-            
-            # Dados de Saúde
-            saude_para = Paragraph("<b>🏥 Dados de Saúde</b>", styles['Heading3'])
-            elements.append(saude_para)
-            elements.append(Spacer(1, 6))
-            
-            saude_data = [
-                ['Doença Crônica:', str(safe_get(row, 'tem_doenca_cronica', '') or '')],
-                ['Quais Doenças:', str(safe_get(row, 'doencas_cronicas', '') or '')],
-                ['Medicamento Contínuo:', str(safe_get(row, 'usa_medicamento_continuo', '') or '')],
-                ['Quais Medicamentos:', str(safe_get(row, 'medicamentos_continuos', '') or '')],
-                ['Deficiência:', str(safe_get(row, 'tem_deficiencia', '') or '')],
-                ['Tipo Deficiência:', str(safe_get(row, 'tipo_deficiencia', '') or '')],
-                ['Doença Mental:', str(safe_get(row, 'tem_doenca_mental', '') or '')],
-                ['Cuidados Especiais:', str(safe_get(row, 'precisa_cuidados_especiais', '') or '')]
-            ]
-            
-            saude_table = Table(saude_data, colWidths=[120, 350])
-            saude_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            elements.append(saude_table)
-            
-            # Observações (se existir)
-            if row.get('observacoes'):
-                elements.append(Spacer(1, 15))
-                obs_para = Paragraph("<b>📝 Observações</b>", styles['Heading3'])
-                elements.append(obs_para)
-                elements.append(Spacer(1, 6))
-                elements.append(Paragraph(str(row['observacoes']), styles['Normal']))
+            adicionar_ficha(elements, row)
         
         # Gerar PDF
         doc.build(elements)
@@ -1532,6 +1229,9 @@ def ficha_pdf(cadastro_id,):
     if 'usuario' not in session:
         return redirect(url_for('auth.login'))
     
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate
+    
     try:
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
@@ -1548,83 +1248,7 @@ def ficha_pdf(cadastro_id,):
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=A4)
         elements = []
-        styles = getSampleStyleSheet()
-        
-        # Título
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=30,
-            alignment=1  # Center
-        )
-        elements.append(Paragraph(f"FICHA INDIVIDUAL - CADASTRO {cadastro_id}", title_style))
-        elements.append(Spacer(1, 20))
-        
-        # Dados pessoais
-        elements.append(Paragraph("<b>DADOS PESSOAIS</b>", styles['Heading2']))
-        dados_pessoais = [
-            ['Nome Completo:', str(cadastro['nome_completo'] or '')],
-            ['CPF:', str(cadastro['cpf'] or '')],
-            ['RG:', str(cadastro['rg'] or '')],
-            ['Telefone:', str(cadastro['telefone'] or '')],
-            ['Gênero:', str(cadastro['genero'] or '')],
-            ['Idade:', str(cadastro['idade'] or '')],
-            ['Estado Civil:', str(cadastro['estado_civil'] or '')],
-            ['Escolaridade:', str(cadastro['escolaridade'] or '')]
-        ]
-        
-        table_pessoais = Table(dados_pessoais, colWidths=[2*inch, 4*inch])
-        table_pessoais.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        elements.append(table_pessoais)
-        elements.append(Spacer(1, 15))
-        
-        # Endereço
-        elements.append(Paragraph("<b>ENDEREÇO</b>", styles['Heading2']))
-        dados_endereco = [
-            ['Endereço:', str(cadastro['endereco'] or '')],
-            ['Número:', str(cadastro['numero'] or '')],
-            ['Bairro:', str(cadastro['bairro'] or '')],
-            ['CEP:', str(cadastro['cep'] or '')]
-        ]
-        
-        table_endereco = Table(dados_endereco, colWidths=[2*inch, 4*inch])
-        table_endereco.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        elements.append(table_endereco)
-        elements.append(Spacer(1, 15))
-        
-        # Dados familiares
-        elements.append(Paragraph("<b>DADOS FAMILIARES</b>", styles['Heading2']))
-        dados_familia = [
-            ['Companheiro(a):', str(cadastro['companheiro'] or '')],
-            ['Renda Familiar:', f"R$ {cadastro['renda_familiar']:.2f}" if cadastro['renda_familiar'] else ''],
-            ['Benefícios Sociais:', str(cadastro['beneficios_sociais'] or '')]
-        ]
-        
-        table_familia = Table(dados_familia, colWidths=[2*inch, 4*inch])
-        table_familia.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        elements.append(table_familia)
+        adicionar_ficha(elements, cadastro)
         
         doc.build(elements)
         buffer.seek(0)
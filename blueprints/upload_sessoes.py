@@ -0,0 +1,242 @@
+from flask import Blueprint, request, session, url_for
+from database import get_db_connection, usuario_tem_permissao, inserir_arquivos_saude, inserir_comprovante_caixa
+from cache_bus import publicar_invalidacao
+from extensions import limiter, chave_usuario
+from otimizacao import agendar_otimizacao
+from uploads import (UPLOAD_MAX_ARQUIVO, UPLOAD_CHUNK_MAX, TIPOS_POR_EXTENSAO, receber_chunk, gravar_chunk,
+                     resumo_arquivo_sessao, caminho_sessao, remover_arquivo_sessao, limpar_sessoes_expiradas)
+import psycopg2.extras
+import os
+import re
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+upload_sessoes_bp = Blueprint('upload_sessoes', __name__)
+
+# Criar, consultar, finalizar e cancelar sessões: limite por usuário. Os chunks
+# ficam isentos (um arquivo grande gera dezenas e o limite geral bloquearia o envio)
+LIMITE_SESSOES = os.environ.get('UPLOAD_SESSOES_LIMITE', '120 per hour')
+
+limite_sessoes = limiter.limit(LIMITE_SESSOES, key_func=chave_usuario)
+
+# Destinos aceitos: tabela de referência e permissão exigida (None = qualquer usuário logado)
+DESTINOS = {
+    'arquivo_saude': ('cadastros', None),
+    'comprovante': ('movimentacoes_caixa', 'caixa'),
+}
+
+# Mesmas opções do formulário de arquivos_saude.html
+TIPOS_ARQUIVO_SAUDE = {'laudo', 'receita', 'exame', 'imagem', 'outros'}
+
+def _sessao_do_usuario(cursor, sessao_id, bloquear=False):
+    """Busca a sessão do usuário logado (FOR UPDATE serializa chunks concorrentes)"""
+    if not re.fullmatch(r'[0-9a-f]{32}', sessao_id):
+        return None
+    cursor.execute(f'''
+        SELECT * FROM upload_sessoes WHERE id = %s AND usuario = %s
+        {'FOR UPDATE' if bloquear else ''}
+    ''', (sessao_id, session['usuario']))
+    return cursor.fetchone()
+
+def _estado(sessao):
+    """Corpo JSON com o progresso de uma sessão"""
+    return {
+        "id": sessao['id'],
+        "tamanho": sessao['tamanho'],
+        "recebido": sessao['recebido'],
+        "faixas": [[0, sessao['recebido']]] if sessao['recebido'] else [],
+        "chunk_max": UPLOAD_CHUNK_MAX,
+        "url": url_for('upload_sessoes.enviar_chunk', sessao_id=sessao['id']),
+    }
+
+@upload_sessoes_bp.route('/api/uploads', methods=['POST'])
+@limite_sessoes
+def criar_sessao():
+    if 'usuario' not in session:
+        return {"error": "Não autorizado"}, 401
+
+    dados = request.get_json(silent=True) or {}
+    destino = dados.get('destino')
+    nome_arquivo = (dados.get('nome_arquivo') or '').strip()
+    extensao = nome_arquivo.rsplit('.', 1)[1].lower() if '.' in nome_arquivo else ''
+    try:
+        referencia_id = int(dados.get('referencia_id'))
+        tamanho = int(dados.get('tamanho'))
+    except (TypeError, ValueError):
+        return {"error": "referencia_id e tamanho são obrigatórios"}, 400
+
+    if destino not in DESTINOS:
+        return {"error": "Destino inválido"}, 400
+    if extensao not in TIPOS_POR_EXTENSAO or len(nome_arquivo) > 255:
+        return {"error": f"Tipo de arquivo não permitido: {nome_arquivo}"}, 400
+    if not 0 < tamanho <= UPLOAD_MAX_ARQUIVO:
+        return {"error": f"Tamanho deve estar entre 1 byte e {UPLOAD_MAX_ARQUIVO // (1024 * 1024)}MB"}, 413
+    sha256 = dados.get('sha256')
+    if sha256 and not re.fullmatch(r'[0-9a-fA-F]{64}', sha256):
+        return {"error": "sha256 inválido"}, 400
+
+    tabela, permissao = DESTINOS[destino]
+    if permissao and not usuario_tem_permissao(session['usuario'], permissao):
+        return {"error": "Sem permissão"}, 403
+
+    if destino == 'arquivo_saude':
+        tipo_arquivo = dados.get('tipo_arquivo')
+        if tipo_arquivo not in TIPOS_ARQUIVO_SAUDE:
+            return {"error": "tipo_arquivo inválido"}, 400
+    else:
+        tipo_arquivo = TIPOS_POR_EXTENSAO[extensao]
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        limpar_sessoes_expiradas(cursor)
+
+        cursor.execute(f'SELECT 1 FROM {tabela} WHERE id = %s', (referencia_id,))
+        if not cursor.fetchone():
+            conn.commit()
+            return {"error": "Registro de destino não encontrado"}, 404
+
+        cursor.execute('''
+            INSERT INTO upload_sessoes (id, usuario, destino, referencia_id, nome_arquivo,
+                                        tipo_arquivo, descricao, tamanho, sha256)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING *
+        ''', (uuid.uuid4().hex, session['usuario'], destino, referencia_id, nome_arquivo,
+              tipo_arquivo, dados.get('descricao'), tamanho, sha256.lower() if sha256 else None))
+        sessao = cursor.fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+
+    logger.debug(f"📤 Sessão de upload {sessao['id']} criada: {nome_arquivo} ({tamanho} bytes)")
+    return _estado(sessao), 201
+
+@upload_sessoes_bp.route('/api/uploads/<sessao_id>', methods=['GET'])
+@limite_sessoes
+def consultar_sessao(sessao_id):
+    if 'usuario' not in session:
+        return {"error": "Não autorizado"}, 401
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        sessao = _sessao_do_usuario(cursor, sessao_id)
+    finally:
+        conn.close()
+
+    if not sessao:
+        return {"error": "Sessão de upload não encontrada ou expirada"}, 404
+    return _estado(sessao)
+
+@upload_sessoes_bp.route('/api/uploads/<sessao_id>', methods=['PUT'])
+@limiter.exempt
+def enviar_chunk(sessao_id):
+    if 'usuario' not in session:
+        return {"error": "Não autorizado"}, 401
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return {"error": "Cabeçalho Upload-Offset obrigatório"}, 400
+
+    # Corpo lido e verificado antes da transação (sem lock durante a transferência)
+    chunk, tamanho, erro = receber_chunk(request.stream, request.headers.get('Upload-Checksum-SHA256'))
+    try:
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            sessao = _sessao_do_usuario(cursor, sessao_id, bloquear=True)
+            if not sessao:
+                return {"error": "Sessão de upload não encontrada ou expirada"}, 404
+            if erro:
+                return dict(_estado(sessao), error=erro), 422
+
+            # Só aceita continuar do ponto recebido (ou repetir partes já gravadas)
+            if offset < 0 or offset > sessao['recebido']:
+                return dict(_estado(sessao), error="Offset fora do intervalo recebido"), 409
+            if offset + tamanho > sessao['tamanho']:
+                return dict(_estado(sessao), error="Chunk ultrapassa o tamanho declarado"), 400
+
+            recebido = gravar_chunk(sessao_id, offset, chunk, tamanho, sessao['recebido'])
+            cursor.execute('''
+                UPDATE upload_sessoes SET recebido = %s, atualizado_em = CURRENT_TIMESTAMP
+                WHERE id = %s
+                RETURNING *
+            ''', (recebido, sessao_id))
+            sessao = cursor.fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+    finally:
+        if chunk is not None:
+            chunk.close()
+
+    return _estado(sessao)
+
+@upload_sessoes_bp.route('/api/uploads/<sessao_id>/finalizar', methods=['POST'])
+@limite_sessoes
+def finalizar_sessao(sessao_id):
+    if 'usuario' not in session:
+        return {"error": "Não autorizado"}, 401
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        sessao = _sessao_do_usuario(cursor, sessao_id, bloquear=True)
+        if not sessao:
+            return {"error": "Sessão de upload não encontrada ou expirada"}, 404
+        if sessao['recebido'] != sessao['tamanho']:
+            return dict(_estado(sessao), error="Upload incompleto"), 409
+
+        tamanho, sha256, tipo = resumo_arquivo_sessao(sessao_id)
+        extensao = sessao['nome_arquivo'].rsplit('.', 1)[1].lower()
+        if tamanho != sessao['tamanho'] or (sessao['sha256'] and sha256 != sessao['sha256']):
+            return dict(_estado(sessao), error="Arquivo montado não confere com o tamanho/SHA-256 declarado"), 422
+        if tipo != TIPOS_POR_EXTENSAO.get(extensao):
+            return {"error": f"Conteúdo não corresponde à extensão: {sessao['nome_arquivo']}"}, 422
+
+        with open(caminho_sessao(sessao_id), 'rb') as arquivo:
+            if sessao['destino'] == 'arquivo_saude':
+                tabela = 'arquivos_saude'
+                ids = inserir_arquivos_saude(cursor, [(sessao['referencia_id'], sessao['nome_arquivo'],
+                                                       sessao['tipo_arquivo'], arquivo, sessao['descricao'],
+                                                       tamanho, sha256)])
+                publicar_invalidacao('arquivos', cursor=cursor)
+            else:
+                tabela = 'comprovantes_caixa'
+                # Mesma transação do DELETE da sessão: um retry não duplica o comprovante
+                ids = [inserir_comprovante_caixa(sessao['referencia_id'], sessao['nome_arquivo'],
+                                                 sessao['tipo_arquivo'], arquivo, tamanho=tamanho, sha256=sha256,
+                                                 cursor=cursor)]
+
+        cursor.execute('DELETE FROM upload_sessoes WHERE id = %s', (sessao_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+    remover_arquivo_sessao(sessao_id)
+    agendar_otimizacao(tabela, ids)
+    logger.info(f"✅ Upload {sessao['nome_arquivo']} finalizado ({tamanho} bytes) por {session['usuario']}")
+    return {"destino": sessao['destino'], "referencia_id": sessao['referencia_id'],
+            "nome_arquivo": sessao['nome_arquivo'], "tamanho": tamanho, "sha256": sha256}
+
+@upload_sessoes_bp.route('/api/uploads/<sessao_id>', methods=['DELETE'])
+@limite_sessoes
+def cancelar_sessao(sessao_id):
+    if 'usuario' not in session:
+        return {"error": "Não autorizado"}, 401
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        sessao = _sessao_do_usuario(cursor, sessao_id, bloquear=True)
+        if not sessao:
+            return {"error": "Sessão de upload não encontrada ou expirada"}, 404
+        cursor.execute('DELETE FROM upload_sessoes WHERE id = %s', (sessao_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+    remover_arquivo_sessao(sessao_id)
+    return {"cancelado": True}
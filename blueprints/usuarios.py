@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from database import get_db_connection, registrar_auditoria, usuario_tem_permissao, adicionar_permissao_usuario, obter_permissoes_usuario, remover_permissao_usuario
+from database import get_db_connection, registrar_auditoria, usuario_tem_permissao, adicionar_permissao_usuario, obter_permissoes_usuario, remover_permissao_usuario, obter_contadores, cache_permissoes
 from werkzeug.security import generate_password_hash, check_password_hash
+from cache_bus import publicar_invalidacao, TOPICOS
 import psycopg2.extras
 import logging
 import traceback
@@ -12,6 +13,11 @@ usuarios_bp = Blueprint('usuarios', __name__)
 
 def is_admin_user(username,):
     """Verifica se o usuário tem privilégios de administrador"""
+    eh_admin = cache_permissoes.obter(('admin', username))
+    if eh_admin is not None:
+        return eh_admin
+    
+    geracao = cache_permissoes.geracao()
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
@@ -22,8 +28,12 @@ def is_admin_user(username,):
         
         if result:
             tipo = result[0] if isinstance(result, tuple) else result.get('tipo', 'usuario')
-            return tipo == 'admin'
-        return username == 'admin'  # Fallback para compatibilidade
+            eh_admin = tipo == 'admin'
+        else:
+            eh_admin = username == 'admin'  # Fallback para compatibilidade
+        
+        cache_permissoes.definir(('admin', username), eh_admin, geracao)
+        return eh_admin
     except Exception as e:
         logger.error(f"Erro ao verificar admin: {e}")
         return username == 'admin'  # Fallback para compatibilidade
@@ -119,6 +129,7 @@ def criar_usuario():
         for permissao in permissoes:
             adicionar_permissao_usuario(usuario_id, permissao)
         
+        publicar_invalidacao('permissoes', cursor=cursor)
         conn.commit()
         flash('Usuário criado com sucesso!')
     except Exception as e:
@@ -169,6 +180,7 @@ def excluir_usuario(usuario_id,):
         usuarios_deletados = cursor.rowcount
         
         if usuarios_deletados > 0:
+            publicar_invalidacao('permissoes', cursor=cursor)
             conn.commit()
             flash(f'Usuário "{username}" excluído com sucesso!')
         else:
@@ -224,6 +236,7 @@ def promover_usuario(usuario_id,):
         usuarios_atualizados = cursor.rowcount
         
         if usuarios_atualizados > 0:
+            publicar_invalidacao('permissoes', cursor=cursor)
             conn.commit()
             flash(f'Usuário "{username}" promovido a administrador com sucesso!')
         else:
@@ -285,6 +298,7 @@ def rebaixar_usuario(usuario_id,):
         usuarios_atualizados = cursor.rowcount
         
         if usuarios_atualizados > 0:
+            publicar_invalidacao('permissoes', cursor=cursor)
             conn.commit()
             flash(f'Usuário "{username}" rebaixado a usuário comum!')
         else:
@@ -391,6 +405,7 @@ def editar_usuario(usuario_id,):
                 senha_hash = generate_password_hash(nova_senha)
                 cursor.execute('UPDATE usuarios SET senha = %s WHERE id = %s', (senha_hash, usuario_id))
             
+            publicar_invalidacao('permissoes', cursor=cursor)
             conn.commit()
             cursor.close()
             conn.close()
@@ -454,9 +469,15 @@ def auditoria():
         if where_conditions:
             where_clause = "WHERE " + " AND ".join(where_conditions)
         
-        # Contar total de registros
-        cursor.execute(f"SELECT COUNT(*) as total FROM auditoria {where_clause}", params)
-        total_records = cursor.fetchone()['total']
+        # Total geral vem do contador mantido por trigger
+        stats_total = obter_contadores('auditoria')['auditoria']
+        
+        # Contar total de registros (só precisa varrer quando há filtros)
+        if where_conditions:
+            cursor.execute(f"SELECT COUNT(*) as total FROM auditoria {where_clause}", params)
+            total_records = cursor.fetchone()['total']
+        else:
+            total_records = stats_total
         total_pages = (total_records + per_page - 1) // per_page
         
         # Buscar registros com paginação
@@ -470,9 +491,6 @@ def auditoria():
         auditorias = cursor.fetchall()
         
         # Estatísticas
-        cursor.execute("SELECT COUNT(*) as total FROM auditoria")
-        stats_total = cursor.fetchone()['total']
-        
         cursor.execute("SELECT COUNT(*) as hoje FROM auditoria WHERE DATE(data_acao) = CURRENT_DATE")
         stats_hoje = cursor.fetchone()['hoje']
         
@@ -578,6 +596,9 @@ def admin_reset_execute():
         for sequence in sequences_reset:
             cursor.execute(f'ALTER SEQUENCE {sequence} RESTART WITH 1')
         
+        for topico in TOPICOS:
+            publicar_invalidacao(topico, cursor=cursor)
+        
         conn.commit()
         
         # Registrar auditoria do reset
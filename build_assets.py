@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Build dos arquivos estáticos: minifica, gera nomes com hash e pré-comprime
+
+Cada arquivo de static/ vira static/dist/<caminho>.<hash>.<ext>; CSS e JS
+ganham também as variantes .gz e .br, enviadas prontas por assets.py sem
+custo de compressão por requisição. O manifesto static/dist/manifest.json
+liga o nome original ao nome com hash (usado por url_for('static', ...)).
+
+CSS é minificado aqui; JS só quando o rjsmin estiver instalado (sem ele o
+arquivo vai como está, apenas comprimido).
+
+Uso: python build_assets.py [--limpar]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+STATIC = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST = os.path.join(STATIC, 'dist')
+MANIFESTO = os.path.join(DIST, 'manifest.json')
+
+COMPRIMIVEIS = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+# Variantes antigas geradas à mão; não são fontes
+IGNORAR = ('.gz', '.br')
+
+def minificar_css(texto):
+    """Remove comentários e espaços desnecessários (conservador: não mexe em strings)"""
+    partes = re.split(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', texto)
+    for i in range(0, len(partes), 2):
+        trecho = re.sub(r'/\*.*?\*/', '', partes[i], flags=re.S)
+        trecho = re.sub(r'\s+', ' ', trecho)
+        trecho = re.sub(r'\s*([{};,>])\s*', r'\1', trecho)
+        trecho = re.sub(r'\s*:\s*(?![^{}]*\{)', ':', trecho)
+        partes[i] = trecho.replace(';}', '}')
+    return ''.join(partes).strip()
+
+def minificar(caminho, dados):
+    if '.min.' in os.path.basename(caminho):
+        return dados
+    if caminho.endswith('.css'):
+        return minificar_css(dados.decode('utf-8')).encode('utf-8')
+    if caminho.endswith('.js') and rjsmin is not None:
+        return rjsmin.jsmin(dados.decode('utf-8')).encode('utf-8')
+    return dados
+
+def nome_com_hash(relativo, dados):
+    raiz, ext = os.path.splitext(relativo)
+    return f"{raiz}.{hashlib.sha256(dados).hexdigest()[:12]}{ext}"
+
+def gravar(caminho, dados):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, 'wb') as f:
+        f.write(dados)
+
+def fontes():
+    """Arquivos de static/ (relativos), sem dist/ e sem variantes comprimidas"""
+    for pasta, subpastas, arquivos in os.walk(STATIC):
+        if os.path.abspath(pasta) == DIST:
+            subpastas[:] = []
+            continue
+        subpastas[:] = [s for s in subpastas if os.path.join(pasta, s) != DIST]
+        for arquivo in sorted(arquivos):
+            if not arquivo.endswith(IGNORAR):
+                yield os.path.relpath(os.path.join(pasta, arquivo), STATIC).replace(os.sep, '/')
+
+def construir():
+    manifesto = {}
+    economia = [0, 0]
+    for relativo in fontes():
+        with open(os.path.join(STATIC, relativo), 'rb') as f:
+            original = f.read()
+        dados = minificar(relativo, original)
+        destino = nome_com_hash(relativo, dados)
+        gravar(os.path.join(DIST, destino), dados)
+
+        if relativo.endswith(COMPRIMIVEIS):
+            gravar(os.path.join(DIST, destino + '.gz'), gzip.compress(dados, 9, mtime=0))
+            if brotli is not None:
+                gravar(os.path.join(DIST, destino + '.br'), brotli.compress(dados, quality=11))
+            economia[0] += len(original)
+            economia[1] += len(dados)
+
+        manifesto[relativo] = destino
+        print(f"  {relativo} → dist/{destino}")
+
+    gravar(MANIFESTO, json.dumps(manifesto, indent=2, sort_keys=True).encode('utf-8'))
+    return manifesto, economia
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera os arquivos estáticos com hash e pré-comprimidos')
+    parser.add_argument('--limpar', action='store_true', help='Remove static/dist antes de gerar')
+    args = parser.parse_args()
+
+    print("📦 Build de Arquivos Estáticos - AMEG")
+    print("=" * 50)
+    if brotli is None:
+        print("⚠️  brotli não instalado - apenas variantes .gz")
+
+    try:
+        if args.limpar and os.path.isdir(DIST):
+            shutil.rmtree(DIST)
+        manifesto, (antes, depois) = construir()
+    except Exception as e:
+        print(f"❌ Erro no build: {e}")
+        sys.exit(1)
+
+    print(f"✅ {len(manifesto)} arquivos; CSS/JS minificados: {antes / 1024:.0f} KB → {depois / 1024:.0f} KB")
+
+if __name__ == '__main__':
+    main()
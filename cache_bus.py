@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Barramento de invalidação de cache entre workers (PostgreSQL LISTEN/NOTIFY)
+
+Cada worker mantém caches locais em memória. Quem escreve publica o tópico
+alterado com NOTIFY; uma thread por worker escuta o canal e limpa os caches
+registrados para aquele tópico. Enquanto o listener estiver fora do ar os
+caches passam a usar um TTL curto de segurança.
+"""
+import os
+import select
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+CANAL = 'ameg_cache'
+TOPICOS = ('cadastros', 'permissoes', 'caixa', 'arquivos', 'api_clientes', 'versoes', 'auditoria')
+
+# TTL usado pelos caches quando o listener não está conectado
+TTL_FALLBACK = int(os.environ.get('CACHE_TTL_FALLBACK', 30))
+
+_AUSENTE = object()
+
+_caches = {}
+_lock = threading.Lock()
+_estado = {
+    'pid': None,
+    'thread': None,
+    'ativo': False
+}
+
+def registrar_cache(topicos, invalidar):
+    """Registra uma função invalidar(chave=None) para os tópicos informados"""
+    if isinstance(topicos, str):
+        topicos = (topicos,)
+    with _lock:
+        for topico in topicos:
+            _caches.setdefault(topico, []).append(invalidar)
+
+def invalidar_local(topico, chave=None):
+    """Limpa os caches deste processo registrados para o tópico"""
+    for invalidar in list(_caches.get(topico, ())):
+        try:
+            invalidar(chave)
+        except Exception as e:
+            logger.error(f"❌ Erro ao invalidar cache do tópico {topico}: {e}")
+
+def invalidar_todos():
+    """Limpa todos os caches registrados neste processo"""
+    for topico in list(_caches):
+        invalidar_local(topico)
+
+def publicar_invalidacao(topico, chave=None, cursor=None):
+    """Publica a invalidação de um tópico para todos os workers
+
+    Com cursor, o NOTIFY entra na transação em andamento e só é entregue no
+    COMMIT (nada é invalidado se houver ROLLBACK nos outros workers).
+    """
+    invalidar_local(topico, chave)
+    payload = topico if chave is None else f"{topico}:{chave}"
+
+    if cursor is not None:
+        cursor.execute('SELECT pg_notify(%s, %s)', (CANAL, payload))
+        return
+
+    try:
+        from database import get_db_connection
+        conn = get_db_connection()
+        conn.autocommit = True
+        cur = conn.cursor()
+        cur.execute('SELECT pg_notify(%s, %s)', (CANAL, payload))
+        cur.close()
+        conn.close()
+    except Exception as e:
+        logger.error(f"❌ Erro ao publicar invalidação {payload}: {e}")
+
+def listener_ativo():
+    """Indica se o listener deste processo está conectado"""
+    return _estado['ativo'] and _estado['pid'] == os.getpid()
+
+def ttl_efetivo(ttl):
+    """TTL a usar agora: o configurado, ou o de segurança se o listener caiu"""
+    return ttl if listener_ativo() else min(ttl, TTL_FALLBACK)
+
+def iniciar_listener():
+    """Inicia a thread de escuta (uma por processo; seguro chamar a cada request)"""
+    pid = os.getpid()
+    thread = _estado['thread']
+    if _estado['pid'] == pid and thread is not None and thread.is_alive():
+        return
+
+    with _lock:
+        thread = _estado['thread']
+        if _estado['pid'] == pid and thread is not None and thread.is_alive():
+            return
+        _estado['pid'] = pid
+        _estado['ativo'] = False
+        thread = threading.Thread(target=_loop_listener, name='cache-bus', daemon=True)
+        _estado['thread'] = thread
+        thread.start()
+
+def _loop_listener():
+    """Escuta o canal com reconexão e backoff exponencial"""
+    from database import get_db_connection
+    import psycopg2.extensions
+
+    espera = 1
+    while True:
+        conn = None
+        try:
+            conn = get_db_connection()
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            cursor = conn.cursor()
+            cursor.execute(f'LISTEN {CANAL}')
+
+            # Notificações podem ter sido perdidas enquanto estava desconectado
+            invalidar_todos()
+            _estado['ativo'] = True
+            espera = 1
+            logger.info(f"🔔 Listener de cache conectado (pid {os.getpid()})")
+
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    # Sem notificações: verificar se a conexão continua viva
+                    cursor.execute('SELECT 1')
+                    continue
+
+                conn.poll()
+                while conn.notifies:
+                    notificacao = conn.notifies.pop(0)
+                    topico, _, chave = notificacao.payload.partition(':')
+                    invalidar_local(topico, chave or None)
+
+        except Exception as e:
+            _estado['ativo'] = False
+            logger.warning(f"⚠️ Listener de cache desconectado: {e} (nova tentativa em {espera}s)")
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            time.sleep(espera)
+            espera = min(espera * 2, 60)
+
+class CacheLocal:
+    """Cache em memória do processo, invalidado pelo barramento"""
+
+    def __init__(self, topicos, ttl):
+        self.ttl = ttl
+        self._dados = {}
+        self._geracao = 0
+        registrar_cache(topicos, self.invalidar)
+
+    def obter(self, chave, padrao=None):
+        item = self._dados.get(chave, _AUSENTE)
+        if item is _AUSENTE:
+            return padrao
+
+        valor, instante = item
+        if time.monotonic() - instante >= ttl_efetivo(self.ttl):
+            self._dados.pop(chave, None)
+            return padrao
+        return valor
+
+    def geracao(self):
+        """Contador de invalidações: lido antes da consulta e passado a definir()"""
+        return self._geracao
+
+    def definir(self, chave, valor, geracao=None):
+        # Invalidado durante a consulta: o valor lido pode ser anterior ao COMMIT
+        if geracao is not None and geracao != self._geracao:
+            return
+        self._dados[chave] = (valor, time.monotonic())
+
+    def invalidar(self, chave=None):
+        self._geracao += 1
+        if chave is None:
+            self._dados.clear()
+            return
+        for k in list(self._dados):
+            if k == chave or (isinstance(k, tuple) and k and k[0] == chave):
+                self._dados.pop(k, None)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Cache HTTP condicional para relatórios e dados dos gráficos
+
+@cache_condicional('cadastros', ...) calcula um ETag fraco a partir da versão
+de dados das tabelas usadas pela view (versoes_tabelas, incrementada por
+trigger), do usuário logado, do dia e da versão publicada da aplicação.
+Se o navegador já tem essa versão (If-None-Match), responde 304 antes de a
+view rodar qualquer consulta. As versões ficam em memória em cada worker e
+são invalidadas pelo NOTIFY que o próprio trigger envia.
+"""
+import os
+import hashlib
+import logging
+from datetime import date
+from functools import wraps
+
+from flask import Response, make_response, request, session
+
+from database import get_db_connection
+from cache_bus import CacheLocal
+
+logger = logging.getLogger(__name__)
+
+# Muda a cada deploy (templates e lógica dos relatórios podem mudar)
+VERSAO_APLICACAO = os.environ.get('RAILWAY_GIT_COMMIT_SHA') or os.environ.get('RAILWAY_DEPLOYMENT_ID', '')
+
+_versoes = CacheLocal('versoes', ttl=60)
+
+def versoes_tabelas(tabelas):
+    """{tabela: (versao, alterado_em)}; lê do banco só as que não estão em memória"""
+    versoes = {}
+    faltando = []
+    for tabela in tabelas:
+        versao = _versoes.obter(tabela)
+        if versao is None:
+            faltando.append(tabela)
+        else:
+            versoes[tabela] = versao
+    if faltando:
+        geracao = _versoes.geracao()
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT tabela, versao, alterado_em FROM versoes_tabelas WHERE tabela = ANY(%s)',
+                           (faltando,))
+            for tabela, versao, alterado_em in cursor.fetchall():
+                versoes[tabela] = (versao, alterado_em)
+                _versoes.definir(tabela, (versao, alterado_em), geracao)
+        finally:
+            conn.close()
+    return versoes
+
+def etag_corresponde(etag):
+    """If-None-Match contém o ETag (inclusive com o sufixo :gzip/:br do Flask-Compress)"""
+    if request.if_none_match.star_tag:
+        return True
+    return any(valor.rsplit(':', 1)[0] == etag or valor == etag
+               for valor in request.if_none_match.as_set(include_weak=True))
+
+def cache_condicional(*tabelas):
+    """Responde 304 enquanto as tabelas não mudarem; a view só roda quando há dados novos"""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            # Mensagens flash pendentes precisam ser renderizadas
+            if request.method != 'GET' or '_flashes' in session:
+                return f(*args, **kwargs)
+            try:
+                versoes = versoes_tabelas(tabelas)
+            except Exception as e:
+                logger.warning(f"⚠️ Cache condicional indisponível em {request.path}: {e}")
+                return f(*args, **kwargs)
+
+            base = '|'.join([
+                VERSAO_APLICACAO, date.today().isoformat(),
+                session.get('usuario', ''), session.get('tipo', ''),
+                *(f'{tabela}:{versoes[tabela][0]}' for tabela in tabelas if tabela in versoes),
+            ])
+            etag = hashlib.md5(base.encode()).hexdigest()
+
+            if etag_corresponde(etag):
+                resposta = Response(status=304)
+            else:
+                resposta = make_response(f(*args, **kwargs))
+                if resposta.status_code != 200:
+                    return resposta
+            resposta.set_etag(etag, weak=True)
+            if versoes:
+                resposta.last_modified = max(alterado_em for _, alterado_em in versoes.values())
+            resposta.headers['Cache-Control'] = 'private, no-cache'
+            return resposta
+        return decorated
+    return decorator
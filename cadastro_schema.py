@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Registro declarativo dos campos de cadastros
+
+Cada campo do formulário é declarado uma única vez (tipo SQL, rótulo e seção
+da ficha). Na importação do módulo são montados os objetos usados a cada
+request: SQL de INSERT/migração, conversores do formulário, limites de
+tamanho, ordem de exportação e layout das seções da ficha em PDF.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+Campo = namedtuple('Campo', ['nome', 'sql', 'rotulo', 'secao', 'tipo', 'tamanho', 'precisao', 'escala'])
+
+# Seções da ficha, na ordem de exibição
+SECOES = (
+    ('pessoais', '📋 Dados Pessoais'),
+    ('companheiro', '💑 Dados do Companheiro(a)'),
+    ('familia', '👨👩👧👦 Dados Familiares e Trabalho'),
+    ('habitacao', '🏠 Dados Habitacionais'),
+    ('saude', '🏥 Dados de Saúde'),
+    ('trabalho', '🛒 Atividade de Trabalho'),
+    ('renda', '💵 Fontes de Renda'),
+)
+
+# (nome, tipo SQL, rótulo, seção) na ordem do formulário
+_DEFINICAO = (
+    # Dados pessoais
+    ('nome_completo', 'VARCHAR(255)', 'Nome Completo', 'pessoais'),
+    ('endereco', 'TEXT', 'Endereço', 'pessoais'),
+    ('numero', 'VARCHAR(10)', 'Número', 'pessoais'),
+    ('bairro', 'VARCHAR(100)', 'Bairro', 'pessoais'),
+    ('cep', 'VARCHAR(10)', 'CEP', 'pessoais'),
+    ('cidade', 'VARCHAR(100)', 'Cidade', 'pessoais'),
+    ('estado', 'VARCHAR(2)', 'Estado', 'pessoais'),
+    ('telefone', 'VARCHAR(20)', 'Telefone', 'pessoais'),
+    ('ponto_referencia', 'TEXT', 'Ponto Referência', 'pessoais'),
+    ('genero', 'VARCHAR(50)', 'Gênero', 'pessoais'),
+    ('idade', 'INTEGER', 'Idade', 'pessoais'),
+    ('data_nascimento', 'DATE', 'Data Nascimento', 'pessoais'),
+    ('titulo_eleitor', 'VARCHAR(20)', 'Título Eleitor', 'pessoais'),
+    ('cidade_titulo', 'VARCHAR(100)', 'Cidade Título', 'pessoais'),
+    ('cpf', 'VARCHAR(14)', 'CPF', 'pessoais'),
+    ('rg', 'VARCHAR(20)', 'RG', 'pessoais'),
+    ('nis', 'VARCHAR(20)', 'NIS', 'pessoais'),
+    ('estado_civil', 'VARCHAR(30)', 'Estado Civil', 'pessoais'),
+    ('escolaridade', 'VARCHAR(100)', 'Escolaridade', 'pessoais'),
+    ('profissao', 'VARCHAR(100)', 'Profissão', 'pessoais'),
+
+    # Companheiro(a)
+    ('nome_companheiro', 'VARCHAR(255)', 'Nome Companheiro', 'companheiro'),
+    ('cpf_companheiro', 'VARCHAR(14)', 'CPF Companheiro', 'companheiro'),
+    ('rg_companheiro', 'VARCHAR(20)', 'RG Companheiro', 'companheiro'),
+    ('idade_companheiro', 'INTEGER', 'Idade Companheiro', 'companheiro'),
+    ('escolaridade_companheiro', 'VARCHAR(100)', 'Escolaridade Companheiro', 'companheiro'),
+    ('profissao_companheiro', 'VARCHAR(100)', 'Profissão Companheiro', 'companheiro'),
+    ('data_nascimento_companheiro', 'DATE', 'Data Nasc. Companheiro', 'companheiro'),
+    ('titulo_companheiro', 'VARCHAR(20)', 'Título Companheiro', 'companheiro'),
+    ('cidade_titulo_companheiro', 'VARCHAR(100)', 'Cidade Título Comp.', 'companheiro'),
+    ('nis_companheiro', 'VARCHAR(20)', 'NIS Companheiro', 'companheiro'),
+
+    # Família
+    ('tipo_trabalho', 'VARCHAR(100)', 'Tipo Trabalho', 'familia'),
+    ('pessoas_trabalham', 'INTEGER', 'Pessoas Trabalham', 'familia'),
+    ('aposentados_pensionistas', 'INTEGER', 'Aposentados/Pensionistas', 'familia'),
+    ('num_pessoas_familia', 'INTEGER', 'Pessoas na Família', 'familia'),
+    ('num_familias', 'INTEGER', 'Número Famílias', 'familia'),
+    ('adultos', 'INTEGER', 'Adultos', 'familia'),
+    ('criancas', 'INTEGER', 'Crianças', 'familia'),
+    ('adolescentes', 'INTEGER', 'Adolescentes', 'familia'),
+    ('idosos', 'INTEGER', 'Idosos', 'familia'),
+    ('gestantes', 'INTEGER', 'Gestantes', 'familia'),
+    ('nutrizes', 'INTEGER', 'Nutrizes', 'familia'),
+    ('renda_familiar', 'DECIMAL(10,2)', 'Renda Familiar', 'familia'),
+    ('renda_per_capita', 'DECIMAL(10,2)', 'Renda Per Capita', 'familia'),
+    ('bolsa_familia', 'DECIMAL(10,2)', 'Bolsa Família', 'familia'),
+
+    # Habitação
+    ('casa_tipo', 'VARCHAR(50)', 'Tipo Casa', 'habitacao'),
+    ('casa_material', 'VARCHAR(50)', 'Material Casa', 'habitacao'),
+    ('energia', 'VARCHAR(10)', 'Energia Elétrica', 'habitacao'),
+    ('lixo', 'VARCHAR(10)', 'Destino Lixo', 'habitacao'),
+    ('agua', 'VARCHAR(10)', 'Abastecimento Água', 'habitacao'),
+    ('esgoto', 'VARCHAR(10)', 'Esgotamento Sanitário', 'habitacao'),
+    ('observacoes', 'TEXT', 'Observações', None),
+
+    # Saúde
+    ('tem_doenca_cronica', 'VARCHAR(10)', 'Doença Crônica', 'saude'),
+    ('doencas_cronicas', 'TEXT', 'Quais Doenças', 'saude'),
+    ('usa_medicamento_continuo', 'VARCHAR(10)', 'Medicamento Contínuo', 'saude'),
+    ('medicamentos_continuos', 'TEXT', 'Quais Medicamentos', 'saude'),
+    ('tem_doenca_mental', 'VARCHAR(10)', 'Doença Mental', 'saude'),
+    ('doencas_mentais', 'TEXT', 'Quais Doenças Mentais', 'saude'),
+    ('tem_deficiencia', 'VARCHAR(10)', 'Deficiência', 'saude'),
+    ('tipo_deficiencia', 'TEXT', 'Tipo Deficiência', 'saude'),
+    ('precisa_cuidados_especiais', 'VARCHAR(10)', 'Cuidados Especiais', 'saude'),
+    ('cuidados_especiais', 'TEXT', 'Quais Cuidados', 'saude'),
+
+    # Atividade, condições e estrutura de trabalho
+    ('com_que_trabalha', 'TEXT', 'Com que Trabalha', 'trabalho'),
+    ('onde_trabalha', 'TEXT', 'Onde Trabalha', 'trabalho'),
+    ('localizacao_trabalho', 'VARCHAR(50)', 'Localização', 'trabalho'),
+    ('horario_trabalho', 'TEXT', 'Horário', 'trabalho'),
+    ('tempo_atividade', 'TEXT', 'Tempo na Atividade', 'trabalho'),
+    ('atua_ponto_fixo', 'VARCHAR(10)', 'Ponto Fixo', 'trabalho'),
+    ('qual_ponto_fixo', 'TEXT', 'Qual Ponto Fixo', 'trabalho'),
+    ('dias_semana_trabalha', 'INTEGER', 'Dias por Semana', 'trabalho'),
+    ('trabalho_continuo_temporada', 'VARCHAR(20)', 'Contínuo/Temporada', 'trabalho'),
+    ('sofreu_acidente_trabalho', 'VARCHAR(10)', 'Acidente de Trabalho', 'trabalho'),
+    ('qual_acidente', 'TEXT', 'Qual Acidente', 'trabalho'),
+    ('trabalho_incomoda_calor', 'VARCHAR(10)', 'Incomoda: Calor', 'trabalho'),
+    ('trabalho_incomoda_barulho', 'VARCHAR(10)', 'Incomoda: Barulho', 'trabalho'),
+    ('trabalho_incomoda_seguranca', 'VARCHAR(10)', 'Incomoda: Segurança', 'trabalho'),
+    ('trabalho_incomoda_banheiros', 'VARCHAR(10)', 'Incomoda: Banheiros', 'trabalho'),
+    ('trabalho_incomoda_outro', 'VARCHAR(10)', 'Incomoda: Outro', 'trabalho'),
+    ('trabalho_incomoda_outro_desc', 'TEXT', 'Outro Incômodo', 'trabalho'),
+    ('acesso_banheiro_agua', 'VARCHAR(10)', 'Acesso a Banheiro/Água', 'trabalho'),
+    ('trabalha_sozinho_ajudantes', 'TEXT', 'Sozinho/Ajudantes', 'trabalho'),
+    ('possui_autorizacao_municipal', 'VARCHAR(10)', 'Autorização Municipal', 'trabalho'),
+    ('problemas_fiscalizacao_policia', 'VARCHAR(10)', 'Problemas Fiscalização', 'trabalho'),
+    ('estrutura_barraca', 'VARCHAR(10)', 'Estrutura: Barraca', 'trabalho'),
+    ('estrutura_carrinho', 'VARCHAR(10)', 'Estrutura: Carrinho', 'trabalho'),
+    ('estrutura_mesa', 'VARCHAR(10)', 'Estrutura: Mesa', 'trabalho'),
+    ('estrutura_outro', 'VARCHAR(10)', 'Estrutura: Outro', 'trabalho'),
+    ('estrutura_outro_desc', 'TEXT', 'Outra Estrutura', 'trabalho'),
+    ('necessita_energia_eletrica', 'VARCHAR(10)', 'Necessita Energia', 'trabalho'),
+    ('utiliza_gas_cozinha', 'VARCHAR(10)', 'Utiliza Gás', 'trabalho'),
+    ('usa_veiculo_proprio', 'VARCHAR(10)', 'Veículo Próprio', 'trabalho'),
+    ('qual_veiculo', 'TEXT', 'Qual Veículo', 'trabalho'),
+
+    # Renda
+    ('fonte_renda_trabalho_ambulante', 'VARCHAR(10)', 'Renda: Trabalho Ambulante', 'renda'),
+    ('fonte_renda_aposentadoria', 'VARCHAR(10)', 'Renda: Aposentadoria', 'renda'),
+    ('fonte_renda_outro_trabalho', 'VARCHAR(10)', 'Renda: Outro Trabalho', 'renda'),
+    ('fonte_renda_beneficio_social', 'VARCHAR(10)', 'Renda: Benefício Social', 'renda'),
+    ('fonte_renda_outro', 'VARCHAR(10)', 'Renda: Outro', 'renda'),
+    ('fonte_renda_outro_desc', 'TEXT', 'Outra Fonte de Renda', 'renda'),
+    ('pessoas_dependem_renda', 'INTEGER', 'Pessoas Dependem da Renda', 'renda'),
+
+    ('foto_base64', 'TEXT', 'Foto', None),
+)
+
+# Colunas do relatório completo em CSV
+_EXPORTACAO = ('nome_completo', 'telefone', 'endereco', 'numero', 'bairro', 'cep', 'genero',
+               'idade', 'cpf', 'rg', 'estado_civil', 'escolaridade', 'renda_familiar')
+
+# Cabeçalhos do CSV que diferem do rótulo do formulário (mantidos para quem consome a exportação)
+_ROTULOS_EXPORTACAO = {'nome_completo': 'Nome'}
+
+# ---------------------------------------------------------------------------
+# Compilação (uma vez, na importação)
+# ---------------------------------------------------------------------------
+
+def _compilar_campo(nome, sql, rotulo, secao):
+    tamanho = precisao = escala = None
+    if sql.startswith('VARCHAR'):
+        tipo = 'texto'
+        tamanho = int(re.search(r'\d+', sql).group())
+    elif sql.startswith('DECIMAL'):
+        tipo = 'decimal'
+        precisao, escala = (int(n) for n in re.findall(r'\d+', sql))
+    elif sql == 'INTEGER':
+        tipo = 'inteiro'
+    elif sql == 'DATE':
+        tipo = 'data'
+    else:
+        tipo = 'texto'
+    return Campo(nome, sql, rotulo, secao, tipo, tamanho, precisao, escala)
+
+CAMPOS = tuple(_compilar_campo(*definicao) for definicao in _DEFINICAO)
+CAMPOS_POR_NOME = {campo.nome: campo for campo in CAMPOS}
+COLUNAS = tuple(campo.nome for campo in CAMPOS)
+
+# Limites dos campos conforme definido na tabela do banco
+FIELD_LIMITS = {campo.nome: campo.tamanho for campo in CAMPOS if campo.tamanho}
+
+SQL_INSERT = (f"INSERT INTO cadastros ({', '.join(COLUNAS)}) "
+              f"VALUES ({', '.join(['%s'] * len(COLUNAS))}) RETURNING id")
+
+# Garante as colunas em bancos criados por versões anteriores (uma instrução)
+SQL_GARANTIR_COLUNAS = 'ALTER TABLE cadastros ' + ', '.join(
+    f'ADD COLUMN IF NOT EXISTS {campo.nome} {campo.sql}' for campo in CAMPOS
+)
+
+# Linha atual para comparação; a foto vem como hash para não trafegar o base64
+SQL_SELECT_COMPARACAO = 'SELECT {} FROM cadastros WHERE id = %s FOR UPDATE'.format(
+    ', '.join('md5(foto_base64)' if nome == 'foto_base64' else nome for nome in COLUNAS)
+)
+
+@lru_cache(maxsize=256)
+def sql_update(colunas):
+    """UPDATE de um subconjunto de colunas (tupla), montado uma vez por combinação"""
+    return f"UPDATE cadastros SET {', '.join(f'{coluna} = %s' for coluna in colunas)} WHERE id = %s"
+
+def _para_inteiro(valor):
+    if valor == '' or valor is None:
+        return None
+    try:
+        return int(valor)
+    except (ValueError, TypeError):
+        return None
+
+def _para_decimal(valor):
+    if valor == '' or valor is None:
+        return None
+    try:
+        return float(valor)
+    except (ValueError, TypeError):
+        return None
+
+def _para_data(valor):
+    return valor or None
+
+def _texto(valor):
+    return valor
+
+_CONVERSORES_TIPO = {'inteiro': _para_inteiro, 'decimal': _para_decimal, 'data': _para_data, 'texto': _texto}
+_CONVERSORES = tuple((campo.nome, _CONVERSORES_TIPO[campo.tipo]) for campo in CAMPOS)
+
+def linha_do_formulario(form, padrao=None):
+    """Converte o formulário para a tupla de valores na ordem de COLUNAS"""
+    get = form.get
+    return tuple(converter(get(nome, padrao)) for nome, converter in _CONVERSORES)
+
+def validate_field_lengths(form_data):
+    """Valida se os campos não excedem os limites da tabela"""
+    errors = []
+
+    for field_name, max_length in FIELD_LIMITS.items():
+        if field_name in form_data:
+            value = str(form_data[field_name]).strip()
+            if len(value) > max_length:
+                field_display = field_name.replace('_', ' ').title()
+                errors.append(f"{field_display}: máximo {max_length} caracteres (atual: {len(value)})")
+
+    return errors
+
+# Exportação: (cabeçalhos, colunas)
+EXPORTACAO_CABECALHOS = tuple(_ROTULOS_EXPORTACAO.get(nome, CAMPOS_POR_NOME[nome].rotulo) for nome in _EXPORTACAO)
+EXPORTACAO_COLUNAS = _EXPORTACAO
+
+# Ficha em PDF: [(chave, título, [(rótulo, coluna, moeda)])]
+FICHA_SECOES = tuple(
+    (chave, titulo, tuple((f'{campo.rotulo}:', campo.nome, campo.tipo == 'decimal')
+                          for campo in CAMPOS if campo.secao == chave))
+    for chave, titulo in SECOES
+)
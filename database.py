@@ -1,18 +1,26 @@
 import os
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from werkzeug.security import generate_password_hash
 import logging
-
-# Importar security manager
-try:
-    from security import security_manager
-except ImportError:
-    security_manager = None
-    logging.warning("Security manager não disponível - usando fallback")
+import contextvars
+from datetime import date, datetime, timedelta
+from cache_bus import CacheLocal, publicar_invalidacao
+from cadastro_schema import SQL_GARANTIR_COLUNAS
 
 logger = logging.getLogger(__name__)
 
+# statement_timeout das conexões abertas pela requisição atual, definido por
+# rota em app.py (relatórios e exportações têm mais tempo). None = sem limite
+# (CLI, bootstrap e tarefas em segundo plano)
+STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+STATEMENT_TIMEOUT_LONGO_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_LONGO_MS', 300000))
+statement_timeout = contextvars.ContextVar('statement_timeout', default=None)
+
+# Caches locais invalidados pelo barramento (ver cache_bus.py)
+cache_permissoes = CacheLocal('permissoes', ttl=600)
+cache_cadastros_simples = CacheLocal('cadastros', ttl=600)
+
 def get_db_connection():
     """Conecta ao PostgreSQL do Railway"""
     database_url = os.environ.get('DATABASE_URL')
@@ -24,7 +32,11 @@ def get_db_connection():
     
     logger.debug("Tentando conectar ao PostgreSQL...")
     try:
-        conn = psycopg2.connect(database_url)
+        timeout = statement_timeout.get()
+        if timeout is None:
+            conn = psycopg2.connect(database_url)
+        else:
+            conn = psycopg2.connect(database_url, options=f'-c statement_timeout={timeout}')
         logger.debug("✅ Conexão PostgreSQL estabelecida")
         return conn
     except Exception as e:
@@ -180,110 +192,10 @@ def init_db_tables():
         ''')
         logger.debug("✅ Tabela cadastros criada")
         
-        # Verificar e adicionar campo localizacao_trabalho se não existir
-        logger.debug("Verificando se campo localizacao_trabalho existe...")
-        cursor.execute("""
-            SELECT column_name FROM information_schema.columns 
-            WHERE table_name = 'cadastros' AND column_name = 'localizacao_trabalho'
-        """)
-        localizacao_existe = cursor.fetchone()
-        
-        if not localizacao_existe:
-            logger.info("🔧 Adicionando campo localizacao_trabalho à tabela...")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS localizacao_trabalho VARCHAR(50)")
-            logger.info("✅ Campo localizacao_trabalho adicionado!")
-        else:
-            logger.debug("✅ Campo localizacao_trabalho já existe")
-        
-        # Verificar e adicionar campos cidade e estado se não existirem
-        logger.debug("Verificando se campos cidade e estado existem...")
-        cursor.execute("""
-            SELECT column_name FROM information_schema.columns 
-            WHERE table_name = 'cadastros' AND column_name = 'cidade'
-        """)
-        cidade_existe = cursor.fetchone()
-        
-        if not cidade_existe:
-            logger.info("🔧 Adicionando campos cidade e estado à tabela...")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS cidade VARCHAR(100)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS estado VARCHAR(2)")
-            logger.info("✅ Campos cidade e estado adicionados!")
-        else:
-            logger.debug("✅ Campos cidade e estado já existem")
-        
-        # Verificar e adicionar novos campos se não existirem
-        logger.debug("Verificando se novos campos de trabalho existem...")
-        cursor.execute("""
-            SELECT column_name FROM information_schema.columns 
-            WHERE table_name = 'cadastros' AND column_name = 'com_que_trabalha'
-        """)
-        campo_existe = cursor.fetchone()
-        
-        if not campo_existe:
-            logger.info("🔧 Adicionando novos campos de trabalho à tabela existente...")
-            
-            # Adicionar campos de atividade de trabalho
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS com_que_trabalha TEXT")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS onde_trabalha TEXT")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS horario_trabalho TEXT")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS tempo_atividade TEXT")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS atua_ponto_fixo VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS qual_ponto_fixo TEXT")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS dias_semana_trabalha INTEGER")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS trabalho_continuo_temporada VARCHAR(20)")
-            
-            # Adicionar campos de condições de trabalho
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS sofreu_acidente_trabalho VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS qual_acidente TEXT")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS trabalho_incomoda_calor VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS trabalho_incomoda_barulho VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS trabalho_incomoda_seguranca VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS trabalho_incomoda_banheiros VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS trabalho_incomoda_outro VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS trabalho_incomoda_outro_desc TEXT")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS acesso_banheiro_agua VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS trabalha_sozinho_ajudantes TEXT")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS possui_autorizacao_municipal VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS problemas_fiscalizacao_policia VARCHAR(10)")
-            
-            # Adicionar campos de estrutura de trabalho
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS estrutura_barraca VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS estrutura_carrinho VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS estrutura_mesa VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS estrutura_outro VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS estrutura_outro_desc TEXT")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS necessita_energia_eletrica VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS utiliza_gas_cozinha VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS usa_veiculo_proprio VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS qual_veiculo TEXT")
-            
-            # Adicionar campos de renda e família
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS fonte_renda_trabalho_ambulante VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS fonte_renda_aposentadoria VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS fonte_renda_outro_trabalho VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS fonte_renda_beneficio_social VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS fonte_renda_outro VARCHAR(10)")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS fonte_renda_outro_desc TEXT")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS pessoas_dependem_renda INTEGER")
-            
-            logger.info("✅ Novos campos adicionados com sucesso!")
-        else:
-            logger.debug("✅ Campos de trabalho já existem na tabela")
-        
-        # Verificar e adicionar campo foto_base64 se não existir
-        logger.debug("Verificando se campo foto_base64 existe...")
-        cursor.execute("""
-            SELECT column_name FROM information_schema.columns 
-            WHERE table_name = 'cadastros' AND column_name = 'foto_base64'
-        """)
-        foto_existe = cursor.fetchone()
-        
-        if not foto_existe:
-            logger.info("🔧 Adicionando campo foto_base64 à tabela...")
-            cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS foto_base64 TEXT")
-            logger.info("✅ Campo foto_base64 adicionado!")
-        else:
-            logger.debug("✅ Campo foto_base64 já existe na tabela")
+        # Colunas adicionadas depois da criação da tabela (localização, cidade/estado,
+        # trabalho, renda, foto...): uma única instrução gerada pelo registro de campos
+        cursor.execute(SQL_GARANTIR_COLUNAS)
+        logger.debug("✅ Colunas de cadastros verificadas")
         
         # Tabela arquivos_saude
         logger.debug("Criando tabela arquivos_saude...")
@@ -376,9 +288,14 @@ def init_db_tables():
         
         # Índices para tabela cadastros
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_cadastros_cpf ON cadastros(cpf)')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_cadastros_cpf_digitos ON cadastros ((regexp_replace(cpf, '\\D', '', 'g')))")
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_cadastros_nome ON cadastros(nome_completo)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_cadastros_nome_id ON cadastros(nome_completo, id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_cadastros_data ON cadastros(data_cadastro)')
         
+        # Feed de alterações da API (/api/v1/cadastros/changes)
+        criar_feed_alteracoes(cursor)
+        
         # Índices para tabela auditoria
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_auditoria_usuario ON auditoria(usuario)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_auditoria_data ON auditoria(data_acao)')
@@ -393,6 +310,11 @@ def init_db_tables():
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_saude_pessoa_nome ON dados_saude_pessoa(nome_pessoa)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_saude_pessoa_data ON dados_saude_pessoa(data_cadastro)')
         
+        # Índices parciais para as flags 'Sim' (relatório de saúde)
+        for flag in ('tem_doenca_cronica', 'usa_medicamento_continuo', 'tem_doenca_mental',
+                     'tem_deficiencia', 'precisa_cuidados_especiais'):
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_saude_{flag}_sim ON dados_saude_pessoa(cadastro_id) WHERE {flag} = 'Sim'")
+        
         logger.debug("✅ Índices de otimização criados")
         
         # Tabela movimentacoes_caixa
@@ -427,6 +349,70 @@ def init_db_tables():
         ''')
         logger.debug("✅ Tabela comprovantes_caixa criada")
         
+        # Tamanho e SHA-256 calculados durante o upload (uploads.py)
+        for tabela in ('arquivos_saude', 'comprovantes_caixa'):
+            cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS tamanho BIGINT, ADD COLUMN IF NOT EXISTS sha256 CHAR(64)")
+        
+        # Otimização em segundo plano (otimizacao.py) e originais guardados
+        for tabela in ('arquivos_saude', 'comprovantes_caixa'):
+            cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS tamanho_original BIGINT, ADD COLUMN IF NOT EXISTS otimizado_em TIMESTAMP")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_otimizacao_pendente ON {tabela} (id) WHERE otimizado_em IS NULL")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS arquivos_originais (
+                tabela VARCHAR(30) NOT NULL,
+                arquivo_id INTEGER NOT NULL,
+                arquivo_dados BYTEA NOT NULL,
+                sha256 CHAR(64),
+                criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (tabela, arquivo_id)
+            )
+        ''')
+        
+        # Prévias dos anexos, compartilhadas por conteúdo (previas.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS previas_arquivos (
+                sha256 CHAR(64) NOT NULL,
+                lado INTEGER NOT NULL,
+                imagem BYTEA NOT NULL,
+                criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (sha256, lado)
+            )
+        ''')
+        
+        # Sessões de upload retomável (o conteúdo fica em disco até a finalização)
+        logger.debug("Criando tabela upload_sessoes...")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS upload_sessoes (
+                id CHAR(32) PRIMARY KEY,
+                usuario VARCHAR(100) NOT NULL,
+                destino VARCHAR(20) NOT NULL,
+                referencia_id INTEGER NOT NULL,
+                nome_arquivo VARCHAR(255) NOT NULL,
+                tipo_arquivo VARCHAR(100),
+                descricao TEXT,
+                tamanho BIGINT NOT NULL,
+                sha256 CHAR(64),
+                recebido BIGINT NOT NULL DEFAULT 0,
+                criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_upload_sessoes_atualizado ON upload_sessoes (atualizado_em)')
+        logger.debug("✅ Tabela upload_sessoes criada")
+        
+        # Clientes da API REST (api_clientes.py); a chave é guardada só como hash
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS api_clientes (
+                id SERIAL PRIMARY KEY,
+                nome VARCHAR(100) NOT NULL,
+                chave_hash CHAR(64) NOT NULL UNIQUE,
+                escopos TEXT NOT NULL,
+                requisicoes_por_minuto INTEGER NOT NULL DEFAULT 120,
+                ativo BOOLEAN NOT NULL DEFAULT TRUE,
+                criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
         # Tabela permissoes_usuario
         logger.debug("Criando tabela permissoes_usuario...")
         cursor.execute('''
@@ -459,6 +445,7 @@ def init_db_tables():
         # Índices para tabelas de caixa
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_caixa_tipo ON movimentacoes_caixa(tipo)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_caixa_data ON movimentacoes_caixa(data_movimentacao)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_caixa_data_id ON movimentacoes_caixa(data_movimentacao, id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_caixa_cadastro ON movimentacoes_caixa(cadastro_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_caixa_usuario ON movimentacoes_caixa(usuario)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_comprovantes_movimentacao ON comprovantes_caixa(movimentacao_id)')
@@ -471,7 +458,29 @@ def init_db_tables():
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_notificacoes_tipo ON historico_notificacoes(tipo)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_notificacoes_visualizada ON historico_notificacoes(visualizada)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_notificacoes_data ON historico_notificacoes(data_criacao)')
-        
+
+        # Contadores mantidos por triggers (estatísticas O(1) para todos os workers)
+        criar_contadores(cursor)
+
+        # Livro-caixa: saldo corrente e resumos mensais mantidos por triggers
+        criar_livro_caixa(cursor)
+        criar_total_comprovantes(cursor)
+
+        # Versão de dados por tabela para o cache HTTP condicional (cache_http.py)
+        criar_versoes_tabelas(cursor)
+
+        # Arquivos por cadastro (listagem de arquivos_cadastros pelo índice parcial)
+        criar_total_arquivos(cursor)
+
+        # Resultados de agregados compartilhados entre workers (ver singleflight.py)
+        cursor.execute('''
+            CREATE UNLOGGED TABLE IF NOT EXISTS cache_agregados (
+                chave VARCHAR(200) PRIMARY KEY,
+                valor JSONB NOT NULL,
+                atualizado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
         conn.commit()
         logger.debug("✅ Commit realizado")
         cursor.close()
@@ -485,6 +494,372 @@ def init_db_tables():
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise
 
+# Contadores exatos mantidos por triggers: nome do contador -> consulta de recálculo
+CONTADORES = {
+    'cadastros': 'SELECT COUNT(*) FROM cadastros',
+    'arquivos_saude': 'SELECT COUNT(*) FROM arquivos_saude',
+    'auditoria': 'SELECT COUNT(*) FROM auditoria',
+    'usuarios_admin': "SELECT COUNT(*) FROM usuarios WHERE tipo = 'admin'",
+}
+
+def criar_contadores(cursor):
+    """Cria a tabela contadores e os triggers que a mantêm exata"""
+    logger.debug("Criando tabela contadores e triggers...")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS contadores (
+            nome VARCHAR(50) PRIMARY KEY,
+            valor BIGINT NOT NULL DEFAULT 0
+        )
+    ''')
+
+    # Trigger genérico: +1 no INSERT, -1 no DELETE, zera no TRUNCATE
+    cursor.execute('''
+        CREATE OR REPLACE FUNCTION atualizar_contador() RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE contadores SET valor = valor + 1 WHERE nome = TG_ARGV[0];
+            ELSIF TG_OP = 'DELETE' THEN
+                UPDATE contadores SET valor = valor - 1 WHERE nome = TG_ARGV[0];
+            ELSIF TG_OP = 'TRUNCATE' THEN
+                UPDATE contadores SET valor = 0 WHERE nome = TG_ARGV[0];
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+
+    # Administradores: também acompanha mudanças de tipo (promover/rebaixar)
+    cursor.execute('''
+        CREATE OR REPLACE FUNCTION atualizar_contador_admins() RETURNS TRIGGER AS $$
+        DECLARE
+            delta INTEGER := 0;
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                UPDATE contadores SET valor = 0 WHERE nome = 'usuarios_admin';
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                IF OLD.tipo = 'admin' THEN
+                    delta := delta - 1;
+                END IF;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'INSERT') THEN
+                IF NEW.tipo = 'admin' THEN
+                    delta := delta + 1;
+                END IF;
+            END IF;
+            IF delta <> 0 THEN
+                UPDATE contadores SET valor = valor + delta WHERE nome = 'usuarios_admin';
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+
+    for tabela in ('cadastros', 'arquivos_saude', 'auditoria'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS trg_contador_{tabela} ON {tabela}')
+        cursor.execute(f'''
+            CREATE TRIGGER trg_contador_{tabela}
+            AFTER INSERT OR DELETE ON {tabela}
+            FOR EACH ROW EXECUTE FUNCTION atualizar_contador('{tabela}')
+        ''')
+        cursor.execute(f'DROP TRIGGER IF EXISTS trg_contador_{tabela}_truncate ON {tabela}')
+        cursor.execute(f'''
+            CREATE TRIGGER trg_contador_{tabela}_truncate
+            AFTER TRUNCATE ON {tabela}
+            FOR EACH STATEMENT EXECUTE FUNCTION atualizar_contador('{tabela}')
+        ''')
+
+    cursor.execute('DROP TRIGGER IF EXISTS trg_contador_usuarios_admin ON usuarios')
+    cursor.execute('''
+        CREATE TRIGGER trg_contador_usuarios_admin
+        AFTER INSERT OR DELETE OR UPDATE OF tipo ON usuarios
+        FOR EACH ROW EXECUTE FUNCTION atualizar_contador_admins()
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS trg_contador_usuarios_admin_truncate ON usuarios')
+    cursor.execute('''
+        CREATE TRIGGER trg_contador_usuarios_admin_truncate
+        AFTER TRUNCATE ON usuarios
+        FOR EACH STATEMENT EXECUTE FUNCTION atualizar_contador_admins()
+    ''')
+
+    # Semear contadores ausentes com a contagem atual (apenas na primeira vez)
+    for nome, consulta in CONTADORES.items():
+        cursor.execute(f'''
+            INSERT INTO contadores (nome, valor)
+            SELECT %s, ({consulta})
+            ON CONFLICT (nome) DO NOTHING
+        ''', (nome,))
+
+    logger.debug("✅ Contadores e triggers criados")
+
+def recalcular_contadores():
+    """Recalcula todos os contadores a partir das tabelas (reconciliação manual)"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        for nome, consulta in CONTADORES.items():
+            cursor.execute(f'''
+                INSERT INTO contadores (nome, valor)
+                SELECT %s, ({consulta})
+                ON CONFLICT (nome) DO UPDATE SET valor = EXCLUDED.valor
+            ''', (nome,))
+
+        conn.commit()
+        cursor.close()
+        conn.close()
+        logger.info("✅ Contadores recalculados")
+
+    except Exception as e:
+        logger.error(f"❌ Erro ao recalcular contadores: {e}")
+        raise
+
+def criar_livro_caixa(cursor):
+    """Cria saldo corrente e resumo mensal do caixa, mantidos na mesma transação das movimentações"""
+    logger.debug("Criando livro-caixa (saldo e resumo mensal)...")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS caixa_saldo (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_entradas DECIMAL(14,2) NOT NULL DEFAULT 0,
+            total_saidas DECIMAL(14,2) NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS caixa_resumo_mensal (
+            mes DATE PRIMARY KEY,
+            total_entradas DECIMAL(14,2) NOT NULL DEFAULT 0,
+            total_saidas DECIMAL(14,2) NOT NULL DEFAULT 0,
+            quantidade INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+    # Aplica um lançamento (sinal -1 desfaz) no mês e no saldo corrente
+    cursor.execute('''
+        CREATE OR REPLACE FUNCTION aplicar_lancamento_caixa(p_tipo TEXT, p_valor NUMERIC, p_data TIMESTAMP, p_sinal INTEGER)
+        RETURNS VOID AS $$
+        DECLARE
+            v_entrada NUMERIC := CASE WHEN p_tipo = 'entrada' THEN p_valor * p_sinal ELSE 0 END;
+            v_saida NUMERIC := CASE WHEN p_tipo = 'saida' THEN p_valor * p_sinal ELSE 0 END;
+        BEGIN
+            INSERT INTO caixa_resumo_mensal (mes, total_entradas, total_saidas, quantidade)
+            VALUES (date_trunc('month', COALESCE(p_data, CURRENT_TIMESTAMP))::date, v_entrada, v_saida, p_sinal)
+            ON CONFLICT (mes) DO UPDATE SET
+                total_entradas = caixa_resumo_mensal.total_entradas + EXCLUDED.total_entradas,
+                total_saidas = caixa_resumo_mensal.total_saidas + EXCLUDED.total_saidas,
+                quantidade = caixa_resumo_mensal.quantidade + EXCLUDED.quantidade;
+
+            UPDATE caixa_saldo
+            SET total_entradas = total_entradas + v_entrada, total_saidas = total_saidas + v_saida
+            WHERE id = 1;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+    cursor.execute('''
+        CREATE OR REPLACE FUNCTION atualizar_livro_caixa() RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                DELETE FROM caixa_resumo_mensal;
+                UPDATE caixa_saldo SET total_entradas = 0, total_saidas = 0 WHERE id = 1;
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM aplicar_lancamento_caixa(OLD.tipo, OLD.valor, OLD.data_movimentacao, -1);
+            END IF;
+            IF TG_OP IN ('UPDATE', 'INSERT') THEN
+                PERFORM aplicar_lancamento_caixa(NEW.tipo, NEW.valor, NEW.data_movimentacao, 1);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+
+    cursor.execute('DROP TRIGGER IF EXISTS trg_livro_caixa ON movimentacoes_caixa')
+    cursor.execute('''
+        CREATE TRIGGER trg_livro_caixa
+        AFTER INSERT OR DELETE OR UPDATE OF tipo, valor, data_movimentacao ON movimentacoes_caixa
+        FOR EACH ROW EXECUTE FUNCTION atualizar_livro_caixa()
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS trg_livro_caixa_truncate ON movimentacoes_caixa')
+    cursor.execute('''
+        CREATE TRIGGER trg_livro_caixa_truncate
+        AFTER TRUNCATE ON movimentacoes_caixa
+        FOR EACH STATEMENT EXECUTE FUNCTION atualizar_livro_caixa()
+    ''')
+
+    # Semear a partir do histórico apenas na primeira vez (quando o saldo ainda não existe)
+    cursor.execute('SELECT 1 FROM caixa_saldo WHERE id = 1')
+    if cursor.fetchone() is None:
+        _reconstruir_livro_caixa(cursor)
+
+    logger.debug("✅ Livro-caixa e triggers criados")
+
+def criar_total_comprovantes(cursor):
+    """Mantém movimentacoes_caixa.total_comprovantes por trigger (listagem sem COUNT/GROUP BY)"""
+    cursor.execute('''
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'movimentacoes_caixa' AND column_name = 'total_comprovantes'
+    ''')
+    coluna_nova = cursor.fetchone() is None
+    cursor.execute('ALTER TABLE movimentacoes_caixa ADD COLUMN IF NOT EXISTS total_comprovantes INTEGER NOT NULL DEFAULT 0')
+
+    cursor.execute('''
+        CREATE OR REPLACE FUNCTION atualizar_total_comprovantes() RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                UPDATE movimentacoes_caixa SET total_comprovantes = 0 WHERE total_comprovantes <> 0;
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE movimentacoes_caixa SET total_comprovantes = total_comprovantes - 1
+                WHERE id = OLD.movimentacao_id;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'INSERT') THEN
+                UPDATE movimentacoes_caixa SET total_comprovantes = total_comprovantes + 1
+                WHERE id = NEW.movimentacao_id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+
+    cursor.execute('DROP TRIGGER IF EXISTS trg_total_comprovantes ON comprovantes_caixa')
+    cursor.execute('''
+        CREATE TRIGGER trg_total_comprovantes
+        AFTER INSERT OR DELETE OR UPDATE OF movimentacao_id ON comprovantes_caixa
+        FOR EACH ROW EXECUTE FUNCTION atualizar_total_comprovantes()
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS trg_total_comprovantes_truncate ON comprovantes_caixa')
+    cursor.execute('''
+        CREATE TRIGGER trg_total_comprovantes_truncate
+        AFTER TRUNCATE ON comprovantes_caixa
+        FOR EACH STATEMENT EXECUTE FUNCTION atualizar_total_comprovantes()
+    ''')
+
+    # Preencher a partir dos comprovantes existentes quando a coluna acaba de ser criada
+    if coluna_nova:
+        cursor.execute('''
+            UPDATE movimentacoes_caixa m SET total_comprovantes = c.total
+            FROM (SELECT movimentacao_id, COUNT(*) AS total FROM comprovantes_caixa GROUP BY movimentacao_id) c
+            WHERE m.id = c.movimentacao_id
+        ''')
+
+# Atualizações de cadastros feitas só para manter contadores (ex.: total_arquivos)
+# ligam esta configuração local; updated_at, o feed de alterações e a versão da
+# tabela as ignoram, pois os dados do cadastro não mudaram
+SQL_SOMENTE_CONTADORES = "current_setting('ameg.somente_contadores', true) = 'on'"
+
+def criar_total_arquivos(cursor):
+    """Mantém cadastros.total_arquivos por trigger e o índice parcial dos cadastros com arquivos"""
+    cursor.execute('''
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'cadastros' AND column_name = 'total_arquivos'
+    ''')
+    coluna_nova = cursor.fetchone() is None
+    cursor.execute('ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS total_arquivos INTEGER NOT NULL DEFAULT 0')
+
+    cursor.execute('''
+        CREATE OR REPLACE FUNCTION atualizar_total_arquivos() RETURNS TRIGGER AS $$
+        BEGIN
+            PERFORM set_config('ameg.somente_contadores', 'on', true);
+            IF TG_OP = 'TRUNCATE' THEN
+                UPDATE cadastros SET total_arquivos = 0 WHERE total_arquivos <> 0;
+            ELSE
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    UPDATE cadastros SET total_arquivos = total_arquivos - 1
+                    WHERE id = OLD.cadastro_id;
+                END IF;
+                IF TG_OP IN ('UPDATE', 'INSERT') THEN
+                    UPDATE cadastros SET total_arquivos = total_arquivos + 1
+                    WHERE id = NEW.cadastro_id;
+                END IF;
+            END IF;
+            PERFORM set_config('ameg.somente_contadores', 'off', true);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+
+    cursor.execute('DROP TRIGGER IF EXISTS trg_total_arquivos ON arquivos_saude')
+    cursor.execute('''
+        CREATE TRIGGER trg_total_arquivos
+        AFTER INSERT OR DELETE OR UPDATE OF cadastro_id ON arquivos_saude
+        FOR EACH ROW EXECUTE FUNCTION atualizar_total_arquivos()
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS trg_total_arquivos_truncate ON arquivos_saude')
+    cursor.execute('''
+        CREATE TRIGGER trg_total_arquivos_truncate
+        AFTER TRUNCATE ON arquivos_saude
+        FOR EACH STATEMENT EXECUTE FUNCTION atualizar_total_arquivos()
+    ''')
+
+    # Preencher a partir dos arquivos existentes quando a coluna acaba de ser criada
+    if coluna_nova:
+        cursor.execute("SELECT set_config('ameg.somente_contadores', 'on', true)")
+        cursor.execute('''
+            UPDATE cadastros c SET total_arquivos = a.total
+            FROM (SELECT cadastro_id, COUNT(*) AS total FROM arquivos_saude GROUP BY cadastro_id) a
+            WHERE c.id = a.cadastro_id
+        ''')
+        cursor.execute("SELECT set_config('ameg.somente_contadores', 'off', true)")
+
+    # Só os cadastros com arquivos, na ordem da listagem (paginação por chave)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_cadastros_com_arquivos
+        ON cadastros (nome_completo, id) WHERE total_arquivos > 0
+    ''')
+
+def _reconstruir_livro_caixa(cursor):
+    cursor.execute('LOCK TABLE movimentacoes_caixa IN SHARE MODE')
+    cursor.execute('DELETE FROM caixa_resumo_mensal')
+    cursor.execute('''
+        INSERT INTO caixa_resumo_mensal (mes, total_entradas, total_saidas, quantidade)
+        SELECT date_trunc('month', COALESCE(data_movimentacao, CURRENT_TIMESTAMP))::date,
+               COALESCE(SUM(valor) FILTER (WHERE tipo = 'entrada'), 0),
+               COALESCE(SUM(valor) FILTER (WHERE tipo = 'saida'), 0),
+               COUNT(*)
+        FROM movimentacoes_caixa
+        GROUP BY 1
+    ''')
+    cursor.execute('''
+        INSERT INTO caixa_saldo (id, total_entradas, total_saidas)
+        SELECT 1, COALESCE(SUM(total_entradas), 0), COALESCE(SUM(total_saidas), 0)
+        FROM caixa_resumo_mensal
+        ON CONFLICT (id) DO UPDATE SET
+            total_entradas = EXCLUDED.total_entradas, total_saidas = EXCLUDED.total_saidas
+    ''')
+
+def recalcular_livro_caixa():
+    """Reconstrói saldo e resumos mensais a partir das movimentações (reconciliação manual)"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        _reconstruir_livro_caixa(cursor)
+
+        conn.commit()
+        cursor.close()
+        conn.close()
+        logger.info("✅ Livro-caixa recalculado")
+
+    except Exception as e:
+        logger.error(f"❌ Erro ao recalcular livro-caixa: {e}")
+        raise
+
+def obter_contadores(*nomes):
+    """Lê contadores mantidos por trigger com uma única busca pela chave primária"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute('SELECT nome, valor FROM contadores WHERE nome = ANY(%s)', (list(nomes),))
+    valores = {nome: 0 for nome in nomes}
+    valores.update({row[0]: row[1] for row in cursor.fetchall()})
+
+    cursor.close()
+    conn.close()
+
+    return valores
+
 def create_admin_user():
     """Cria usuário admin padrão com proteção adicional"""
     logger.info("👤 Criando usuário admin...")
@@ -516,7 +891,12 @@ def create_admin_user():
             logger.warning(f"⚠️  ADMIN_PASSWORD não definida! Senha gerada: {admin_password}")
         logger.debug(f"Senha admin configurada: {bool(admin_password)}")
         
-        # Usar security manager se disponível
+        # Usar security manager se disponível (importado aqui: cryptography só carrega no bootstrap)
+        try:
+            from security import security_manager
+        except ImportError:
+            security_manager = None
+            logger.warning("Security manager não disponível - usando fallback")
         if security_manager:
             senha_hash = security_manager.hash_admin_password(admin_password)
             logger.debug("Hash da senha gerado com security manager")
@@ -550,6 +930,8 @@ def registrar_auditoria(usuario, acao, tabela, registro_id=None, dados_anteriore
             INSERT INTO auditoria (usuario, acao, tabela, registro_id, dados_anteriores, dados_novos, ip_address, user_agent)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         ''', (usuario, acao, tabela, registro_id, dados_anteriores, dados_novos, ip_address, user_agent))
+        # Contador de auditoria do dashboard
+        publicar_invalidacao('auditoria', cursor=cursor)
         
         conn.commit()
         cursor.close()
@@ -573,6 +955,7 @@ def inserir_movimentacao_caixa(tipo, valor, descricao, cadastro_id, nome_pessoa,
         ''', (tipo, valor, descricao, cadastro_id, nome_pessoa, numero_recibo, observacoes, usuario))
         
         movimentacao_id = cursor.fetchone()[0]
+        publicar_invalidacao('caixa', cursor=cursor)
         conn.commit()
         cursor.close()
         conn.close()
@@ -587,22 +970,161 @@ def inserir_movimentacao_caixa(tipo, valor, descricao, cadastro_id, nome_pessoa,
         logger.error(f"❌ Erro ao inserir movimentação: {e}")
         raise
 
-def inserir_comprovante_caixa(movimentacao_id, nome_arquivo, tipo_arquivo, arquivo_dados):
-    """Insere um comprovante para uma movimentação"""
+def criar_feed_alteracoes(cursor):
+    """updated_at mantido por trigger e log compactado de alterações (inclui exclusões)
+
+    O log guarda uma entrada por cadastro (a última operação); a entrada de
+    um cadastro excluído é o seu tombstone. txid permite ao leitor avançar só
+    até transações já encerradas, então nenhuma alteração é pulada.
+    """
+    cursor.execute("ALTER TABLE cadastros ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP")
+    cursor.execute("UPDATE cadastros SET updated_at = COALESCE(data_cadastro, CURRENT_TIMESTAMP) WHERE updated_at IS NULL")
+    cursor.execute("ALTER TABLE cadastros ALTER COLUMN updated_at SET DEFAULT CURRENT_TIMESTAMP")
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cadastros_updated_at ON cadastros(updated_at)')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cadastros_alteracoes (
+            seq BIGSERIAL PRIMARY KEY,
+            txid BIGINT NOT NULL DEFAULT txid_current(),
+            cadastro_id INTEGER NOT NULL,
+            operacao CHAR(1) NOT NULL,
+            alterado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cadastros_alteracoes_cursor ON cadastros_alteracoes(txid, seq)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cadastros_alteracoes_cadastro ON cadastros_alteracoes(cadastro_id)')
+    
+    cursor.execute(f'''
+        CREATE OR REPLACE FUNCTION cadastros_tocar_updated_at() RETURNS trigger AS $$
+        BEGIN
+            IF {SQL_SOMENTE_CONTADORES} THEN
+                RETURN NEW;
+            END IF;
+            NEW.updated_at := CURRENT_TIMESTAMP;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+    # Triggers por instrução com tabelas de transição: a importação em lote
+    # gera um único DELETE/INSERT no log em vez de um por linha. TRUNCATE (reset
+    # do admin) reinicia os ids, então vira uma entrada 'T' que manda o cliente
+    # descartar a cópia local
+    cursor.execute(f'''
+        CREATE OR REPLACE FUNCTION cadastros_registrar_alteracoes() RETURNS trigger AS $$
+        BEGIN
+            IF {SQL_SOMENTE_CONTADORES} THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'TRUNCATE' THEN
+                DELETE FROM cadastros_alteracoes;
+                INSERT INTO cadastros_alteracoes (cadastro_id, operacao) VALUES (0, 'T');
+            ELSIF TG_OP = 'DELETE' THEN
+                DELETE FROM cadastros_alteracoes a USING antigos o WHERE a.cadastro_id = o.id;
+                INSERT INTO cadastros_alteracoes (cadastro_id, operacao) SELECT id, 'D' FROM antigos ORDER BY id;
+            ELSE
+                DELETE FROM cadastros_alteracoes a USING novos n WHERE a.cadastro_id = n.id;
+                INSERT INTO cadastros_alteracoes (cadastro_id, operacao) SELECT id, LEFT(TG_OP, 1) FROM novos ORDER BY id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+    
+    cursor.execute('DROP TRIGGER IF EXISTS trg_cadastros_updated_at ON cadastros')
+    cursor.execute('''
+        CREATE TRIGGER trg_cadastros_updated_at
+        BEFORE UPDATE ON cadastros
+        FOR EACH ROW EXECUTE FUNCTION cadastros_tocar_updated_at()
+    ''')
+    for evento, transicao in (('INSERT', 'NEW TABLE AS novos'),
+                              ('UPDATE', 'NEW TABLE AS novos'),
+                              ('DELETE', 'OLD TABLE AS antigos')):
+        cursor.execute(f'DROP TRIGGER IF EXISTS trg_cadastros_alteracoes_{evento.lower()} ON cadastros')
+        cursor.execute(f'''
+            CREATE TRIGGER trg_cadastros_alteracoes_{evento.lower()}
+            AFTER {evento} ON cadastros
+            REFERENCING {transicao}
+            FOR EACH STATEMENT EXECUTE FUNCTION cadastros_registrar_alteracoes()
+        ''')
+    cursor.execute('DROP TRIGGER IF EXISTS trg_cadastros_alteracoes_truncate ON cadastros')
+    cursor.execute('''
+        CREATE TRIGGER trg_cadastros_alteracoes_truncate
+        AFTER TRUNCATE ON cadastros
+        FOR EACH STATEMENT EXECUTE FUNCTION cadastros_registrar_alteracoes()
+    ''')
+    
+    # Primeira execução: cadastros existentes entram no feed como inserções
+    cursor.execute('''
+        INSERT INTO cadastros_alteracoes (cadastro_id, operacao)
+        SELECT id, 'I' FROM cadastros
+        WHERE NOT EXISTS (SELECT 1 FROM cadastros_alteracoes)
+        ORDER BY id
+    ''')
+
+# Tabelas cujo conteúdo aparece em relatórios e gráficos com cache condicional
+TABELAS_VERSIONADAS = ('cadastros', 'dados_saude_pessoa', 'movimentacoes_caixa')
+
+def criar_versoes_tabelas(cursor):
+    """Contador de versão por tabela, incrementado por trigger a cada instrução de escrita
+
+    O incremento é transacional (só aparece após o COMMIT) e avisa os workers
+    pelo barramento de cache (tópico 'versoes'), que guardam as versões em memória.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS versoes_tabelas (
+            tabela VARCHAR(63) PRIMARY KEY,
+            versao BIGINT NOT NULL DEFAULT 0,
+            alterado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE OR REPLACE FUNCTION versoes_tabelas_incrementar() RETURNS trigger AS $$
+        BEGIN
+            IF {SQL_SOMENTE_CONTADORES} THEN
+                RETURN NULL;
+            END IF;
+            UPDATE versoes_tabelas SET versao = versao + 1, alterado_em = CURRENT_TIMESTAMP
+            WHERE tabela = TG_TABLE_NAME;
+            PERFORM pg_notify('ameg_cache', 'versoes:' || TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+    for tabela in TABELAS_VERSIONADAS:
+        cursor.execute('''
+            INSERT INTO versoes_tabelas (tabela) VALUES (%s) ON CONFLICT (tabela) DO NOTHING
+        ''', (tabela,))
+        cursor.execute(f'DROP TRIGGER IF EXISTS trg_{tabela}_versao ON {tabela}')
+        cursor.execute(f'''
+            CREATE TRIGGER trg_{tabela}_versao
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {tabela}
+            FOR EACH STATEMENT EXECUTE FUNCTION versoes_tabelas_incrementar()
+        ''')
+
+def inserir_comprovante_caixa(movimentacao_id, nome_arquivo, tipo_arquivo, arquivo, tamanho=None, sha256=None, cursor=None):
+    """Insere um comprovante para uma movimentação (arquivo pode ser bytes ou um handle)
+
+    Com cursor, o INSERT entra na transação em andamento e o COMMIT fica com quem chamou.
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        conn = None
+        if cursor is None:
+            conn = get_db_connection()
+            cursor = conn.cursor()
         
         cursor.execute('''
-            INSERT INTO comprovantes_caixa (movimentacao_id, nome_arquivo, tipo_arquivo, arquivo_dados)
-            VALUES (%s, %s, %s, %s)
+            INSERT INTO comprovantes_caixa (movimentacao_id, nome_arquivo, tipo_arquivo, arquivo_dados, tamanho, sha256)
+            VALUES (%s, %s, %s, %s, %s, %s)
             RETURNING id
-        ''', (movimentacao_id, nome_arquivo, tipo_arquivo, arquivo_dados))
+        ''', (movimentacao_id, nome_arquivo, tipo_arquivo, psycopg2.Binary(_ler_arquivo(arquivo)), tamanho, sha256))
         
-        comprovante_id = cursor.fetchone()[0]
-        conn.commit()
-        cursor.close()
-        conn.close()
+        linha = cursor.fetchone()
+        comprovante_id = linha['id'] if isinstance(linha, dict) else linha[0]
+        publicar_invalidacao('caixa', cursor=cursor)
+        if conn is not None:
+            conn.commit()
+            cursor.close()
+            conn.close()
         
         return comprovante_id
         
@@ -610,103 +1132,281 @@ def inserir_comprovante_caixa(movimentacao_id, nome_arquivo, tipo_arquivo, arqui
         logger.error(f"❌ Erro ao inserir comprovante: {e}")
         raise
 
-def listar_movimentacoes_caixa(limit=50, offset=0, tipo=None):
+def _ler_arquivo(arquivo):
+    """Conteúdo de um upload; handles são lidos apenas no momento de gravar"""
+    if hasattr(arquivo, 'read'):
+        arquivo.seek(0)
+        return arquivo.read()
+    return arquivo
+
+# Limite de bytes por INSERT em lote de arquivos (limita a memória do worker)
+LOTE_ARQUIVOS_BYTES = 16 * 1024 * 1024
+
+def inserir_arquivos_saude(cursor, arquivos):
+    """Insere arquivos de saúde em lotes de até LOTE_ARQUIVOS_BYTES
+
+    arquivos: [(cadastro_id, nome_arquivo, tipo_arquivo, handle, descricao, tamanho, sha256)]
+    Retorna os ids inseridos.
+    """
+    ids = []
+    lote = []
+    bytes_lote = 0
+    for cadastro_id, nome_arquivo, tipo_arquivo, handle, descricao, tamanho, sha256 in arquivos:
+        if lote and bytes_lote + tamanho > LOTE_ARQUIVOS_BYTES:
+            ids += _gravar_lote_arquivos(cursor, lote)
+            lote = []
+            bytes_lote = 0
+        lote.append((cadastro_id, nome_arquivo, tipo_arquivo, psycopg2.Binary(_ler_arquivo(handle)),
+                     descricao, tamanho, sha256))
+        bytes_lote += tamanho
+    
+    if lote:
+        ids += _gravar_lote_arquivos(cursor, lote)
+    return ids
+
+def _gravar_lote_arquivos(cursor, lote):
+    linhas = execute_values(cursor, '''
+        INSERT INTO arquivos_saude (cadastro_id, nome_arquivo, tipo_arquivo, arquivo_dados, descricao, tamanho, sha256)
+        VALUES %s
+        RETURNING id
+    ''', lote, fetch=True)
+    # finalizar_sessao (upload_sessoes) passa um RealDictCursor
+    return [linha['id'] if isinstance(linha, dict) else linha[0] for linha in linhas]
+
+def _filtros_movimentacoes(tipo=None, data_inicio=None, data_fim=None, antes=None):
+    """Monta WHERE/params dos filtros de movimentações (idx_caixa_tipo, idx_caixa_data_id)"""
+    condicoes = []
+    params = []
+    
+    if tipo:
+        condicoes.append("m.tipo = %s")
+        params.append(tipo)
+    
+    # Filtros de período (fim inclusivo)
+    if data_inicio:
+        condicoes.append("m.data_movimentacao >= %s")
+        params.append(data_inicio)
+    if data_fim:
+        condicoes.append("m.data_movimentacao < %s")
+        params.append(data_fim + timedelta(days=1))
+    
+    # Paginação por chave: registros anteriores a (data_movimentacao, id)
+    if antes:
+        condicoes.append("(m.data_movimentacao, m.id) < (%s, %s)")
+        params.extend(antes)
+    
+    where_clause = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    return where_clause, params
+
+def listar_movimentacoes_caixa(limit=50, offset=0, tipo=None, data_inicio=None, data_fim=None, antes=None):
     """Lista movimentações do caixa com paginação"""
     try:
-        logger.info("=== INICIANDO listar_movimentacoes_caixa ===")
-        logger.info(f"Parâmetros: limit={limit}, offset={offset}, tipo={tipo}")
-        
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
-        logger.info("Conexão estabelecida para listar_movimentacoes_caixa")
         
-        where_clause = ""
-        params = []
-        
-        if tipo:
-            where_clause = "WHERE m.tipo = %s"
-            params.append(tipo)
-            logger.info(f"Filtro por tipo aplicado: {tipo}")
+        where_clause, params = _filtros_movimentacoes(tipo, data_inicio, data_fim, antes)
         
+        # total_comprovantes é mantido por trigger: sem JOIN/GROUP BY em comprovantes_caixa
         query = f'''
-            SELECT m.*, c.nome_completo as nome_cadastro,
-                   COUNT(comp.id) as total_comprovantes
+            SELECT m.*, c.nome_completo as nome_cadastro
             FROM movimentacoes_caixa m
             LEFT JOIN cadastros c ON m.cadastro_id = c.id
-            LEFT JOIN comprovantes_caixa comp ON m.id = comp.movimentacao_id
             {where_clause}
-            GROUP BY m.id, c.nome_completo
-            ORDER BY m.data_movimentacao DESC
+            ORDER BY m.data_movimentacao DESC, m.id DESC
             LIMIT %s OFFSET %s
         '''
         
         params.extend([limit, offset])
-        logger.info(f"Executando query: {query}")
-        logger.info(f"Parâmetros: {params}")
-        
         cursor.execute(query, params)
         movimentacoes = cursor.fetchall()
-        logger.info(f"Movimentações encontradas: {len(movimentacoes)}")
+        logger.debug(f"Movimentações encontradas: {len(movimentacoes)}")
         
         cursor.close()
         conn.close()
-        logger.info("Conexão fechada para listar_movimentacoes_caixa")
         
         return movimentacoes
         
     except Exception as e:
         logger.error(f"❌ Erro ao listar movimentações: {e}")
-        logger.error(f"Tipo do erro: {type(e)}")
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise
 
+def iterar_movimentacoes_caixa(limit, tipo=None, data_inicio=None, data_fim=None, antes=None):
+    """Gera movimentações a partir de um cursor no servidor (para respostas em stream)"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(name='movimentacoes_caixa_stream', cursor_factory=RealDictCursor)
+        cursor.itersize = 200
+        
+        where_clause, params = _filtros_movimentacoes(tipo, data_inicio, data_fim, antes)
+        cursor.execute(f'''
+            SELECT m.*, c.nome_completo as nome_cadastro
+            FROM movimentacoes_caixa m
+            LEFT JOIN cadastros c ON m.cadastro_id = c.id
+            {where_clause}
+            ORDER BY m.data_movimentacao DESC, m.id DESC
+            LIMIT %s
+        ''', params + [limit])
+        
+        for movimentacao in cursor:
+            yield movimentacao
+        
+        cursor.close()
+    finally:
+        conn.close()
+
+def obter_resumo_caixa(tipo=None, data_inicio=None, data_fim=None):
+    """Quebras do caixa por tipo, usuário e mês em uma única varredura (GROUPING SETS)"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        where_clause, params = _filtros_movimentacoes(tipo, data_inicio, data_fim)
+        cursor.execute(f'''
+            SELECT GROUPING(m.usuario) AS sem_usuario,
+                   GROUPING(date_trunc('month', m.data_movimentacao)) AS sem_mes,
+                   m.tipo, m.usuario,
+                   date_trunc('month', m.data_movimentacao)::date AS mes,
+                   COUNT(*) AS quantidade,
+                   COALESCE(SUM(m.valor), 0) AS total
+            FROM movimentacoes_caixa m
+            {where_clause}
+            GROUP BY GROUPING SETS (
+                (m.tipo),
+                (m.usuario, m.tipo),
+                (date_trunc('month', m.data_movimentacao), m.tipo)
+            )
+        ''', params)
+        linhas = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        
+        por_tipo = {'entrada': {'quantidade': 0, 'total': 0.0}, 'saida': {'quantidade': 0, 'total': 0.0}}
+        por_usuario = {}
+        por_mes = {}
+        
+        for linha in linhas:
+            total = float(linha['total'])
+            if linha['sem_usuario'] and linha['sem_mes']:
+                por_tipo[linha['tipo']] = {'quantidade': linha['quantidade'], 'total': total}
+                continue
+            
+            if not linha['sem_usuario']:
+                grupo = por_usuario.setdefault(linha['usuario'], {'usuario': linha['usuario'], 'entradas': 0.0, 'saidas': 0.0, 'quantidade': 0})
+            else:
+                grupo = por_mes.setdefault(linha['mes'], {'mes': linha['mes'], 'entradas': 0.0, 'saidas': 0.0, 'quantidade': 0})
+            
+            grupo['entradas' if linha['tipo'] == 'entrada' else 'saidas'] += total
+            grupo['quantidade'] += linha['quantidade']
+        
+        for grupo in list(por_usuario.values()) + list(por_mes.values()):
+            grupo['saldo'] = grupo['entradas'] - grupo['saidas']
+        
+        return {
+            'por_tipo': por_tipo,
+            'quantidade': sum(t['quantidade'] for t in por_tipo.values()),
+            'por_usuario': sorted(por_usuario.values(), key=lambda g: g['quantidade'], reverse=True),
+            'por_mes': sorted(por_mes.values(), key=lambda g: g['mes'], reverse=True)
+        }
+        
+    except Exception as e:
+        logger.error(f"❌ Erro ao obter resumo do caixa: {e}")
+        raise
+
 def obter_saldo_caixa():
-    """Calcula o saldo atual do caixa"""
+    """Retorna o saldo atual do caixa (linha única mantida por trigger)"""
     try:
-        logger.info("=== INICIANDO obter_saldo_caixa ===")
         conn = get_db_connection()
         cursor = conn.cursor()
-        logger.info("Conexão estabelecida para obter_saldo_caixa")
-        
-        logger.info("Executando query para calcular saldo...")
-        cursor.execute('''
-            SELECT 
-                COALESCE(SUM(CASE WHEN tipo = 'entrada' THEN valor ELSE 0 END), 0) as total_entradas,
-                COALESCE(SUM(CASE WHEN tipo = 'saida' THEN valor ELSE 0 END), 0) as total_saidas
-            FROM movimentacoes_caixa
-        ''')
         
+        cursor.execute('SELECT total_entradas, total_saidas FROM caixa_saldo WHERE id = 1')
         resultado = cursor.fetchone()
-        logger.info(f"Resultado da query: {resultado}")
+        
+        cursor.close()
+        conn.close()
         
         if resultado:
             total_entradas = float(resultado[0])
             total_saidas = float(resultado[1])
-            saldo = total_entradas - total_saidas
         else:
-            logger.warning("Nenhum resultado encontrado, usando valores padrão")
-            total_entradas = total_saidas = saldo = 0.0
-        
-        cursor.close()
-        conn.close()
-        logger.info("Conexão fechada para obter_saldo_caixa")
+            logger.warning("Saldo do caixa ainda não inicializado, usando valores padrão")
+            total_entradas = total_saidas = 0.0
         
-        resultado_final = {
+        return {
             'total_entradas': total_entradas,
             'total_saidas': total_saidas,
-            'saldo': saldo
+            'saldo': total_entradas - total_saidas
         }
-        logger.info(f"Saldo calculado com sucesso: {resultado_final}")
-        return resultado_final
         
     except Exception as e:
         logger.error(f"❌ Erro ao calcular saldo: {e}")
-        logger.error(f"Tipo do erro: {type(e)}")
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise
 
+def _inicio_mes_seguinte(data):
+    return date(data.year + (data.month == 12), data.month % 12 + 1, 1)
+
+def obter_totais_caixa_periodo(data_inicio=None, data_fim=None):
+    """Totais do caixa em um período (datas inclusivas, None = sem limite)
+
+    Meses completos vêm de caixa_resumo_mensal; apenas as bordas parciais do
+    período são somadas a partir de movimentacoes_caixa (idx_caixa_data).
+    """
+    inicio = datetime.combine(data_inicio, datetime.min.time()) if data_inicio else None
+    fim = datetime.combine(data_fim + timedelta(days=1), datetime.min.time()) if data_fim else None
+    
+    # Meses inteiramente contidos no período: [mes_inicio, mes_fim)
+    mes_inicio = None
+    if data_inicio:
+        mes_inicio = data_inicio if data_inicio.day == 1 else _inicio_mes_seguinte(data_inicio)
+    mes_fim = fim.date().replace(day=1) if fim else None
+    
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        if mes_inicio and mes_fim and mes_inicio >= mes_fim:
+            # Período dentro de um único mês: somar direto pelo índice de data
+            cursor.execute('''
+                SELECT COALESCE(SUM(valor) FILTER (WHERE tipo = 'entrada'), 0),
+                       COALESCE(SUM(valor) FILTER (WHERE tipo = 'saida'), 0)
+                FROM movimentacoes_caixa
+                WHERE data_movimentacao >= %s AND data_movimentacao < %s
+            ''', (inicio, fim))
+        else:
+            cursor.execute('''
+                SELECT COALESCE(SUM(entradas), 0), COALESCE(SUM(saidas), 0) FROM (
+                    SELECT total_entradas AS entradas, total_saidas AS saidas
+                    FROM caixa_resumo_mensal
+                    WHERE (%(mes_inicio)s::date IS NULL OR mes >= %(mes_inicio)s::date)
+                      AND (%(mes_fim)s::date IS NULL OR mes < %(mes_fim)s::date)
+                    UNION ALL
+                    SELECT CASE WHEN tipo = 'entrada' THEN valor ELSE 0 END,
+                           CASE WHEN tipo = 'saida' THEN valor ELSE 0 END
+                    FROM movimentacoes_caixa
+                    WHERE (data_movimentacao >= %(inicio)s AND data_movimentacao < %(mes_inicio)s::timestamp)
+                       OR (data_movimentacao >= %(mes_fim)s::timestamp AND data_movimentacao < %(fim)s)
+                ) t
+            ''', {'inicio': inicio, 'fim': fim, 'mes_inicio': mes_inicio, 'mes_fim': mes_fim})
+        
+        resultado = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        
+        total_entradas = float(resultado[0])
+        total_saidas = float(resultado[1])
+        return {
+            'total_entradas': total_entradas,
+            'total_saidas': total_saidas,
+            'saldo': total_entradas - total_saidas
+        }
+        
+    except Exception as e:
+        logger.error(f"❌ Erro ao calcular totais do período: {e}")
+        raise
+
 def obter_comprovantes_movimentacao(movimentacao_id):
     """Obtém os comprovantes de uma movimentação"""
     try:
@@ -714,7 +1414,7 @@ def obter_comprovantes_movimentacao(movimentacao_id):
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
         cursor.execute('''
-            SELECT id, nome_arquivo, tipo_arquivo, data_upload
+            SELECT id, nome_arquivo, tipo_arquivo, data_upload, sha256
             FROM comprovantes_caixa
             WHERE movimentacao_id = %s
             ORDER BY data_upload DESC
@@ -732,6 +1432,11 @@ def obter_comprovantes_movimentacao(movimentacao_id):
 
 def listar_cadastros_simples():
     """Lista cadastros com apenas ID e nome para selects"""
+    cadastros = cache_cadastros_simples.obter('lista')
+    if cadastros is not None:
+        return cadastros
+    
+    geracao = cache_cadastros_simples.geracao()
     try:
         logger.info("=== INICIANDO listar_cadastros_simples ===")
         conn = get_db_connection()
@@ -752,6 +1457,7 @@ def listar_cadastros_simples():
         conn.close()
         logger.info("Conexão fechada para listar_cadastros_simples")
         
+        cache_cadastros_simples.definir('lista', cadastros, geracao)
         return cadastros
         
     except Exception as e:
@@ -795,6 +1501,7 @@ def adicionar_permissao_usuario(usuario_id, permissao):
             ON CONFLICT (usuario_id, permissao) DO NOTHING
         ''', (usuario_id, permissao))
         
+        publicar_invalidacao('permissoes', cursor=cursor)
         conn.commit()
         cursor.close()
         conn.close()
@@ -816,6 +1523,7 @@ def remover_permissao_usuario(usuario_id, permissao):
             WHERE usuario_id = %s AND permissao = %s
         ''', (usuario_id, permissao))
         
+        publicar_invalidacao('permissoes', cursor=cursor)
         conn.commit()
         cursor.close()
         conn.close()
@@ -828,6 +1536,12 @@ def remover_permissao_usuario(usuario_id, permissao):
 
 def usuario_tem_permissao(usuario_nome, permissao):
     """Verifica se um usuário tem uma permissão específica"""
+    chave = ('permissao', usuario_nome, permissao)
+    tem_permissao = cache_permissoes.obter(chave)
+    if tem_permissao is not None:
+        return tem_permissao
+    
+    geracao = cache_permissoes.geracao()
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
@@ -839,6 +1553,7 @@ def usuario_tem_permissao(usuario_nome, permissao):
         if usuario_data and usuario_data[0] == 1:  # Admin ID 1
             cursor.close()
             conn.close()
+            cache_permissoes.definir(chave, True, geracao)
             return True
         
         # Verificar permissão específica para outros usuários
@@ -852,6 +1567,7 @@ def usuario_tem_permissao(usuario_nome, permissao):
         cursor.close()
         conn.close()
         
+        cache_permissoes.definir(chave, tem_permissao, geracao)
         return tem_permissao
         
     except Exception as e:
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Extensões compartilhadas pela aplicação e pelos blueprints
+
+O limiter é único: app.py chama init_app e os blueprints importam daqui para
+declarar os próprios limites. As contagens ficam em um SQLite compartilhado
+pelos workers do host (limites_sqlite.py), com janela móvel.
+"""
+import os
+
+from flask import session
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+
+import limites_sqlite  # registra o esquema ameg-sqlite://
+
+RATE_LIMIT_STORAGE_URI = os.environ.get('RATE_LIMIT_STORAGE_URI', 'ameg-sqlite:///tmp/ameg_limites.db')
+
+limiter = Limiter(
+    key_func=get_remote_address,
+    default_limits=["200 per day", "50 per hour"],
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy='moving-window',
+    # Se o armazenamento falhar, usa memória no worker em vez de derrubar a requisição
+    in_memory_fallback_enabled=True,
+)
+
+def chave_usuario():
+    """Chave do rate limiting: usuário logado (ou IP sem sessão)"""
+    return f"usuario:{session.get('usuario') or get_remote_address()}"
+
+# Prévias e listas carregadas sob demanda: uma página com muitos anexos dispara
+# dezenas de requisições, que esgotariam o limite geral (50/hora por IP)
+LIMITE_RECURSOS_PAGINA = os.environ.get('LIMITE_RECURSOS_PAGINA', '1000 per hour')
+limite_recursos_pagina = limiter.limit(LIMITE_RECURSOS_PAGINA, key_func=chave_usuario)
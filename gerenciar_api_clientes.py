@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Gerenciamento dos clientes da API REST
+
+Cria chaves por integração com escopos e limite próprios, lista e revoga.
+A chave só é exibida na criação; o banco guarda apenas o hash.
+
+Uso:
+  python gerenciar_api_clientes.py criar "Painel BI" --escopos stats:read --por-minuto 60
+  python gerenciar_api_clientes.py listar
+  python gerenciar_api_clientes.py revogar 3
+"""
+import argparse
+import sys
+
+from api_clientes import ESCOPOS, LIMITE_PADRAO_POR_MINUTO, criar_cliente, listar_clientes, revogar_cliente
+
+def main():
+    parser = argparse.ArgumentParser(description='Clientes da API REST')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    criar = comandos.add_parser('criar', help='Cria um cliente e mostra a chave')
+    criar.add_argument('nome')
+    criar.add_argument('--escopos', default=','.join(ESCOPOS),
+                       help=f"Separados por vírgula ({', '.join(ESCOPOS)})")
+    criar.add_argument('--por-minuto', type=int, default=LIMITE_PADRAO_POR_MINUTO,
+                       help='Requisições por minuto')
+
+    comandos.add_parser('listar', help='Lista os clientes')
+
+    revogar = comandos.add_parser('revogar', help='Desativa um cliente')
+    revogar.add_argument('id', type=int)
+
+    args = parser.parse_args()
+
+    print("🔐 Clientes da API REST - AMEG")
+    print("=" * 50)
+
+    try:
+        if args.comando == 'criar':
+            escopos = [e.strip() for e in args.escopos.split(',') if e.strip()]
+            cliente_id, chave = criar_cliente(args.nome, escopos, args.por_minuto)
+            print(f"✅ Cliente {cliente_id} criado: {args.nome}")
+            print(f"🔑 api_key: {chave}")
+            print("⚠️  Guarde a chave agora; ela não pode ser recuperada depois")
+
+        elif args.comando == 'listar':
+            for cliente_id, nome, escopos, por_minuto, ativo, criado_em in listar_clientes():
+                situacao = '✅' if ativo else '🚫'
+                print(f"{situacao} {cliente_id:>4}  {nome:<30} {escopos:<30} {por_minuto}/min  {criado_em:%d/%m/%Y}")
+
+        elif args.comando == 'revogar':
+            if not revogar_cliente(args.id):
+                print(f"❌ Cliente {args.id} não encontrado")
+                sys.exit(1)
+            print(f"✅ Cliente {args.id} revogado")
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Configuração do gunicorn em produção (start.sh e Dockerfile)
+
+Workers gthread: cada processo atende várias requisições em threads, o que
+cobre bem o tempo esperando o PostgreSQL e os uploads sem multiplicar a
+memória. Com preload_app a aplicação é importada uma vez no master e os
+workers nascem por fork (memória compartilhada, boot mais rápido); o que é
+por processo (listener do cache_bus, pool de otimização, conexão SQLite do
+rate limiting) é recriado no worker. Os workers são reciclados depois de
+max_requests requisições, com jitter para não reiniciarem todos juntos.
+
+Variáveis de ambiente:
+    PORT                      porta (padrão 5000)
+    WEB_CONCURRENCY           número de workers (padrão 2 × CPUs + 1)
+    GUNICORN_MAX_WORKERS      teto do cálculo automático (padrão 8)
+    GUNICORN_THREADS          threads por worker (padrão 4)
+    GUNICORN_MAX_REQUESTS     reciclagem do worker (padrão 1000, 0 desliga)
+    GUNICORN_TIMEOUT          segundos sem resposta do worker até reiniciá-lo (padrão 120)
+    DB_STATEMENT_TIMEOUT_MS / DB_STATEMENT_TIMEOUT_LONGO_MS
+                              limite das consultas por rota (ver app.py); o longo
+                              + 30s também é o graceful_timeout
+"""
+import os
+
+def _cpus():
+    try:
+        # CPUs disponíveis para o container, não as do host
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY') or
+              min(2 * _cpus() + 1, int(os.environ.get('GUNICORN_MAX_WORKERS', 8))))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+preload_app = True
+
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+# Com gthread o timeout é o heartbeat do worker, não de cada requisição: precisa
+# cobrir o relatório mais longo; o limite por rota fica no statement_timeout
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+# Worker reciclado (max_requests) ou em deploy termina as requisições em andamento:
+# precisa cobrir a consulta mais longa permitida (exportações PDF, stream NDJSON)
+graceful_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_LONGO_MS', 300000)) // 1000 + 30
+# Atrás do proxy do Railway, que reaproveita as conexões
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+def post_fork(server, worker):
+    """Estado por processo: caches herdados do master e listener de invalidação"""
+    import cache_bus
+    cache_bus.invalidar_todos()
+    if os.environ.get('DATABASE_URL'):
+        cache_bus.iniciar_listener()
+
+def on_starting(server):
+    server.log.info(f"🚀 gunicorn: {workers} workers × {threads} threads, "
+                    f"reciclagem a cada {max_requests}±{max_requests_jitter} requisições")
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Importação em lote de cadastros (CSV/XLSX)
+
+O arquivo é lido em stream, cada linha é validada com as mesmas regras do
+formulário (cadastro_schema.py), as linhas válidas são carregadas
+com COPY em uma tabela temporária e inseridas em cadastros com um único
+INSERT ... SELECT, ignorando CPFs já existentes. Linhas rejeitadas vão para um
+relatório CSV e a importação gera uma única entrada de auditoria.
+"""
+import csv
+import io
+import posixpath
+import re
+import tempfile
+import zipfile
+import logging
+from datetime import datetime
+from xml.etree.ElementTree import fromstring, iterparse
+
+from cadastro_schema import CAMPOS, validate_field_lengths
+
+logger = logging.getLogger(__name__)
+
+# Colunas importáveis (a foto nunca vem da planilha)
+COLUNAS_IMPORTACAO = {campo.nome: campo for campo in CAMPOS if campo.nome != 'foto_base64'}
+
+_NS_XLSX = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_NS_PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+def normalizar_cabecalho(nome):
+    """'Nome Completo' -> 'nome_completo'"""
+    return re.sub(r'[^a-z0-9]+', '_', (nome or '').strip().lower()).strip('_')
+
+def somente_digitos(valor):
+    return re.sub(r'\D', '', valor or '')
+
+# ---------------------------------------------------------------------------
+# Leitura em stream
+# ---------------------------------------------------------------------------
+
+def ler_csv(arquivo):
+    """Gera dicionários a partir de um CSV binário (detecta ';' ou ',')"""
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    amostra = texto.read(8192)
+    texto.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=';,\t')
+    except csv.Error:
+        dialeto = csv.excel
+
+    for linha in csv.DictReader(texto, dialect=dialeto):
+        yield linha
+
+def _coluna_xlsx(referencia):
+    """'AB12' -> 27 (índice da coluna, base 0)"""
+    indice = 0
+    for letra in re.match(r'[A-Z]+', referencia).group():
+        indice = indice * 26 + ord(letra) - 64
+    return indice - 1
+
+def _primeira_planilha(pacote):
+    """Caminho da primeira planilha (ordem das abas em xl/workbook.xml, resolvida pelos _rels)"""
+    planilha = fromstring(pacote.read('xl/workbook.xml')).find(f'{_NS_XLSX}sheets/{_NS_XLSX}sheet')
+    relacoes = fromstring(pacote.read('xl/_rels/workbook.xml.rels'))
+    for relacao in relacoes.iter(f'{_NS_PKG_REL}Relationship'):
+        if relacao.get('Id') == planilha.get(f'{_NS_REL}id'):
+            alvo = relacao.get('Target')
+            # Alvo relativo a xl/ ou absoluto no pacote ('/xl/worksheets/...')
+            return alvo.lstrip('/') if alvo.startswith('/') else posixpath.normpath(posixpath.join('xl', alvo))
+    raise ValueError('Planilha não encontrada no arquivo XLSX')
+
+def ler_xlsx(arquivo):
+    """Gera dicionários da primeira planilha de um XLSX usando apenas a biblioteca padrão"""
+    with zipfile.ZipFile(arquivo) as pacote:
+        compartilhadas = []
+        if 'xl/sharedStrings.xml' in pacote.namelist():
+            with pacote.open('xl/sharedStrings.xml') as xml:
+                for _, elemento in iterparse(xml):
+                    if elemento.tag == f'{_NS_XLSX}si':
+                        compartilhadas.append(''.join(t.text or '' for t in elemento.iter(f'{_NS_XLSX}t')))
+                        elemento.clear()
+
+        cabecalho = None
+        with pacote.open(_primeira_planilha(pacote)) as xml:
+            for _, elemento in iterparse(xml):
+                if elemento.tag != f'{_NS_XLSX}row':
+                    continue
+
+                valores = {}
+                coluna = -1
+                for celula in elemento.iter(f'{_NS_XLSX}c'):
+                    tipo = celula.get('t')
+                    if tipo == 'inlineStr':
+                        texto = ''.join(t.text or '' for t in celula.iter(f'{_NS_XLSX}t'))
+                    else:
+                        v = celula.find(f'{_NS_XLSX}v')
+                        texto = v.text if v is not None else ''
+                        if tipo == 's' and texto:
+                            texto = compartilhadas[int(texto)]
+                    # O atributo r é opcional: sem ele a célula é a seguinte à anterior
+                    referencia = celula.get('r')
+                    coluna = _coluna_xlsx(referencia) if referencia else coluna + 1
+                    valores[coluna] = texto
+                elemento.clear()
+
+                if cabecalho is None:
+                    cabecalho = {i: nome for i, nome in valores.items()}
+                    continue
+                yield {cabecalho[i]: valor for i, valor in valores.items() if i in cabecalho}
+
+def ler_arquivo(arquivo, nome_arquivo):
+    """Escolhe o leitor pela extensão do arquivo"""
+    if nome_arquivo.lower().endswith('.xlsx'):
+        return ler_xlsx(arquivo)
+    return ler_csv(arquivo)
+
+# ---------------------------------------------------------------------------
+# Validação
+# ---------------------------------------------------------------------------
+
+def _converter(valor, campo):
+    """Converte o texto da planilha para o formato aceito pelo COPY"""
+    if campo.tipo == 'inteiro':
+        numero = int(float(valor.replace(',', '.')))
+        if not -2**31 <= numero < 2**31:
+            raise ValueError('fora do intervalo')
+        return str(numero)
+    if campo.tipo == 'decimal':
+        # Aceita '1.234,56' (padrão brasileiro) e '1234.56'
+        if ',' in valor:
+            valor = valor.replace('.', '').replace(',', '.')
+        numero = round(float(valor), campo.escala)
+        if abs(numero) >= 10 ** (campo.precisao - campo.escala):
+            raise ValueError('fora do intervalo')
+        return str(numero)
+    if campo.tipo == 'data':
+        for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+            try:
+                return datetime.strptime(valor, formato).date().isoformat()
+            except ValueError:
+                continue
+        # XLSX guarda datas como número de dias desde 1899-12-30
+        dias = float(valor)
+        return datetime.fromordinal(datetime(1899, 12, 30).toordinal() + int(dias)).date().isoformat()
+    return valor
+
+def validar_linha(linha, colunas):
+    """Retorna (valores, erros) de uma linha normalizada"""
+    dados = {k: (v or '').strip() for k, v in linha.items() if k in colunas}
+    erros = []
+
+    if not dados.get('nome_completo'):
+        erros.append('Nome completo é obrigatório')
+    if not somente_digitos(dados.get('cpf')):
+        erros.append('CPF é obrigatório (usado para evitar duplicidade)')
+
+    erros.extend(validate_field_lengths(dados))
+
+    valores = {}
+    for coluna, valor in dados.items():
+        if valor == '':
+            continue
+        try:
+            valores[coluna] = _converter(valor, colunas[coluna])
+        except (ValueError, OverflowError):
+            erros.append(f"{coluna}: valor inválido '{valor}'")
+
+    return valores, erros
+
+# ---------------------------------------------------------------------------
+# Importação
+# ---------------------------------------------------------------------------
+
+def importar_cadastros(arquivo, nome_arquivo, usuario, caminho_rejeitados):
+    """Importa cadastros de um arquivo CSV/XLSX e retorna o resumo da importação"""
+    from database import get_db_connection, registrar_auditoria
+    from cache_bus import publicar_invalidacao
+
+    resumo = {'arquivo': nome_arquivo, 'lidas': 0, 'validas': 0, 'inseridas': 0,
+              'rejeitadas': 0, 'colunas_ignoradas': [], 'rejeitados': caminho_rejeitados}
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        colunas = COLUNAS_IMPORTACAO
+        ordem = list(colunas)
+
+        with open(caminho_rejeitados, 'w', newline='', encoding='utf-8') as saida_rejeitados, \
+                tempfile.TemporaryFile('w+', newline='', encoding='utf-8') as preparado:
+            rejeitados = csv.writer(saida_rejeitados)
+            rejeitados.writerow(['linha', 'cpf', 'nome_completo', 'motivo'])
+            copia = csv.writer(preparado)
+            cpfs_vistos = {}
+
+            # 1) Ler e validar em stream; linhas válidas vão para um CSV temporário
+            for numero, bruta in enumerate(ler_arquivo(arquivo, nome_arquivo), start=2):
+                linha = {normalizar_cabecalho(k): v for k, v in bruta.items() if k}
+                if resumo['lidas'] == 0:
+                    resumo['colunas_ignoradas'] = sorted(k for k in linha if k not in colunas)
+                resumo['lidas'] += 1
+
+                valores, erros = validar_linha(linha, colunas)
+                cpf = somente_digitos(valores.get('cpf'))
+                if not erros and cpf in cpfs_vistos:
+                    erros.append(f'CPF duplicado no arquivo (linha {cpfs_vistos[cpf]})')
+
+                if erros:
+                    rejeitados.writerow([numero, linha.get('cpf', ''), linha.get('nome_completo', ''), '; '.join(erros)])
+                    resumo['rejeitadas'] += 1
+                    continue
+
+                cpfs_vistos[cpf] = numero
+                copia.writerow([numero, cpf] + [valores.get(c, r'\N') for c in ordem])
+                resumo['validas'] += 1
+
+            preparado.seek(0)
+
+            # 2) COPY para a tabela temporária
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', ('importacao_cadastros',))
+            cursor.execute('CREATE TEMP TABLE importacao_cadastros ON COMMIT DROP AS SELECT * FROM cadastros WITH NO DATA')
+            cursor.execute('ALTER TABLE importacao_cadastros ADD COLUMN linha INTEGER, ADD COLUMN cpf_digitos TEXT')
+            lista_colunas = ', '.join(ordem)
+            cursor.copy_expert(
+                f"COPY importacao_cadastros (linha, cpf_digitos, {lista_colunas}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                preparado
+            )
+
+            # 3) CPFs que já existem no banco são rejeitados
+            cursor.execute('''
+                SELECT s.linha, s.cpf, s.nome_completo FROM importacao_cadastros s
+                WHERE EXISTS (SELECT 1 FROM cadastros c
+                              WHERE regexp_replace(c.cpf, '\\D', '', 'g') = s.cpf_digitos)
+                ORDER BY s.linha
+            ''')
+            for numero, cpf, nome in cursor.fetchall():
+                rejeitados.writerow([numero, cpf, nome, 'CPF já cadastrado'])
+                resumo['rejeitadas'] += 1
+
+        # 4) Merge em uma única instrução
+        cursor.execute(f'''
+            INSERT INTO cadastros ({lista_colunas})
+            SELECT {lista_colunas} FROM importacao_cadastros s
+            WHERE NOT EXISTS (SELECT 1 FROM cadastros c
+                              WHERE regexp_replace(c.cpf, '\\D', '', 'g') = s.cpf_digitos)
+            ORDER BY s.linha
+        ''')
+        resumo['inseridas'] = cursor.rowcount
+
+        publicar_invalidacao('cadastros', cursor=cursor)
+        conn.commit()
+        cursor.close()
+
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    registrar_auditoria(usuario, 'IMPORT', 'cadastros', None, None,
+                        f"Arquivo: {nome_arquivo}, Lidas: {resumo['lidas']}, "
+                        f"Inseridas: {resumo['inseridas']}, Rejeitadas: {resumo['rejeitadas']}")
+    logger.info(f"✅ Importação de {nome_arquivo}: {resumo['inseridas']} inseridos, {resumo['rejeitadas']} rejeitados")
+
+    return resumo
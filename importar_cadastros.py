@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Importação em lote de cadastros pela linha de comando
+
+Uso: python importar_cadastros.py planilha.xlsx [--usuario admin] [--rejeitados saida.csv]
+"""
+import argparse
+import sys
+
+from importacao import importar_cadastros
+
+def main():
+    parser = argparse.ArgumentParser(description='Importa cadastros de um arquivo CSV ou XLSX')
+    parser.add_argument('arquivo', help='Arquivo CSV ou XLSX com cabeçalho na primeira linha')
+    parser.add_argument('--usuario', default='Sistema', help='Usuário registrado na auditoria')
+    parser.add_argument('--rejeitados', help='Relatório de linhas rejeitadas (padrão: <arquivo>.rejeitados.csv)')
+    args = parser.parse_args()
+
+    caminho_rejeitados = args.rejeitados or f'{args.arquivo}.rejeitados.csv'
+
+    print("📥 Importação de Cadastros - AMEG")
+    print("=" * 50)
+
+    try:
+        with open(args.arquivo, 'rb') as arquivo:
+            resumo = importar_cadastros(arquivo, args.arquivo, args.usuario, caminho_rejeitados)
+    except Exception as e:
+        print(f"❌ Erro na importação: {e}")
+        sys.exit(1)
+
+    print(f"\n✅ Linhas lidas:      {resumo['lidas']}")
+    print(f"✅ Inseridas:         {resumo['inseridas']}")
+    print(f"⚠️  Rejeitadas:        {resumo['rejeitadas']}")
+    if resumo['colunas_ignoradas']:
+        print(f"⚠️  Colunas ignoradas: {', '.join(resumo['colunas_ignoradas'])}")
+    if resumo['rejeitadas']:
+        print(f"\n📋 Relatório de rejeitados: {caminho_rejeitados}")
+
+if __name__ == '__main__':
+    main()
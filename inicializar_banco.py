@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Preparação do banco: tabelas, índices, triggers e usuário admin
+
+Roda uma vez por deploy (start.sh, antes do gunicorn) em vez de em cada
+worker ao importar app.py. Também é chamado por `python app.py` no
+servidor de desenvolvimento.
+
+Uso: python inicializar_banco.py
+"""
+import os
+import sys
+import logging
+
+from database import init_db_tables, create_admin_user
+
+logger = logging.getLogger(__name__)
+
+def inicializar_banco():
+    """Cria/atualiza o esquema e garante o usuário admin; retorna False em caso de erro"""
+    ambiente = 'Railway' if os.environ.get('RAILWAY_ENVIRONMENT') else 'local'
+    logger.info(f"🔧 Inicializando banco PostgreSQL ({ambiente})...")
+    try:
+        init_db_tables()
+        logger.info("✅ Tabelas inicializadas")
+
+        create_admin_user()
+        logger.info("✅ Usuário admin configurado")
+        return True
+    except Exception as e:
+        import traceback
+        logger.error(f"❌ Erro na inicialização do banco: {e}")
+        logger.error(f"Traceback completo: {traceback.format_exc()}")
+        return False
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(0 if inicializar_banco() else 1)
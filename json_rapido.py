@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Serialização JSON rápida para respostas da aplicação
+
+Com orjson instalado, OrjsonProvider substitui o provider padrão do Flask:
+datas e horas saem direto em ISO 8601 e Decimal como string (o mesmo que o
+Flask já fazia com Decimal), sem o json.dumps em Python puro. Sem orjson,
+ProviderISO mantém o mesmo formato de saída com o módulo json.
+
+dados_colunares() monta o formato {"columns": [...], "rows": [[...]]} usado
+pelas respostas grandes quando o cliente pede ?formato=colunar.
+"""
+import json
+import decimal
+import logging
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+def _padrao(valor):
+    """Tipos sem serialização nativa (no orjson e no json)"""
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, decimal.Decimal):
+        return str(valor)
+    return DefaultJSONProvider.default(valor)
+
+class ProviderISO(DefaultJSONProvider):
+    """Provider padrão do Flask com datas em ISO 8601 (fallback sem orjson)"""
+
+    # Ordenar chaves custa caro em respostas grandes e os clientes não dependem disso
+    sort_keys = False
+    default = staticmethod(_padrao)
+
+class OrjsonProvider(ProviderISO):
+    """JSONProvider do Flask baseado em orjson"""
+
+    def dumps(self, obj, **kwargs):
+        opcoes = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('indent'):
+            opcoes |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_padrao, option=opcoes).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # bytes direto do orjson, sem passar por str
+        return self._app.response_class(
+            orjson.dumps(obj, default=_padrao, option=orjson.OPT_NON_STR_KEYS),
+            mimetype=self.mimetype,
+        )
+
+def configurar_json(app):
+    """Instala o provider JSON da aplicação (orjson quando disponível)"""
+    provider = OrjsonProvider if orjson is not None else ProviderISO
+    if orjson is None:
+        logger.info("orjson não instalado - usando json da biblioteca padrão")
+    app.json_provider_class = provider
+    app.json = provider(app)
+
+def dumps_linha(obj):
+    """Um objeto JSON terminado em \\n, em bytes (para NDJSON)"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_padrao, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False, default=_padrao) + '\n').encode('utf-8')
+
+def dados_colunares(colunas, linhas):
+    """Resultado tabular como {"columns": [...], "rows": [[...]]}; as tuplas do cursor vão direto"""
+    return {'columns': list(colunas), 'rows': linhas}
+
+def em_colunas(resultado):
+    """Converte as listas de dicts de um resultado (ex.: séries dos gráficos) para o formato colunar"""
+    convertido = {}
+    for chave, valor in resultado.items():
+        if isinstance(valor, list) and valor and isinstance(valor[0], dict):
+            colunas = list(valor[0])
+            valor = dados_colunares(colunas, [[item.get(coluna) for coluna in colunas] for item in valor])
+        convertido[chave] = valor
+    return convertido
+
+def formato_colunar(request):
+    """Cliente pediu o formato colunar (?formato=colunar)"""
+    return request.args.get('formato') == 'colunar'
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Armazenamento do rate limiting compartilhado entre os workers (SQLite local)
+
+Com memory:// cada worker do gunicorn contava as requisições sozinho, e o
+limite de login valia vezes o número de workers. Aqui as contagens ficam em
+um arquivo SQLite (WAL) no disco do container, visto por todos os workers:
+cada verificação é uma transação local curta, sem ir ao PostgreSQL. Suporta
+a estratégia moving-window (uma linha por requisição dentro da janela) e
+contadores de janela fixa.
+
+Registrado no limits como ameg-sqlite:///caminho/arquivo.db
+"""
+import os
+import time
+import random
+import sqlite3
+import logging
+import threading
+
+from limits.storage import Storage, MovingWindowSupport
+
+logger = logging.getLogger(__name__)
+
+# Limpeza das entradas expiradas de todas as chaves, em média a cada N acessos
+LIMPEZA_A_CADA = 1000
+
+class SQLiteStorage(Storage, MovingWindowSupport):
+    """Storage do limits em arquivo SQLite compartilhado pelos processos do host"""
+
+    STORAGE_SCHEME = ['ameg-sqlite']
+
+    def __init__(self, uri, wrap_exceptions=False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.caminho = uri.split('://', 1)[1] or '/tmp/ameg_limites.db'
+        self._local = threading.local()
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _conexao(self):
+        """Uma conexão por thread e por processo (recriada após o fork)
+
+        Aberta só no primeiro uso: com preload_app o master do gunicorn cria o
+        storage mas não deve levar uma conexão SQLite aberta para os workers.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Contagens são descartáveis: não vale esperar o fsync
+            conn.execute('PRAGMA synchronous=OFF')
+            self._criar_tabelas(conn)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _criar_tabelas(self, conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS janelas (
+                chave TEXT NOT NULL,
+                instante REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_janelas_chave ON janelas (chave, instante)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS contadores (
+                chave TEXT PRIMARY KEY,
+                valor INTEGER NOT NULL,
+                expira REAL NOT NULL
+            )
+        ''')
+
+    def _limpar_expirados(self, conn, agora):
+        if random.randrange(LIMPEZA_A_CADA) == 0:
+            # Janelas de até um dia cobrem todos os limites configurados
+            conn.execute('DELETE FROM janelas WHERE instante <= ?', (agora - 86400,))
+            conn.execute('DELETE FROM contadores WHERE expira <= ?', (agora,))
+
+    # Moving window
+
+    def acquire_entry(self, key, limit, expiry, amount=1):
+        if amount > limit:
+            return False
+        conn = self._conexao()
+        agora = time.time()
+        # IMMEDIATE: contagem e inserção atômicas entre os workers
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM janelas WHERE chave = ? AND instante <= ?', (key, agora - expiry))
+            usados = conn.execute('SELECT COUNT(*) FROM janelas WHERE chave = ?', (key,)).fetchone()[0]
+            aceito = usados + amount <= limit
+            if aceito:
+                conn.executemany('INSERT INTO janelas (chave, instante) VALUES (?, ?)', [(key, agora)] * amount)
+            self._limpar_expirados(conn, agora)
+            conn.execute('COMMIT')
+            return aceito
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def get_moving_window(self, key, limit, expiry):
+        agora = time.time()
+        inicio, usados = self._conexao().execute(
+            'SELECT MIN(instante), COUNT(*) FROM janelas WHERE chave = ? AND instante > ?',
+            (key, agora - expiry)
+        ).fetchone()
+        return (inicio or agora), usados
+
+    # Janela fixa
+
+    def incr(self, key, expiry, amount=1):
+        agora = time.time()
+        return self._conexao().execute('''
+            INSERT INTO contadores (chave, valor, expira) VALUES (?, ?, ?)
+            ON CONFLICT (chave) DO UPDATE SET
+                valor = CASE WHEN contadores.expira <= ? THEN excluded.valor ELSE contadores.valor + excluded.valor END,
+                expira = CASE WHEN contadores.expira <= ? THEN excluded.expira ELSE contadores.expira END
+            RETURNING valor
+        ''', (key, amount, agora + expiry, agora, agora)).fetchone()[0]
+
+    def get(self, key):
+        linha = self._conexao().execute(
+            'SELECT valor FROM contadores WHERE chave = ? AND expira > ?', (key, time.time())
+        ).fetchone()
+        return linha[0] if linha else 0
+
+    def get_expiry(self, key):
+        linha = self._conexao().execute('SELECT expira FROM contadores WHERE chave = ?', (key,)).fetchone()
+        return linha[0] if linha else time.time()
+
+    def check(self):
+        try:
+            self._conexao().execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        conn = self._conexao()
+        removidos = conn.execute('DELETE FROM janelas').rowcount
+        removidos += conn.execute('DELETE FROM contadores').rowcount
+        return removidos
+
+    def clear(self, key):
+        conn = self._conexao()
+        conn.execute('DELETE FROM janelas WHERE chave = ?', (key,))
+        conn.execute('DELETE FROM contadores WHERE chave = ?', (key,))
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Otimização de arquivos enviados (fotos de laudos, receitas e comprovantes)
+
+Imagens acima de OTIMIZAR_LADO_MAX são reduzidas, têm a orientação EXIF
+aplicada e os metadados removidos; PDFs são regravados com streams
+comprimidos, objetos duplicados removidos e imagens internas recomprimidas.
+O trabalho roda em um pool de threads por worker, depois do commit do upload,
+então a requisição retorna sem esperar. O resultado só substitui o original
+quando é menor; com GUARDAR_ORIGINAIS o original vai para arquivos_originais.
+"""
+import io
+import os
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database import get_db_connection
+from cache_bus import publicar_invalidacao
+from uploads import detectar_tipo
+from previas import gerar_previa
+
+logger = logging.getLogger(__name__)
+
+OTIMIZAR_LADO_MAX = int(os.environ.get('OTIMIZAR_LADO_MAX', 2000))
+OTIMIZAR_QUALIDADE_JPEG = int(os.environ.get('OTIMIZAR_QUALIDADE_JPEG', 80))
+OTIMIZAR_WORKERS = int(os.environ.get('OTIMIZAR_WORKERS', 2))
+GUARDAR_ORIGINAIS = os.environ.get('GUARDAR_ORIGINAIS', 'false').lower() == 'true'
+
+# Tabelas com arquivos otimizáveis e o tópico de cache de cada uma
+TABELAS = {
+    'arquivos_saude': 'arquivos',
+    'comprovantes_caixa': 'caixa',
+}
+
+def otimizar_imagem(dados):
+    """Reduz, aplica a orientação e remove EXIF; retorna (bytes, tipo MIME)"""
+    # Pillow e pypdf só carregam no pool de otimização, não na inicialização do worker
+    from PIL import Image, ImageOps
+    
+    with Image.open(io.BytesIO(dados)) as imagem:
+        if getattr(imagem, 'is_animated', False):
+            return dados, Image.MIME.get(imagem.format)
+        formato = imagem.format
+        imagem = ImageOps.exif_transpose(imagem)
+        imagem.thumbnail((OTIMIZAR_LADO_MAX, OTIMIZAR_LADO_MAX), Image.LANCZOS)
+
+        saida = io.BytesIO()
+        # Mantém o formato de origem: nome_arquivo (extensão) e MIME continuam valendo
+        if formato == 'PNG':
+            imagem.save(saida, 'PNG', optimize=True)
+        elif formato == 'GIF':
+            imagem.save(saida, 'GIF', optimize=True)
+        else:
+            formato = 'JPEG'
+            imagem.convert('RGB').save(saida, 'JPEG', quality=OTIMIZAR_QUALIDADE_JPEG,
+                                       optimize=True, progressive=True)
+        return saida.getvalue(), Image.MIME[formato]
+
+def otimizar_pdf(dados):
+    """Comprime streams e imagens internas e remove objetos duplicados"""
+    from PIL import Image
+    from pypdf import PdfReader, PdfWriter
+    
+    writer = PdfWriter(clone_from=PdfReader(io.BytesIO(dados)))
+    for pagina in writer.pages:
+        for imagem in pagina.images:
+            try:
+                if max(imagem.image.size) > OTIMIZAR_LADO_MAX or imagem.image.format == 'JPEG':
+                    reduzida = imagem.image.copy()
+                    reduzida.thumbnail((OTIMIZAR_LADO_MAX, OTIMIZAR_LADO_MAX), Image.LANCZOS)
+                    imagem.replace(reduzida.convert('RGB'), quality=OTIMIZAR_QUALIDADE_JPEG)
+            except Exception as e:
+                logger.debug(f"Imagem de PDF mantida: {e}")
+        pagina.compress_content_streams(level=9)
+    writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+
+    saida = io.BytesIO()
+    writer.write(saida)
+    return saida.getvalue()
+
+def otimizar(dados):
+    """Retorna (bytes, tipo MIME) otimizados ou None se não houver ganho"""
+    tipo = detectar_tipo(dados[:16])
+    if tipo in ('image/jpeg', 'image/png', 'image/gif'):
+        novos, tipo = otimizar_imagem(dados)
+    elif tipo == 'application/pdf':
+        novos = otimizar_pdf(dados)
+    else:
+        return None
+    return (novos, tipo) if len(novos) < len(dados) else None
+
+def otimizar_registro(tabela, arquivo_id):
+    """Otimiza um arquivo gravado; retorna bytes economizados"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        # SKIP LOCKED: outro worker (ou o CLI) já está processando este arquivo
+        cursor.execute(f'''
+            SELECT arquivo_dados, sha256 FROM {tabela}
+            WHERE id = %s AND otimizado_em IS NULL
+            FOR UPDATE SKIP LOCKED
+        ''', (arquivo_id,))
+        linha = cursor.fetchone()
+        if not linha or linha[0] is None:
+            conn.rollback()
+            return 0
+        dados = bytes(linha[0])
+
+        try:
+            resultado = otimizar(dados)
+        except Exception as e:
+            logger.warning(f"⚠️ Não foi possível otimizar {tabela} {arquivo_id}: {e}")
+            resultado = None
+
+        if resultado is None:
+            # Marca como processado para não tentar de novo
+            cursor.execute(f'''
+                UPDATE {tabela} SET otimizado_em = CURRENT_TIMESTAMP,
+                       tamanho_original = %s, tamanho = COALESCE(tamanho, %s)
+                WHERE id = %s
+            ''', (len(dados), len(dados), arquivo_id))
+            conn.commit()
+            return 0
+
+        novos, tipo = resultado
+        if GUARDAR_ORIGINAIS:
+            cursor.execute('''
+                INSERT INTO arquivos_originais (tabela, arquivo_id, arquivo_dados, sha256)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (tabela, arquivo_id) DO NOTHING
+            ''', (tabela, arquivo_id, linha[0], linha[1] or hashlib.sha256(dados).hexdigest()))
+
+        # Comprovantes guardam o MIME em tipo_arquivo; em arquivos_saude é a categoria
+        atualizar_tipo = ', tipo_arquivo = %s' if tabela == 'comprovantes_caixa' else ''
+        cursor.execute(f'''
+            UPDATE {tabela} SET arquivo_dados = %s, tamanho = %s, sha256 = %s,
+                   tamanho_original = %s, otimizado_em = CURRENT_TIMESTAMP{atualizar_tipo}
+            WHERE id = %s
+        ''', (novos, len(novos), hashlib.sha256(novos).hexdigest(), len(dados),
+              *((tipo,) if atualizar_tipo else ()), arquivo_id))
+        publicar_invalidacao(TABELAS[tabela], cursor=cursor)
+        conn.commit()
+    finally:
+        conn.close()
+
+    economia = len(dados) - len(novos)
+    logger.info(f"🗜️ {tabela} {arquivo_id}: {len(dados)} → {len(novos)} bytes (-{economia})")
+    return economia
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def _obter_pool():
+    """Pool do processo atual (recriado após o fork dos workers)"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(max_workers=OTIMIZAR_WORKERS, thread_name_prefix='otimizacao')
+            _pool_pid = os.getpid()
+        return _pool
+
+def _executar(tabela, arquivo_id):
+    try:
+        otimizar_registro(tabela, arquivo_id)
+        # Prévia do conteúdo final (o SHA-256 muda quando o arquivo é otimizado)
+        gerar_previa(tabela, arquivo_id)
+    except Exception as e:
+        logger.error(f"❌ Erro ao processar {tabela} {arquivo_id}: {e}")
+
+def agendar_otimizacao(tabela, ids):
+    """Enfileira arquivos já commitados para otimização e prévia em segundo plano"""
+    pool = _obter_pool()
+    for arquivo_id in ids:
+        pool.submit(_executar, tabela, arquivo_id)
+
+def pendentes(tabela, limite=None):
+    """IDs ainda não otimizados (uploads anteriores ou perdidos em um restart)"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT id FROM {tabela} WHERE otimizado_em IS NULL ORDER BY id
+            {'LIMIT %s' if limite else ''}
+        ''', (limite,) if limite else ())
+        return [linha[0] for linha in cursor.fetchall()]
+    finally:
+        conn.close()
+
+def limpar_originais_orfaos():
+    """Remove originais cujo arquivo foi excluído (cadastros e movimentações apagados)"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        removidos = 0
+        for tabela in TABELAS:
+            cursor.execute(f'''
+                DELETE FROM arquivos_originais o
+                WHERE o.tabela = %s AND NOT EXISTS (SELECT 1 FROM {tabela} a WHERE a.id = o.arquivo_id)
+            ''', (tabela,))
+            removidos += cursor.rowcount
+        conn.commit()
+        return removidos
+    finally:
+        conn.close()
+
+def relatorio_otimizacao():
+    """Arquivos, otimizados e bytes economizados por tabela"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        relatorio = []
+        for tabela in TABELAS:
+            cursor.execute(f'''
+                SELECT COUNT(*),
+                       COUNT(otimizado_em),
+                       COALESCE(SUM(tamanho_original), 0),
+                       COALESCE(SUM(tamanho) FILTER (WHERE otimizado_em IS NOT NULL), 0)
+                FROM {tabela}
+            ''')
+            total, otimizados, bytes_originais, bytes_atuais = cursor.fetchone()
+            relatorio.append({
+                'tabela': tabela,
+                'arquivos': total,
+                'otimizados': otimizados,
+                'pendentes': total - otimizados,
+                'bytes_originais': bytes_originais,
+                'bytes_atuais': bytes_atuais,
+                'economia': bytes_originais - bytes_atuais,
+            })
+        return relatorio
+    finally:
+        conn.close()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Otimização dos arquivos pendentes pela linha de comando
+
+Processa uploads anteriores à otimização automática (ou perdidos em um
+restart), remove originais de arquivos já excluídos e mostra o espaço
+economizado.
+
+Uso: python otimizar_arquivos.py [--limite 500] [--relatorio]
+"""
+import argparse
+import sys
+
+from otimizacao import TABELAS, pendentes, otimizar_registro, relatorio_otimizacao, limpar_originais_orfaos
+
+def main():
+    parser = argparse.ArgumentParser(description='Otimiza imagens e PDFs já gravados')
+    parser.add_argument('--limite', type=int, help='Máximo de arquivos por tabela')
+    parser.add_argument('--relatorio', action='store_true', help='Apenas mostra o relatório')
+    args = parser.parse_args()
+
+    print("🗜️ Otimização de Arquivos - AMEG")
+    print("=" * 50)
+
+    try:
+        if not args.relatorio:
+            for tabela in TABELAS:
+                ids = pendentes(tabela, args.limite)
+                economia = 0
+                for posicao, arquivo_id in enumerate(ids, 1):
+                    economia += otimizar_registro(tabela, arquivo_id)
+                    print(f"\r{tabela}: {posicao}/{len(ids)}", end='', flush=True)
+                print(f"\n✅ {tabela}: {len(ids)} arquivos, {economia / 1048576:.1f} MB economizados")
+            print(f"🧹 Originais órfãos removidos: {limpar_originais_orfaos()}")
+
+        print()
+        for linha in relatorio_otimizacao():
+            print(f"📋 {linha['tabela']}: {linha['otimizados']}/{linha['arquivos']} otimizados, "
+                  f"{linha['economia'] / 1048576:.1f} MB economizados, {linha['pendentes']} pendentes")
+    except Exception as e:
+        print(f"❌ Erro na otimização: {e}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Perfil de inicialização de um worker (import de app.py)
+
+Mede o tempo de cold start em processos novos e mostra, a partir do
+`python -X importtime`, os módulos que mais pesam na importação.
+
+Uso: python perfil_inicializacao.py [--repeticoes 5] [--top 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+CODIGO = 'import logging; logging.disable(logging.CRITICAL); import app'
+
+def cold_start(repeticoes):
+    """Tempo de parede de `import app` em processos novos"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, '-c', CODIGO], cwd=RAIZ, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+def perfil_imports():
+    """[(cumulativo µs, módulo, nível)] do -X importtime"""
+    saida = subprocess.run([sys.executable, '-X', 'importtime', '-c', CODIGO], cwd=RAIZ,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+    modulos = []
+    for linha in saida.splitlines():
+        if not linha.startswith('import time:') or 'cumulative' in linha:
+            continue
+        _, cumulativo, nome = linha[len('import time:'):].split('|')
+        nivel = (len(nome) - len(nome.lstrip())) // 2
+        modulos.append((int(cumulativo), nome.strip(), nivel))
+    return modulos
+
+def main():
+    parser = argparse.ArgumentParser(description='Perfil de inicialização do worker')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    print("⏱️ Inicialização do Worker - AMEG")
+    print("=" * 50)
+
+    tempos = cold_start(args.repeticoes)
+    print(f"🚀 import app: mediana {statistics.median(tempos) * 1000:.0f} ms "
+          f"(mín {min(tempos) * 1000:.0f} ms, {args.repeticoes} processos)")
+
+    modulos = perfil_imports()
+    print("\n📦 Módulos mais pesados (cumulativo, -X importtime):")
+    # Nível 1 = importados diretamente por algum módulo da aplicação
+    for cumulativo, nome, nivel in sorted((m for m in modulos if m[2] <= 1), reverse=True)[:args.top]:
+        print(f"  {cumulativo / 1000:8.1f} ms  {nome}")
+
+    pesados = ('reportlab', 'docx', 'PIL', 'pypdf', 'cryptography')
+    carregados = sorted({nome.split('.')[0] for _, nome, _ in modulos if nome.split('.')[0] in pesados})
+    print(f"\n🔎 Bibliotecas pesadas carregadas no boot: {', '.join(carregados) or 'nenhuma'}")
+
+if __name__ == '__main__':
+    main()
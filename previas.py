@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Prévias (miniaturas) de anexos
+
+Cada arquivo é renderizado uma única vez e guardado em previas_arquivos pela
+combinação SHA-256 do conteúdo + tamanho da prévia, então o mesmo documento
+enviado duas vezes compartilha a miniatura. Imagens são reduzidas com Pillow.
+O pypdf não rasteriza páginas: para PDFs a prévia é a maior imagem da primeira
+página (laudos escaneados, fotos) ou, se não houver, um cartão com o início
+do texto. DOC/DOCX não têm prévia.
+"""
+import io
+import os
+import hashlib
+import logging
+import textwrap
+
+from flask import Response, request
+
+from database import get_db_connection
+from uploads import detectar_tipo
+import singleflight
+
+logger = logging.getLogger(__name__)
+
+PREVIA_LADO = int(os.environ.get('PREVIA_LADO', 320))
+PREVIA_QUALIDADE = 75
+
+def _miniatura(imagem):
+    """Reduz uma imagem PIL para a prévia em JPEG"""
+    from PIL import Image, ImageOps
+    
+    imagem = ImageOps.exif_transpose(imagem)
+    imagem.thumbnail((PREVIA_LADO, PREVIA_LADO), Image.LANCZOS)
+    if imagem.mode in ('RGBA', 'LA', 'P'):
+        fundo = Image.new('RGB', imagem.size, 'white')
+        imagem = imagem.convert('RGBA')
+        fundo.paste(imagem, mask=imagem.split()[-1])
+        imagem = fundo
+    saida = io.BytesIO()
+    imagem.convert('RGB').save(saida, 'JPEG', quality=PREVIA_QUALIDADE, optimize=True)
+    return saida.getvalue()
+
+def _cartao_texto(texto):
+    """Cartão com as primeiras linhas da página (PDF sem imagens)"""
+    from PIL import Image, ImageDraw, ImageFont
+    
+    largura, altura = PREVIA_LADO * 3 // 4, PREVIA_LADO
+    cartao = Image.new('RGB', (largura, altura), 'white')
+    desenho = ImageDraw.Draw(cartao)
+    desenho.rectangle((0, 0, largura - 1, altura - 1), outline='#cccccc')
+    fonte = ImageFont.load_default()
+    linhas = []
+    for paragrafo in (texto or '').splitlines():
+        linhas += textwrap.wrap(paragrafo, width=max(10, largura // 7)) or ['']
+    y = 10
+    for linha in linhas:
+        if y > altura - 20:
+            break
+        desenho.text((10, y), linha, fill='#333333', font=fonte)
+        y += 13
+    saida = io.BytesIO()
+    cartao.save(saida, 'JPEG', quality=PREVIA_QUALIDADE, optimize=True)
+    return saida.getvalue()
+
+def renderizar_previa(dados):
+    """JPEG da prévia ou None para tipos sem prévia"""
+    # Pillow e pypdf só carregam quando a primeira prévia é gerada
+    from PIL import Image
+    from pypdf import PdfReader
+    
+    tipo = detectar_tipo(dados[:16])
+    if tipo in ('image/jpeg', 'image/png', 'image/gif'):
+        with Image.open(io.BytesIO(dados)) as imagem:
+            return _miniatura(imagem)
+
+    if tipo == 'application/pdf':
+        pagina = PdfReader(io.BytesIO(dados)).pages[0]
+        imagens = []
+        for imagem in pagina.images:
+            try:
+                imagens.append(imagem.image)
+            except Exception as e:
+                logger.debug(f"Imagem de PDF ignorada na prévia: {e}")
+        if imagens:
+            return _miniatura(max(imagens, key=lambda i: i.size[0] * i.size[1]))
+        return _cartao_texto(pagina.extract_text())
+
+    return None
+
+def _renderizar_e_guardar(tabela, arquivo_id):
+    """Lê o arquivo, renderiza e grava a prévia (b'' marca arquivo sem prévia)"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT arquivo_dados, sha256 FROM {tabela} WHERE id = %s', (arquivo_id,))
+        linha = cursor.fetchone()
+        if not linha or linha[0] is None:
+            return None
+        dados = bytes(linha[0])
+        atual = linha[1] or hashlib.sha256(dados).hexdigest()
+        if not linha[1]:
+            # Arquivos anteriores ao cálculo de hash no upload
+            cursor.execute(f'UPDATE {tabela} SET sha256 = %s, tamanho = COALESCE(tamanho, %s) WHERE id = %s',
+                           (atual, len(dados), arquivo_id))
+
+        try:
+            previa = renderizar_previa(dados) or b''
+        except Exception as e:
+            logger.warning(f"⚠️ Não foi possível gerar prévia de {tabela} {arquivo_id}: {e}")
+            previa = b''
+
+        cursor.execute('''
+            INSERT INTO previas_arquivos (sha256, lado, imagem) VALUES (%s, %s, %s)
+            ON CONFLICT (sha256, lado) DO NOTHING
+        ''', (atual, PREVIA_LADO, previa))
+        conn.commit()
+        return atual, previa
+    finally:
+        conn.close()
+
+def gerar_previa(tabela, arquivo_id):
+    """Garante a prévia de um anexo (chamado pelo pool de otimizacao.py após o upload)"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT 1 FROM {tabela} a JOIN previas_arquivos p ON p.sha256 = a.sha256 AND p.lado = %s
+            WHERE a.id = %s
+        ''', (PREVIA_LADO, arquivo_id))
+        if cursor.fetchone():
+            return
+    finally:
+        conn.close()
+    singleflight.executar(('previa', tabela, arquivo_id),
+                          lambda: _renderizar_e_guardar(tabela, arquivo_id))
+
+def obter_previa(tabela, arquivo_id):
+    """Retorna (sha256, jpeg) da prévia; jpeg vazio se o tipo não tem prévia; None se não existe"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT a.sha256, p.imagem
+            FROM {tabela} a
+            LEFT JOIN previas_arquivos p ON p.sha256 = a.sha256 AND p.lado = %s
+            WHERE a.id = %s
+        ''', (PREVIA_LADO, arquivo_id))
+        linha = cursor.fetchone()
+    finally:
+        conn.close()
+
+    if not linha:
+        return None
+    if linha[1] is not None:
+        return linha[0], bytes(linha[1])
+
+    # Primeira visualização (arquivo antigo ou fila ainda não processou)
+    return singleflight.executar(('previa', tabela, arquivo_id),
+                                 lambda: _renderizar_e_guardar(tabela, arquivo_id))
+
+def resposta_previa(tabela, arquivo_id):
+    """Resposta HTTP da prévia com cache longo; None se o anexo não existe"""
+    previa = obter_previa(tabela, arquivo_id)
+    if previa is None:
+        return None
+    sha256, imagem = previa
+    if not imagem:
+        return Response(status=204)
+
+    # A URL da página inclui ?v=<sha256>; o conteúdo de uma URL nunca muda
+    cache = 'private, max-age=31536000, immutable' if request.args.get('v') == sha256 else 'private, no-cache'
+    if request.if_none_match.contains(sha256):
+        resposta = Response(status=304)
+    else:
+        resposta = Response(imagem, mimetype='image/jpeg')
+    resposta.set_etag(sha256)
+    resposta.headers['Cache-Control'] = cache
+    return resposta
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Single-flight: coalescência de cálculos caros
+
+Quando um agregado expira sob carga, apenas uma chamada por chave executa o
+cálculo; as demais chamadas concorrentes aguardam e recebem o mesmo resultado.
+O modo entre processos usa pg_advisory_xact_lock e a tabela UNLOGGED
+cache_agregados para que apenas um worker recalcule.
+"""
+import json
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class _Voo:
+    """Cálculo em andamento para uma chave"""
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+_voos = {}
+_lock = threading.Lock()
+
+def executar(chave, calcular):
+    """Executa calcular() uma única vez entre as chamadas concorrentes do processo"""
+    with _lock:
+        voo = _voos.get(chave)
+        lider = voo is None
+        if lider:
+            voo = _Voo()
+            _voos[chave] = voo
+
+    if not lider:
+        voo.evento.wait()
+        if voo.erro is not None:
+            raise voo.erro
+        return voo.resultado
+
+    try:
+        voo.resultado = calcular()
+        return voo.resultado
+    except Exception as e:
+        voo.erro = e
+        raise
+    finally:
+        with _lock:
+            _voos.pop(chave, None)
+        voo.evento.set()
+
+def obter_ou_calcular(cache, chave, calcular):
+    """Lê do CacheLocal ou calcula (single-flight) e guarda o resultado"""
+    valor = cache.obter(chave)
+    if valor is not None:
+        return valor
+
+    def calcular_e_guardar():
+        # Outra thread pode ter preenchido o cache enquanto esperávamos o lock
+        valor = cache.obter(chave)
+        if valor is None:
+            geracao = cache.geracao()
+            valor = calcular()
+            cache.definir(chave, valor, geracao)
+        return valor
+
+    return executar(chave, calcular_e_guardar)
+
+def executar_entre_processos(chave, calcular, ttl):
+    """Single-flight entre workers: o resultado (JSON) fica em cache_agregados por ttl segundos"""
+    return executar(('pg', chave), lambda: _executar_com_advisory_lock(chave, calcular, ttl))
+
+def _executar_com_advisory_lock(chave, calcular, ttl):
+    from database import get_db_connection
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+
+        # Serializa os workers na mesma chave até o COMMIT
+        cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', (chave,))
+        cursor.execute('''
+            SELECT valor FROM cache_agregados
+            WHERE chave = %s AND atualizado_em > NOW() - make_interval(secs => %s)
+        ''', (chave, ttl))
+        row = cursor.fetchone()
+        if row:
+            conn.commit()
+            return row[0]
+
+        valor = calcular()
+        cursor.execute('''
+            INSERT INTO cache_agregados (chave, valor, atualizado_em)
+            VALUES (%s, %s, NOW())
+            ON CONFLICT (chave) DO UPDATE SET valor = EXCLUDED.valor, atualizado_em = EXCLUDED.atualizado_em
+        ''', (chave, json.dumps(valor, default=str)))
+        # Chaves com versão de dados deixam resultados antigos para trás
+        cursor.execute("DELETE FROM cache_agregados WHERE atualizado_em < NOW() - INTERVAL '1 day'")
+        conn.commit()
+        cursor.close()
+
+        # Devolver o mesmo formato que os demais workers lerão da tabela
+        return json.loads(json.dumps(valor, default=str))
+
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"❌ Erro no single-flight entre processos ({chave}): {e}")
+        raise
+    finally:
+        conn.close()
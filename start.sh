@@ -1,3 +1,8 @@
 #!/bin/bash
-PORT=${PORT:-5000}
-exec gunicorn --bind 0.0.0.0:$PORT app:app
+export PORT=${PORT:-5000}
+# Esquema do banco e usuário admin, uma vez por deploy (não em cada worker)
+python inicializar_banco.py || echo "⚠️ Continuando sem inicialização do banco..."
+# Arquivos estáticos com hash e pré-comprimidos (static/dist)
+python build_assets.py --limpar
+# Workers, threads, preload e reciclagem: gunicorn.conf.py
+exec gunicorn -c gunicorn.conf.py app:app
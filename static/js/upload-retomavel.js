@@ -0,0 +1,122 @@
+// Upload retomável AMEG: envia o arquivo em partes para /api/uploads e
+// continua do ponto em que parou depois de uma queda de conexão.
+// Formulários marcados com data-upload-retomavel usam este fluxo; sem
+// fetch/Blob.slice o formulário é enviado normalmente.
+class UploadRetomavel {
+    constructor(form) {
+        this.form = form;
+        this.progresso = form.querySelector('.upload-progresso');
+        this.csrf = form.querySelector('input[name="csrf_token"]').value;
+        form.addEventListener('submit', (evento) => this.enviar(evento));
+    }
+
+    headers(extra = {}) {
+        return Object.assign({ 'X-CSRFToken': this.csrf }, extra);
+    }
+
+    mostrar(texto) {
+        this.progresso.style.display = 'block';
+        this.progresso.textContent = texto;
+    }
+
+    async sha256(blob) {
+        // crypto.subtle só existe em contexto seguro (HTTPS ou localhost)
+        if (!(window.crypto && crypto.subtle)) return null;
+        const digest = await crypto.subtle.digest('SHA-256', await new Response(blob).arrayBuffer());
+        return Array.from(new Uint8Array(digest), (byte) => byte.toString(16).padStart(2, '0')).join('');
+    }
+
+    chaveSessao(arquivo) {
+        return `ameg-upload:${this.form.dataset.referencia}:${arquivo.name}:${arquivo.size}:${arquivo.lastModified}`;
+    }
+
+    async enviar(evento) {
+        const arquivo = this.form.querySelector('input[type="file"]').files[0];
+        if (!arquivo) return;
+        evento.preventDefault();
+
+        try {
+            const sessao = await this.obterSessao(arquivo);
+            await this.enviarPartes(arquivo, sessao);
+            await this.finalizar(arquivo, sessao);
+            window.location.reload();
+        } catch (erro) {
+            this.mostrar(`❌ ${erro.message}`);
+        }
+    }
+
+    async obterSessao(arquivo) {
+        // Sessão anterior do mesmo arquivo (ex.: página recarregada após falha)
+        const salva = localStorage.getItem(this.chaveSessao(arquivo));
+        if (salva) {
+            const resposta = await fetch(`/api/uploads/${salva}`);
+            if (resposta.ok) return resposta.json();
+            localStorage.removeItem(this.chaveSessao(arquivo));
+        }
+
+        const dados = new FormData(this.form);
+        const resposta = await fetch('/api/uploads', {
+            method: 'POST',
+            headers: this.headers({ 'Content-Type': 'application/json' }),
+            body: JSON.stringify({
+                destino: this.form.dataset.uploadRetomavel,
+                referencia_id: this.form.dataset.referencia,
+                nome_arquivo: arquivo.name,
+                tamanho: arquivo.size,
+                // Conferido na finalização contra o arquivo montado no servidor
+                sha256: await this.sha256(arquivo),
+                tipo_arquivo: dados.get('tipo_arquivo'),
+                descricao: dados.get('descricao'),
+            }),
+        });
+        const sessao = await resposta.json();
+        if (!resposta.ok) throw new Error(sessao.error || 'Erro ao iniciar upload');
+        localStorage.setItem(this.chaveSessao(arquivo), sessao.id);
+        return sessao;
+    }
+
+    async enviarPartes(arquivo, sessao) {
+        let recebido = sessao.recebido;
+        let tentativas = 0;
+        while (recebido < arquivo.size) {
+            this.mostrar(`📤 Enviando ${arquivo.name}: ${Math.floor(recebido * 100 / arquivo.size)}%`);
+            try {
+                const parte = arquivo.slice(recebido, recebido + sessao.chunk_max);
+                const extra = { 'Upload-Offset': String(recebido) };
+                const hash = await this.sha256(parte);
+                if (hash) extra['Upload-Checksum-SHA256'] = hash;
+                const resposta = await fetch(sessao.url, {
+                    method: 'PUT',
+                    headers: this.headers(extra),
+                    body: parte,
+                });
+                const estado = await resposta.json();
+                // 409: o servidor informa o ponto correto para continuar
+                if (!resposta.ok && resposta.status !== 409) throw new Error(estado.error);
+                recebido = estado.recebido;
+                tentativas = 0;
+            } catch (erro) {
+                if (++tentativas > 8) throw new Error('Conexão instável, tente novamente mais tarde');
+                this.mostrar(`⚠️ Falha de conexão, retomando em ${2 ** tentativas}s...`);
+                await new Promise((resolve) => setTimeout(resolve, 1000 * 2 ** tentativas));
+                const resposta = await fetch(`/api/uploads/${sessao.id}`).catch(() => null);
+                if (resposta && resposta.ok) recebido = (await resposta.json()).recebido;
+            }
+        }
+    }
+
+    async finalizar(arquivo, sessao) {
+        this.mostrar(`⏳ Finalizando ${arquivo.name}...`);
+        const resposta = await fetch(`/api/uploads/${sessao.id}/finalizar`, {
+            method: 'POST',
+            headers: this.headers(),
+        });
+        const resultado = await resposta.json();
+        if (!resposta.ok) throw new Error(resultado.error || 'Erro ao finalizar upload');
+        localStorage.removeItem(this.chaveSessao(arquivo));
+    }
+}
+
+if (window.fetch && window.Blob && Blob.prototype.slice) {
+    document.querySelectorAll('form[data-upload-retomavel]').forEach((form) => new UploadRetomavel(form));
+}
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Pipeline de uploads em stream
+
+O Werkzeug grava cada parte do multipart no objeto devolvido por
+Request._get_file_stream. Aqui esse objeto é um spool (memória até 256KB,
+depois disco) que calcula o SHA-256, guarda os primeiros bytes para detectar o
+tipo real e interrompe a requisição assim que um arquivo passa da cota, sem
+esperar o corpo inteiro chegar. As rotas recebem o handle do spool e o
+armazenamento lê o conteúdo apenas no momento de gravar.
+"""
+import os
+import hashlib
+import shutil
+import tempfile
+import time
+import logging
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+logger = logging.getLogger(__name__)
+
+# Cotas por arquivo e por requisição (o total da requisição é MAX_CONTENT_LENGTH)
+UPLOAD_MAX_ARQUIVO = int(os.environ.get('UPLOAD_MAX_ARQUIVO_MB', 16)) * 1024 * 1024
+UPLOAD_MAX_ARQUIVOS = int(os.environ.get('UPLOAD_MAX_ARQUIVOS', 20))
+
+# Partes menores que isso ficam em memória; as maiores vão para disco
+SPOOL_MEMORIA = 256 * 1024
+
+# Assinaturas (magic bytes) dos tipos aceitos
+ASSINATURAS = (
+    (b'%PDF', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'PK\x03\x04', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+    (b'\xd0\xcf\x11\xe0', 'application/msword'),
+)
+
+# Tipo real esperado para cada extensão permitida
+TIPOS_POR_EXTENSAO = {
+    'pdf': 'application/pdf',
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'gif': 'image/gif',
+    'doc': 'application/msword',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+
+def detectar_tipo(inicio):
+    """Tipo MIME pelo conteúdo (None se desconhecido)"""
+    for assinatura, tipo in ASSINATURAS:
+        if inicio.startswith(assinatura):
+            return tipo
+    return None
+
+class ArquivoSpool:
+    """Destino de uma parte do multipart: spool com hash, tamanho e tipo"""
+
+    def __init__(self, limite):
+        self.limite = limite
+        self.tamanho = 0
+        self._arquivo = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORIA)
+        self._hash = hashlib.sha256()
+        self._inicio = b''
+
+    def write(self, dados):
+        self.tamanho += len(dados)
+        if self.tamanho > self.limite:
+            self._arquivo.close()
+            raise RequestEntityTooLarge(f'Arquivo maior que {self.limite // (1024 * 1024)}MB')
+        if len(self._inicio) < 16:
+            self._inicio += bytes(dados[:16 - len(self._inicio)])
+        self._hash.update(dados)
+        return self._arquivo.write(dados)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    @property
+    def tipo_detectado(self):
+        return detectar_tipo(self._inicio)
+
+    def __getattr__(self, nome):
+        # read, seek, tell, close... do arquivo temporário
+        return getattr(self._arquivo, nome)
+
+    def __iter__(self):
+        return iter(self._arquivo)
+
+class UploadRequest(Request):
+    """Request que grava uploads no ArquivoSpool e aplica as cotas durante o parse"""
+
+    # Rotas específicas (ex.: importação de planilhas) podem aumentar a cota por arquivo
+    limite_arquivo = UPLOAD_MAX_ARQUIVO
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        self._total_uploads = getattr(self, '_total_uploads', 0) + 1
+        if self._total_uploads > UPLOAD_MAX_ARQUIVOS:
+            raise RequestEntityTooLarge(f'Máximo de {UPLOAD_MAX_ARQUIVOS} arquivos por envio')
+        return ArquivoSpool(self.limite_arquivo)
+
+def info_upload(file):
+    """Retorna (tamanho, sha256, tipo detectado) de um FileStorage"""
+    stream = file.stream
+    if isinstance(stream, ArquivoSpool):
+        return stream.tamanho, stream.sha256, stream.tipo_detectado
+
+    # Upload que não passou pelo UploadRequest: calcular lendo em blocos
+    hash_ = hashlib.sha256()
+    tamanho = 0
+    inicio = stream.read(16)
+    stream.seek(0)
+    for bloco in iter(lambda: stream.read(64 * 1024), b''):
+        hash_.update(bloco)
+        tamanho += len(bloco)
+    stream.seek(0)
+    return tamanho, hash_.hexdigest(), detectar_tipo(inicio)
+
+def validar_upload(file, extensoes):
+    """Verifica extensão e conteúdo; retorna mensagem de erro ou None"""
+    extensao = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
+    if extensao not in extensoes:
+        return f'Tipo de arquivo não permitido: {file.filename}'
+
+    tamanho, _, tipo = info_upload(file)
+    if tamanho == 0:
+        return f'Arquivo vazio: {file.filename}'
+    if tipo != TIPOS_POR_EXTENSAO.get(extensao):
+        return f'Conteúdo não corresponde à extensão: {file.filename}'
+    return None
+
+# Sessões de upload retomável (blueprints/upload_sessoes.py): o arquivo chega
+# em partes, é gravado em DIR_SESSOES e só vai para o banco na finalização
+DIR_SESSOES = os.path.join(tempfile.gettempdir(), 'ameg_upload_sessoes')
+UPLOAD_CHUNK_MAX = int(os.environ.get('UPLOAD_CHUNK_MB', 4)) * 1024 * 1024
+VALIDADE_SESSAO = int(os.environ.get('UPLOAD_SESSAO_HORAS', 24)) * 3600
+
+def caminho_sessao(sessao_id):
+    """Arquivo parcial de uma sessão"""
+    return os.path.join(DIR_SESSOES, f'{sessao_id}.part')
+
+def receber_chunk(stream, sha256_esperado=None):
+    """Lê o corpo de um chunk para um temporário e confere o SHA-256; retorna (arquivo, tamanho, erro)
+
+    Roda antes de abrir a transação da sessão: a rede lenta do cliente não
+    segura conexão nem lock no banco, e um chunk inválido nunca chega ao
+    arquivo da sessão.
+    """
+    temporario = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORIA)
+    hash_ = hashlib.sha256()
+    tamanho = 0
+    for bloco in iter(lambda: stream.read(64 * 1024), b''):
+        tamanho += len(bloco)
+        if tamanho > UPLOAD_CHUNK_MAX:
+            temporario.close()
+            raise RequestEntityTooLarge(f'Chunk maior que {UPLOAD_CHUNK_MAX // (1024 * 1024)}MB')
+        hash_.update(bloco)
+        temporario.write(bloco)
+
+    if sha256_esperado and hash_.hexdigest() != sha256_esperado.lower():
+        temporario.close()
+        return None, tamanho, 'SHA-256 do chunk não confere'
+    temporario.seek(0)
+    return temporario, tamanho, None
+
+def gravar_chunk(sessao_id, offset, chunk, tamanho, recebido):
+    """Copia um chunk já verificado para o arquivo da sessão a partir de offset; retorna o novo total
+
+    Chunks reenviados (offset < recebido) sobrescrevem o mesmo conteúdo, então
+    repetir uma parte depois de uma falha de rede é seguro.
+    """
+    os.makedirs(DIR_SESSOES, exist_ok=True)
+    caminho = caminho_sessao(sessao_id)
+    with open(caminho, 'r+b' if os.path.exists(caminho) else 'w+b') as destino:
+        destino.seek(offset)
+        shutil.copyfileobj(chunk, destino, 64 * 1024)
+    return max(recebido, offset + tamanho)
+
+def resumo_arquivo_sessao(sessao_id):
+    """Retorna (tamanho, sha256, tipo detectado) do arquivo montado"""
+    hash_ = hashlib.sha256()
+    tamanho = 0
+    with open(caminho_sessao(sessao_id), 'rb') as arquivo:
+        inicio = arquivo.read(16)
+        arquivo.seek(0)
+        for bloco in iter(lambda: arquivo.read(64 * 1024), b''):
+            hash_.update(bloco)
+            tamanho += len(bloco)
+    return tamanho, hash_.hexdigest(), detectar_tipo(inicio)
+
+def remover_arquivo_sessao(sessao_id):
+    """Apaga o arquivo parcial de uma sessão"""
+    try:
+        os.remove(caminho_sessao(sessao_id))
+    except FileNotFoundError:
+        pass
+
+def limpar_sessoes_expiradas(cursor):
+    """Remove sessões abandonadas (sem atividade há VALIDADE_SESSAO) e arquivos órfãos"""
+    cursor.execute('''
+        DELETE FROM upload_sessoes
+        WHERE atualizado_em < NOW() - %s * INTERVAL '1 second'
+        RETURNING id
+    ''', (VALIDADE_SESSAO,))
+    # Aceita cursor comum ou RealDictCursor (criar_sessao usa o segundo)
+    expiradas = [linha['id'] if isinstance(linha, dict) else linha[0] for linha in cursor.fetchall()]
+    for sessao_id in expiradas:
+        remover_arquivo_sessao(sessao_id)
+
+    # Arquivos sem sessão (ex.: banco restaurado) também expiram pela data
+    if os.path.isdir(DIR_SESSOES):
+        limite = time.time() - VALIDADE_SESSAO
+        for nome in os.listdir(DIR_SESSOES):
+            caminho = os.path.join(DIR_SESSOES, nome)
+            try:
+                if os.path.getmtime(caminho) < limite:
+                    os.remove(caminho)
+            except OSError:
+                pass
+
+    if expiradas:
+        logger.info(f"🧹 {len(expiradas)} sessões de upload expiradas removidas")
+    return len(expiradas)